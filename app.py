@@ -4,8 +4,12 @@ import json
 import time
 import smtplib
 import urllib.parse
+import re
+import base64
+import importlib
+import threading
+import uuid
 from datetime import datetime
-import numpy as np
 
 # --- 1. SICHERHEITS-START ---
 api_key = None
@@ -17,19 +21,36 @@ smtp_port = 465
 email_password = None
 google_creds = None
 blatt_basis_name = "Auftragsbuch" # Basisname für das Google Sheet
+lokaler_ordner = "lokale_daten" # SQLite-Spiegel & Caches (nicht im Git)
+SYNC_INTERVALL = 30 # Sekunden, in denen das Dashboard nur lokal liest
+PROMPT_VERSION = 1 # Hochzählen, wenn sich die GPT-Prompts ändern (macht den Ergebnis-Cache ungültig)
 
+# Leichte Module für jeden Lauf; pandas, numpy, openai, fpdf, PIL und das Canvas
+# lädt erst der Modus, der sie braucht (siehe lade()) - das spart beim Kaltstart
+# im Dashboard bzw. bei der Auftragsannahme mehrere hundert Millisekunden
 try:
-    import pandas as pd
     import gspread
+    from gspread.utils import rowcol_to_a1
     from email.mime.multipart import MIMEMultipart
     from email.mime.text import MIMEText
     from email.mime.base import MIMEBase
     from email import encoders
-    from openai import OpenAI
-    from fpdf import FPDF
-    from PIL import Image
-    # NEU: Für die Unterschrift
-    from streamlit_drawable_canvas import st_canvas
+    import datev
+    import jahresarchiv
+    import verbindung
+    import spiegel
+    import kunden
+    import artikel
+    import auftraege
+    import extraktion
+    import pipeline
+    import transkription
+    import ergebnis_cache
+    import nummern
+    import postausgang
+    import offline
+    import messung
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 except ImportError as e:
     st.error(f"Fehler beim Laden von Modulen: {e}")
     st.info("Bitte installiere fehlende Pakete: pip install pandas gspread openai fpdf streamlit-drawable-canvas")
@@ -39,6 +60,17 @@ except ImportError as e:
 st.set_page_config(page_title="App 4.0 - Performance & Signatur", page_icon="📝")
 
 # --- 3. HELFER ---
+def lade(name):
+    """
+    FEATURE: Schweres Modul erst bei Bedarf importieren (danach aus sys.modules, kostet nichts).
+    Fehlt das Paket, gleiche Meldung wie beim Start.
+    """
+    try: return importlib.import_module(name)
+    except ImportError as e:
+        st.error(f"Fehler beim Laden von Modulen: {e}")
+        st.info("Bitte installiere fehlende Pakete: pip install pandas gspread openai fpdf streamlit-drawable-canvas")
+        st.stop()
+
 def clean_json_string(s):
     if not s: return ""
     try: return json.loads(s)
@@ -49,36 +81,93 @@ def clean_json_string(s):
     try: return json.loads(fixed)
     except: return None
 
+@st.cache_resource(show_spinner=False)
+def lies_google_creds(roh):
+    """google_json nur einmal pro Prozess parsen (Schlüssel ist der Rohtext aus den Secrets)"""
+    return clean_json_string(roh)
+
+@st.cache_resource(show_spinner=False)
+def get_openai(key):
+    """OpenAI-Client je API-Key, einmal pro Prozess statt bei jedem Rerun neu"""
+    return lade("openai").OpenAI(api_key=key)
+
 # --- FEATURE: JAHRESWECHSEL & PERFORMANCE ---
-def get_current_worksheet(sh):
+def get_sheet():
+    """Geteilte Verbindung (Client + Spreadsheet) aus verbindung.py"""
+    return verbindung.hole_verbindung(google_creds, blatt_basis_name)
+
+def get_current_worksheet(conn):
     """
     Sucht automatisch das Blatt für das aktuelle Jahr (z.B. 'Aufträge_2025').
-    Wenn es nicht existiert, wird es erstellt. Das hält die App schnell.
+    Wenn es nicht existiert, wird es erstellt. Das Blatt bleibt pro Prozess im Cache.
     """
-    jahr = datetime.now().year
-    target_name = f"Aufträge_{jahr}"
-    
-    try:
-        ws = sh.worksheet(target_name)
-        return ws
-    except:
-        # Blatt existiert nicht -> neu anlegen
-        ws = sh.add_worksheet(title=target_name, rows=1000, cols=20)
-        # Header sofort setzen
-        ws.append_row(["Nr", "Datum", "Uhrzeit", "Kunde", "Arbeit", "Netto", "MwSt", "Brutto", "KdNr", "Status", "GPS_Log"])
-        return ws
+    return conn.jahresblatt(datetime.now().year)
+
+@st.cache_resource
+def get_spiegel():
+    """Lokaler SQLite-Spiegel der Tabellenblätter, einmal pro Prozess"""
+    return spiegel.TabellenSpiegel(os.path.join(lokaler_ordner, "spiegel.sqlite"))
+
+@st.cache_resource
+def get_ergebnis_cache():
+    """Persistenter Cache für Transkripte und GPT-Ergebnisse, einmal pro Prozess"""
+    return ergebnis_cache.ErgebnisCache(os.path.join(lokaler_ordner, "ergebnisse.sqlite"))
+
+@st.cache_resource
+def get_nummern():
+    """Lokale Vergabe der Berichtsnummern, einmal pro Prozess"""
+    return nummern.NummernVergabe(os.path.join(lokaler_ordner, "nummern.sqlite"))
+
+@st.cache_resource
+def get_postausgang():
+    """Dauerhafter Postausgang (Sheet-Zeilen, Mails) mit Hintergrund-Thread, einmal pro Prozess"""
+    return postausgang.Postausgang(os.path.join(lokaler_ordner, "postausgang.sqlite"))
+
+@st.cache_resource
+def get_bericht_renderer():
+    """PDF-Vorlage mit Briefkopf und Logo in Druckauflösung, einmal pro Prozess"""
+    bericht_pdf = lade("bericht_pdf")
+    return bericht_pdf.BerichtRenderer(bericht_pdf.finde_logo(), cache_ordner=lokaler_ordner)
+
+@st.cache_resource
+def get_jahresarchiv():
+    """Gespeicherte Kennzahlen abgeschlossener Jahre, einmal pro Prozess"""
+    return jahresarchiv.JahresArchiv(os.path.join(lokaler_ordner, "jahre.sqlite"))
+
+@st.cache_resource
+def get_offline():
+    """Lokale Ablage für Berichte, die ohne Netz erfasst wurden, einmal pro Prozess"""
+    return offline.OfflineSpeicher(os.path.join(lokaler_ordner, "offline"))
+
+@st.cache_resource
+def get_messlog():
+    """Rotierendes JSONL-Log der Zeitmessungen; wird prozessweites Ziel aller Spannen"""
+    log = messung.MessLog(os.path.join(lokaler_ordner, "messung.jsonl"))
+    messung.setze_ziel(log)
+    return log
+
+get_messlog()
+
+def netz_da():
+    """Erreichbarkeit von OpenAI/Google, pro Sitzung höchstens alle 30 s neu geprüft"""
+    stand = st.session_state.get("netz_stand")
+    if stand is None or time.time() - stand[0] > 30:
+        stand = (time.time(), offline.ist_online())
+        st.session_state.netz_stand = stand
+    return stand[1]
 
 # --- 4. SEITENLEISTE ---
 with st.sidebar:
     st.header("⚙️ Einstellungen 4.0")
     if st.button("🔄 App Reset / Neu laden"):
         st.cache_data.clear()
+        verbindung.alle_verbindungen_zuruecksetzen()
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.rerun()
     st.markdown("---")
     
-    modus = st.radio("Modus:", ("Chef-Dashboard", "Bericht & Unterschrift", "Auftrag annehmen"))
+    modus = st.radio("Modus:", ("Chef-Dashboard", "Bericht & Unterschrift", "Auftrag annehmen"), key="modus")
     st.markdown("---")
     
     api_key_default = st.secrets.get("openai_api_key", "")
@@ -89,7 +178,7 @@ with st.sidebar:
         api_key = st.text_input("OpenAI Key", type="password")
 
     google_json_raw = st.secrets.get("google_json", "")
-    google_creds = clean_json_string(google_json_raw)
+    google_creds = lies_google_creds(google_json_raw)
     if google_creds: st.success("☁️ Cloud aktiv")
     
     blatt_basis_name = st.text_input("Google Sheet Name", value="Auftragsbuch")
@@ -103,400 +192,614 @@ with st.sidebar:
         st.success("📧 Mail aktiv")
         email_receiver = st.text_input("Empfänger", value=email_sender)
 
+    # FEATURE: Postausgang - was noch nicht bei Google / beim Mailserver angekommen ist
+    try:
+        anzahl = get_postausgang().zaehle()
+        if anzahl.get(postausgang.OFFEN) or anzahl.get(postausgang.FEHLER):
+            with st.expander(f"📤 Postausgang: {anzahl.get(postausgang.OFFEN, 0)} offen, {anzahl.get(postausgang.FEHLER, 0)} Fehler"):
+                for a in get_postausgang().uebersicht():
+                    if a['status'] == postausgang.ERLEDIGT: continue
+                    st.caption(f"{a['schluessel']} - {a['status']} ({a['versuche']} Versuche) {a['fehler'] or ''}")
+                    if a['status'] == postausgang.FEHLER and st.button("Erneut versuchen", key=f"retry_{a['schluessel']}"):
+                        get_postausgang().erneut_versuchen(a['schluessel']); st.rerun()
+    except Exception as e: st.caption(f"Postausgang nicht verfügbar: {e}")
+
+    # FEATURE: Offline-Erfassung - ohne Netz lokal speichern, später automatisch nachholen
+    online = netz_da()
+    # Fester Key: die Wahl überlebt Reruns; nur wenn das Netz kommt oder geht, wird umgeschaltet
+    if st.session_state.get("war_online") != online: st.session_state.offline_modus = not online
+    st.session_state.war_online = online
+    offline_modus = st.toggle("📴 Offline erfassen", key="offline_modus", help="Berichte lokal speichern; sobald wieder Netz da ist, werden sie im Hintergrund nachgeholt")
+    if not online: st.warning("Kein Netz - Berichte werden lokal gespeichert.")
+    try:
+        anzahl = get_offline().zaehle()
+        offen = sum(n for status, n in anzahl.items() if status != offline.ERLEDIGT)
+        offline_offen = offen > 0
+        if anzahl:
+            with st.expander(f"📴 Offline-Erfassungen: {offen} offen"):
+                for e in get_offline().letzte(10):
+                    kunde = (e['angaben'].get('kunde') or {}).get('name') or (e['daten'] or {}).get('kunde_name') or "?"
+                    text = f"{e['nr']} - {kunde}: {e['status']}"
+                    if e['nr_alt']: text += f" (Nummer geändert, war {e['nr_alt']})"
+                    if e['letzter_fehler'] and e['status'] != offline.ERLEDIGT: text += f" - {e['letzter_fehler']}"
+                    st.caption(text)
+                    pdf = (e['daten'] or {}).get('pdf_datei')
+                    if pdf and os.path.exists(pdf):
+                        with open(pdf, "rb") as f: st.download_button("⬇️ PDF", f.read(), os.path.basename(pdf), "application/pdf", key=f"offline_pdf_{e['id']}")
+    except Exception as e: offline_offen = False; st.caption(f"Offline-Ablage nicht verfügbar: {e}")
+
+    # FEATURE: Performance-Panel (versteckt - '?perf=1' an die URL hängen)
+    if st.query_params.get("perf"):
+        with st.expander("⏱️ Performance je Stufe", expanded=True):
+            n = st.slider("Letzte Messungen je Stufe", 10, 500, 50, step=10)
+            auswertung = get_messlog().auswertung(n)
+            if auswertung:
+                pd = lade("pandas")
+                st.dataframe(pd.DataFrame.from_dict(auswertung, orient="index").rename(columns={
+                    "anzahl": "n", "p50_ms": "p50 ms", "p95_ms": "p95 ms", "bytes": "Ø Bytes", "tokens": "Ø Tokens"}), use_container_width=True)
+            else: st.caption("Noch keine Messungen.")
+            if google_creds:
+                k = get_sheet().planer.stand()
+                st.caption(f"📊 Sheets-Kontingent: {k['anfragen']} Requests ({k['lesen']} lesen, {k['schreiben']} schreiben), "
+                           f"{k['zusammengefasst']} zusammengefasst, {k['gedrosselt']}× 429, {k['wiederholt']} Wiederholungen, "
+                           f"{k['gewartet']}× gewartet ({k['wartezeit_s']} s), {k['abgelehnt']} abgelehnt")
+
 # --- 5. CLIENT ---
-if api_key:
+# Das Dashboard braucht keine KI - außer offene Offline-Erfassungen wollen nachgeholt werden
+if api_key and (modus != "Chef-Dashboard" or offline_offen):
     try:
-        client = OpenAI(api_key=api_key)
+        client = get_openai(api_key)
     except Exception as e:
         st.error(f"Fehler: {e}")
 
 # --- 6. LOGIK ---
 
-def lade_statistik_daten():
-    """Lädt Daten performant nur aus dem aktuellen Jahr"""
+def spiegel_werte_sync(ws, neu_laden=False):
+    """Spiegel eines Blatts abgleichen, falls älter als SYNC_INTERVALL Sekunden"""
+    sp = get_spiegel()
+    alter = sp.alter(ws)
+    if neu_laden or alter is None or alter > SYNC_INTERVALL:
+        sp.sync(ws, voll=neu_laden)
+
+def spiegel_werte(ws, neu_laden=False):
+    """Blatt-Inhalt aus dem lokalen Spiegel; höchstens alle SYNC_INTERVALL Sekunden abgleichen"""
+    spiegel_werte_sync(ws, neu_laden)
+    return get_spiegel().werte(ws)
+
+def lade_statistik_daten(neu_laden=False):
+    """Lädt Daten performant nur aus dem aktuellen Jahr (über den lokalen Spiegel)"""
     if not google_creds: return 0.0, 0, 0, None, [], []
     try:
-        gc = gspread.service_account_from_dict(google_creds)
-        sh = gc.open(blatt_basis_name)
-        
         # FEATURE: Jahreswechsel nutzen
-        ws_rechnungen = get_current_worksheet(sh)
+        ws_rechnungen = get_current_worksheet(get_sheet())
         
-        alle_werte = ws_rechnungen.get_all_values()
+        # FEATURE: Lokaler Spiegel - nur neue Zeilen holen, sonst lokal lesen
+        alle_werte = spiegel_werte(ws_rechnungen, neu_laden)
         
         if len(alle_werte) < 2: return 0.0, 0, 0, None, [], ["Tabelle für dieses Jahr ist noch leer"]
         
-        raw_headers = alle_werte[0]
-        raw_headers_lower = [str(h).strip().lower() for h in raw_headers]
-        headers_clean = [str(h).strip() for h in raw_headers]
-        df = pd.DataFrame(alle_werte[1:], columns=headers_clean)
-        
-        # Spalten Indices suchen
-        idx_status = -1
-        idx_kunde = -1
-        idx_nr = -1
-        idx_brutto = -1
-        idx_datum = -1
-
-        for i, h in enumerate(raw_headers_lower):
-            if "status" in h: idx_status = i
-            if "kunde" in h: idx_kunde = i
-            if ("nr" in h or "nummer" in h) and "kd" not in h and "tel" not in h: idx_nr = i
-            if "brutto" in h: idx_brutto = i
-            if "datum" in h: idx_datum = i
-
-        if idx_nr == -1: idx_nr = 0
-
-        missing_cols = []
-        if idx_status == -1: missing_cols.append("Status")
-        if idx_brutto == -1: missing_cols.append("Brutto")
-        
-        # --- Statistik ---
-        chart_data = None
-        umsatz_monat = 0.0
-        anzahl_heute = 0
-        anzahl_woche = 0
-
-        if idx_datum != -1 and idx_brutto != -1:
-            col_datum_name = raw_headers[idx_datum]
-            col_brutto_name = raw_headers[idx_brutto]
-            
-            df['Datum_Clean'] = pd.to_datetime(df[col_datum_name], format='%d.%m.%Y', errors='coerce')
-            df_stat = df.dropna(subset=['Datum_Clean']) 
-            
-            def putze_geld(x):
-                if not isinstance(x, str): return 0.0
-                sauber = x.replace('€', '').replace('EUR', '').strip()
-                sauber = sauber.replace('.', '').replace(',', '.')
-                try: return float(sauber)
-                except: return 0.0
-            df_stat['Brutto_Zahl'] = df_stat[col_brutto_name].apply(putze_geld)
-            
-            heute = pd.Timestamp.now()
-            df_monat = df_stat[(df_stat['Datum_Clean'].dt.month == heute.month) & (df_stat['Datum_Clean'].dt.year == heute.year)]
-            umsatz_monat = df_monat['Brutto_Zahl'].sum()
-            anzahl_heute = len(df_stat[df_stat['Datum_Clean'].dt.date == heute.date()])
-            aktuelle_kw = heute.isocalendar()[1]
-            df_stat['KW'] = df_stat['Datum_Clean'].dt.isocalendar().week
-            anzahl_woche = len(df_stat[(df_stat['KW'] == aktuelle_kw) & (df_stat['Datum_Clean'].dt.year == heute.year)])
-            df_stat['Monat_Jahr'] = df_stat['Datum_Clean'].dt.strftime('%Y-%m')
-            df_sorted = df_stat.sort_values('Datum_Clean')
-            chart_data = df_sorted.groupby('Monat_Jahr')['Brutto_Zahl'].sum().tail(6)
-        
-        # --- Offene Posten ---
-        offene_liste = []
-        if idx_status != -1 and idx_kunde != -1:
-            for i, row in enumerate(alle_werte):
-                if i == 0: continue
-                status_wert = row[idx_status] if len(row) > idx_status else ""
-                kunde = row[idx_kunde] if len(row) > idx_kunde else "Unbekannt"
-                nr = row[idx_nr] if len(row) > idx_nr else "?"
-                betrag = row[idx_brutto] if (idx_brutto != -1 and len(row) > idx_brutto) else "0"
-                
-                if "bezahlt" not in status_wert.lower():
-                    offene_liste.append({
-                        "gspread_row": i + 1, 
-                        "nr": nr, 
-                        "kunde": kunde, 
-                        "betrag": betrag, 
-                        "status": status_wert
-                    })
-        
-        return umsatz_monat, anzahl_heute, anzahl_woche, chart_data, offene_liste, missing_cols
+        # FEATURE: Vektorisierte Statistik (statistik.py) statt Zeilen-Schleifen
+        return lade("statistik").berechne_statistik(alle_werte)
         
     except Exception as e: 
         return 0.0, 0, 0, None, [], [f"Fehler: {str(e)}"]
 
-def markiere_als_bezahlt(row_index):
-    if not google_creds: return False
+@st.cache_data(ttl=3600, show_spinner=False)
+def vorhandene_jahre(tabelle):
+    """Jahre mit einem Blatt 'Aufträge_JJJJ' je Spreadsheet-ID (Blattliste höchstens stündlich neu holen)"""
+    return jahresarchiv.jahre_aus_titeln(get_sheet().blatt_titel())
+
+def lade_jahreskennzahlen():
+    """
+    FEATURE: Mehrjahres-Auswertung - vergangene Jahre einmal zusammengefasst aus dem
+    Archiv, nur das laufende Jahr frisch aus dem (schon abgeglichenen) Spiegel
+    """
+    if not google_creds: return {}
+    statistik = lade("statistik")
+    aktuell = datetime.now().year
+    archiv = get_jahresarchiv()
+    tabelle = get_sheet().spreadsheet.id
+    kennzahlen = {}
+    for jahr in vorhandene_jahre(tabelle):
+        if jahr >= aktuell: continue
+        try:
+            ws = get_sheet().blatt(verbindung.jahresblatt_name(jahr), jahr=jahr)
+            kennzahlen[jahr] = archiv.oder_berechne(tabelle, jahr, lambda: statistik.jahres_kennzahlen(ws.get_all_values()))
+        except gspread.exceptions.WorksheetNotFound: continue
+    kennzahlen[aktuell] = statistik.jahres_kennzahlen(spiegel_werte(get_current_worksheet(get_sheet())))
+    return kennzahlen
+
+def status_spalte(ws):
+    """Spaltennummer (1-basiert) von 'Status' - aus der Kopfzeile im Spiegel, ohne Request"""
+    headers = get_spiegel().kopf(ws) or ws.row_values(1)
+    for i, h in enumerate(headers):
+        if "status" in str(h).lower(): return i + 1
+    # Fallback, falls Spalte fehlt (sollte durch create nicht passieren)
+    return 10
+
+def markiere_als_bezahlt_batch(posten):
+    """
+    FEATURE: Viele Rechnungen mit EINEM batch_update als bezahlt markieren.
+    `posten` = [(zeile, rechnungs_nr)]; die Zeile kommt aus dem Spiegel und kann
+    veraltet sein (Zeilen im Browser gelöscht/sortiert), daher wird Spalte A
+    einmal frisch gelesen und die Zeile notfalls über die Nummer gesucht.
+    """
+    if not google_creds or not posten: return False
     try:
-        gc = gspread.service_account_from_dict(google_creds)
-        sh = gc.open(blatt_basis_name)
         # FEATURE: Jahreswechsel - arbeite im richtigen Blatt
-        ws = get_current_worksheet(sh)
-        headers = ws.row_values(1)
-        col_idx = -1
-        for i, h in enumerate(headers):
-            if "status" in str(h).lower(): col_idx = i + 1; break
-        if col_idx == -1: 
-             # Fallback, falls Spalte fehlt (sollte durch create nicht passieren)
-             col_idx = 10 
-        ws.update_cell(row_index, col_idx, "Bezahlt")
+        ws = get_current_worksheet(get_sheet())
+        col_idx = status_spalte(ws)
+        spalte_a = [str(x).strip().upper() for x in ws.col_values(1)]
+        zeilen, fehlt = [], []
+        for r, nr in posten:
+            nr = str(nr).strip().upper()
+            if 1 < r <= len(spalte_a) and spalte_a[r - 1] == nr: zeilen.append(r)
+            elif nr in spalte_a[1:]: zeilen.append(spalte_a.index(nr, 1) + 1)
+            else: fehlt.append(nr)
+        if fehlt:
+            st.error(f"Nicht mehr im Blatt gefunden, nichts markiert: {', '.join(fehlt)}")
+            return False
+        ws.batch_update([{"range": rowcol_to_a1(r, col_idx), "values": [["Bezahlt"]]} for r in zeilen])
+        sp = get_spiegel()
+        # Zeilen haben sich verschoben -> Spiegel gleich komplett abgleichen (selten)
+        if zeilen != [r for r, _ in posten]: sp.sync(ws, voll=True)
+        else:
+            for r in zeilen: sp.setze_zelle(ws, r, col_idx, "Bezahlt")
         return True
     except Exception as e: st.error(f"Fehler beim Speichern: {e}"); return False
 
-def lade_kunden_live():
+def markiere_als_bezahlt(row_index, nr):
+    return markiere_als_bezahlt_batch([(row_index, nr)])
+
+def finde_rechnungsnummern(text, offene_posten):
+    """Kontoauszug-Abgleich: eingefügte Nummern -> passende offene Posten + Unbekannte"""
+    nummern = [n.strip().upper() for n in re.split(r"[\s,;]+", text or "") if n.strip()]
+    nach_nr = {str(p['nr']).strip().upper(): p for p in offene_posten}
+    treffer, unbekannt = [], []
+    for n in dict.fromkeys(nummern):
+        if n in nach_nr: treffer.append(nach_nr[n])
+        else: unbekannt.append(n)
+    return treffer, unbekannt
+
+def bezahlt_callback(posten):
+    """Läuft vor dem Rerun (on_click): Liste kommt danach schon aktualisiert aus dem Spiegel"""
+    if markiere_als_bezahlt_batch([(p['gspread_row'], p['nr']) for p in posten]):
+        st.session_state.bezahlt_meldung = f"{len(posten)} Rechnung(en) bezahlt: " + ", ".join(str(p['nr']) for p in posten)
+        for p in posten:
+            st.session_state.pop(f"sel_{p['gspread_row']}", None)
+            st.session_state.get("offen_auswahl", set()).discard(p['gspread_row'])
+        st.session_state.kontoauszug = ""
+
+def auswahl_umschalten(zeile):
+    """Checkbox der Mehrfachauswahl -> Menge im Session State (überlebt das Blättern)"""
+    auswahl = st.session_state.setdefault("offen_auswahl", set())
+    if st.session_state.get(f"sel_{zeile}"): auswahl.add(zeile)
+    else: auswahl.discard(zeile)
+
+def bericht_aus_auftrag(auftrag):
+    """Läuft vor dem Rerun (on_click): Auftrag als Vorlage merken und in den Berichtsmodus wechseln"""
+    st.session_state.auftrag_vorlage = auftrag
+    st.session_state.modus = "Bericht & Unterschrift"
+
+def lade_kunden_index():
+    """Kundenindex (über den lokalen Spiegel, neu gebaut nur bei Änderungen)"""
+    ws = get_sheet().blatt("Kunden")
+    spiegel_werte_sync(ws)
+    sp = get_spiegel()
+    return kunden.hole_index(spiegel.blatt_schluessel(ws), lambda: sp.werte(ws)[1:], sp.stand(ws))
+
+def lade_kunden_live(txt, index=None):
+    """FEATURE: Nur die passenden Kunden zum Transkript (lokaler Index statt ganzem Blatt)"""
     if not google_creds: return "Keine Cloud."
     try:
-        gc = gspread.service_account_from_dict(google_creds)
-        sh = gc.open(blatt_basis_name)
-        try: ws = sh.worksheet("Kunden")
-        except: return "Hinweis: Tabellenblatt 'Kunden' fehlt."
-        alle_daten = ws.get_all_values()
-        if len(alle_daten) < 2: return "Keine Kunden."
-        kunden_text = "BEKANNTE KUNDEN:\n"
-        for zeile in alle_daten[1:]:
-            if len(zeile) >= 1:
-                name = zeile[0]
-                strasse = zeile[1] if len(zeile) > 1 else ""
-                plz = zeile[2] if len(zeile) > 2 else ""
-                ort = zeile[3] if len(zeile) > 3 else ""
-                kd_nr = zeile[4] if len(zeile) > 4 else ""
-                anrede = zeile[5] if len(zeile) > 5 else "" 
-                kunden_text += f"- Name: {name} | Anrede: {anrede} | Adresse: {strasse}, {plz} {ort} | KdNr: {kd_nr}\n"
-        return kunden_text
+        if index is None:
+            try: index = lade_kunden_index()
+            except gspread.exceptions.WorksheetNotFound: return "Hinweis: Tabellenblatt 'Kunden' fehlt."
+        if not len(index): return "Keine Kunden."
+        return kunden.als_prompt([k for _, k in index.suche(txt)])
     except Exception as e: return f"Fehler DB: {e}"
 
-def lade_preise_live():
+def lade_artikel_index():
+    """Artikelindex der Preisliste (über den lokalen Spiegel, neu gebaut nur bei Änderungen)"""
+    ws = get_sheet().blatt("Preisliste")
+    spiegel_werte_sync(ws)
+    sp = get_spiegel()
+    return artikel.hole_index(spiegel.blatt_schluessel(ws), lambda: sp.werte(ws)[1:], sp.stand(ws))
+
+def lade_preise_live(txt, index=None):
+    """FEATURE: Nur die im Transkript erwähnten Artikel statt der ganzen Preisliste"""
     if not google_creds: return "Preise: Standard"
     try:
-        gc = gspread.service_account_from_dict(google_creds)
-        sh = gc.open(blatt_basis_name); ws = sh.worksheet("Preisliste")
-        alle = ws.get_all_values(); txt = "PREISLISTE:\n"
-        for z in alle[1:]:
-            if len(z) >= 2:
-                name = z[0]
-                preis = z[1]
-                art_nr = z[2] if len(z) > 2 else "" 
-                if art_nr: txt += f"- Art. {art_nr}: {name} ({preis} EUR)\n"
-                else: txt += f"- {name}: {preis} EUR\n"
-        return txt
+        if index is None: index = lade_artikel_index()
+        if not len(index): return "Preise: Standard"
+        return artikel.als_prompt([a for _, a in index.suche(txt)])
     except: return "Preise: Standard"
 
-def audio_zu_text(pfad):
-    f = open(pfad, "rb")
-    return client.audio.transcriptions.create(model="whisper-1", file=f, response_format="text")
+def pruefe_preise(dat, index=None):
+    """Extrahierte Positionen lokal gegen die Preisliste prüfen -> Hinweise für die Vorschau"""
+    if not google_creds: return []
+    try: return (index or lade_artikel_index()).pruefe_positionen(dat.get('positionen', []))
+    except Exception: return []
 
-def text_zu_daten(txt, preise, kunden_db):
+def vorab_laden(lader):
+    """Für die Pipeline: Index vorab laden; Fehler meldet später lade_*_live selbst"""
+    if not google_creds: return None
+    try: return lader()
+    except Exception: return None
+
+def whisper(datei):
+    with messung.spanne("whisper", bytes=len(datei[1])):
+        return client.audio.transcriptions.create(model="whisper-1", file=datei, response_format="text")
+
+def audio_bytes_zu_text(daten, endung, bei_teil=None, bericht=None, cache=None):
+    """
+    FEATURE: Audio verkleinern, lange Memos an Pausen teilen und parallel transkribieren (transkription.py).
+    Die Bytes kommen direkt aus dem Upload-Puffer der Sitzung - keine gemeinsame Datei.
+    """
+    # FEATURE: Ergebnis-Cache - dieselbe Datei wird nur einmal transkribiert
+    schluessel = ergebnis_cache.inhalts_schluessel("whisper-1", daten)
+    with messung.spanne("audio_zu_text", bytes=len(daten), cache=True) as w:
+        def berechne():
+            w["cache"] = False
+            return transkription.transkribiere(daten, endung, whisper, bei_teil=bei_teil, bericht=bericht)
+        text = (cache or get_ergebnis_cache()).oder_berechne("transkript", schluessel, berechne)
+        w["zeichen"] = len(text)
+        return text
+
+def audio_info_text(info):
+    """'🎧 2,4 MB -> 0,1 MB, 3 s Stille gekürzt, ~18 s Upload gespart'"""
+    mb = lambda b: f"{b / 1e6:.1f} MB".replace(".", ",")
+    return f"🎧 {mb(info['bytes_vorher'])} → {mb(info['bytes_nachher'])}, {info['stille_gekuerzt_s']:.0f} s Stille gekürzt, ~{info['upload_gespart_s']:.0f} s Upload gespart"
+
+def frage_gpt(art, sys, txt, cache=None, modell="gpt-4o"):
+    """Modell im JSON-Modus; Ergebnis im Cache über Prompt-Version, Modell, System-Prompt (inkl. Kunden/Preise) und Transkript"""
+    def anfrage():
+        with messung.spanne(modell, art=art, bytes=len(sys) + len(txt)) as w:
+            res = client.chat.completions.create(model=modell, messages=[{"role":"system","content":sys},{"role":"user","content":txt}], response_format={"type":"json_object"})
+            if getattr(res, "usage", None): w["tokens_ein"], w["tokens_aus"] = res.usage.prompt_tokens, res.usage.completion_tokens
+            return json.loads(res.choices[0].message.content)
+    schluessel = ergebnis_cache.inhalts_schluessel(PROMPT_VERSION, modell, sys, txt)
+    return (cache or get_ergebnis_cache()).oder_berechne(art, schluessel, anfrage)
+
+def mit_pruefung(ergebnis):
+    """(Daten, Stufe, Probleme) aus extraktion.py -> Daten mit Stufe und Prüfhinweisen für die Vorschau"""
+    dat, stufe, probleme = ergebnis
+    dat['extraktion_stufe'], dat['pruef_hinweise'] = stufe, probleme
+    return dat
+
+def text_zu_daten(txt, preise, kunden_db, cache=None, artikel_index=None, kunden_index=None, kunde=None):
+    """
+    FEATURE: Gestufte Extraktion - Regeln, dann gpt-4o-mini, gpt-4o nur wenn die lokale Prüfung scheitert.
+    `kunde` steht bei einem Bericht zu einem Auftrag schon fest.
+    """
     sys = f"""
     Du bist Buchhalter.
     PREISE (Format: Art.Nr: Name Preis):
     {preise}
     KUNDEN: {kunden_db}
     AUFGABE: JSON erstellen.
-    Format: {{'anrede': 'Herr/Frau', 'kunde_name': 'Name', 'adresse': 'Str, PLZ Ort', 'kundennummer': '1000', 'problem_titel': 'Betreff', 'positionen': [{{'text':'L', 'menge':1.0, 'einzel_netto':0.0}}], 'summe_netto':0.0, 'mwst_betrag':0.0, 'summe_brutto':0.0}}
+    Format: {{'anrede': 'Herr/Frau', 'kunde_name': 'Name', 'adresse': 'Str, PLZ Ort', 'kundennummer': '1000', 'problem_titel': 'Betreff', 'positionen': [{{'art_nr':'', 'text':'L', 'menge':1.0, 'einzel_netto':0.0}}], 'summe_netto':0.0, 'mwst_betrag':0.0, 'summe_brutto':0.0}}
     """
-    res = client.chat.completions.create(model="gpt-4o", messages=[{"role":"system","content":sys},{"role":"user","content":txt}], response_format={"type":"json_object"})
-    return json.loads(res.choices[0].message.content)
+    with messung.spanne("text_zu_daten", bytes=len(sys) + len(txt)):
+        return mit_pruefung(extraktion.bericht(txt, lambda modell: frage_gpt("daten", sys, txt, cache, modell), kunden_index, artikel_index, kunde=kunde))
 
-def text_zu_auftrag(txt, kunden_db):
+def text_zu_auftrag(txt, kunden_db, kunden_index=None):
     sys = f"Du bist Sekretär. KUNDEN: {kunden_db}. JSON: {{'kunde_name':'Name', 'anrede':'Herr/Frau', 'adresse':'Adr', 'kontakt':'Tel', 'problem':'Prob', 'termin':'Wann'}}"
-    res = client.chat.completions.create(model="gpt-4o", messages=[{"role":"system","content":sys},{"role":"user","content":txt}], response_format={"type":"json_object"})
-    return json.loads(res.choices[0].message.content)
-
-def hole_nr():
-    now = datetime.now()
-    jahr = now.strftime("%Y")
-    monat = now.strftime("%m")
-    prefix = f"B-{jahr}-{monat}"
-    start_nr = f"{prefix}-01"
-    if not google_creds: return start_nr
+    with messung.spanne("text_zu_auftrag", bytes=len(sys) + len(txt)):
+        return mit_pruefung(extraktion.auftrag(txt, lambda modell: frage_gpt("auftrag", sys, txt, modell=modell), kunden_index))
+
+def hoechste_nr_im_sheet(praefix):
+    """Startwert für einen neuen Monat: höchste Laufnummer im Jahresblatt (aus dem Spiegel)"""
+    if not google_creds: return 0
     try:
-        gc = gspread.service_account_from_dict(google_creds)
-        sh = gc.open(blatt_basis_name)
-        # FEATURE: Jahreswechsel
-        ws = get_current_worksheet(sh)
-        col = ws.col_values(1)
-        if not col or len(col) < 2: return start_nr
-        last_entry = col[-1]
-        if last_entry.startswith(prefix):
-            try:
-                parts = last_entry.split('-')
-                if len(parts) == 4:
-                    nummer = int(parts[3])
-                    neue_nummer = nummer + 1
-                    return f"{prefix}-{neue_nummer:02d}"
-            except: pass
-        return start_nr
-    except Exception as e: return start_nr
+        werte = spiegel_werte(get_current_worksheet(get_sheet()))
+        return nummern.hoechste_laufnummer((z[0] for z in werte[1:] if z), praefix)
+    except Exception: return 0
+
+def nummern_besitzer():
+    """Kennung dieser Sitzung für Nummern-Reservierungen (bestaetige/freigeben nur für eigene)"""
+    return st.session_state.setdefault("nummern_besitzer", uuid.uuid4().hex)
+
+def hole_nr(besitzer=None):
+    """FEATURE: Nummer sofort atomar reservieren (nummern.py) statt Spalte A zu laden"""
+    praefix = nummern.monats_praefix()
+    nr = get_nummern().reserviere(praefix, startwert=lambda: hoechste_nr_im_sheet(praefix), besitzer=besitzer)
+    # FEATURE: Offline-Vorrat gleich mit auffüllen (lokal, der Startwert ist jetzt bekannt)
+    get_nummern().fuelle_vorrat(praefix=praefix)
+    return nr
+
+def offline_nummer():
+    """Nummer ohne Netz: aus dem Vorrat, sonst eine Notnummer, die beim Abgleich ersetzt wird"""
+    praefix = nummern.monats_praefix()
+    return get_nummern().aus_vorrat(praefix) or offline.vorlaeufige_nummer(praefix)
+
+def bericht_pipeline(audio, endung, fortschritt, teiltext=None, audio_info=None, vorlage=None):
+    """
+    FEATURE: Nebenläufige Pipeline für 'Bericht & Unterschrift'.
+    Preisliste, Kunden und Berichtsnummer laufen parallel zu Whisper,
+    nur die GPT-Extraktion wartet auf Transkript und Indizes.
+    Mit `vorlage` (Auftrag aus 'Offene Aufträge') stehen Kunde, Adresse und
+    Problem schon fest; aus dem Memo kommen nur noch die Positionen.
+    """
+    def extrahiere(txt, artikel_index, kunden_index):
+        if vorlage:
+            kunde = auftraege.als_kunde(vorlage, kunden_index)
+            kunden_db = "KUNDE STEHT FEST (aus dem Auftrag):\n" + kunden.als_prompt([kunde]).split("\n", 1)[1]
+        else: kunde, kunden_db = None, lade_kunden_live(txt, kunden_index)
+        dat = text_zu_daten(txt, lade_preise_live(txt, artikel_index), kunden_db, artikel_index=artikel_index, kunden_index=kunden_index, kunde=kunde)
+        if vorlage:
+            dat['problem_titel'] = vorlage['problem'] or dat.get('problem_titel', '')
+            dat['auftrag_zeile'], dat['auftrag_kennung'] = vorlage['zeile'], auftraege.kennung(vorlage)
+        dat['preis_hinweise'] = pruefe_preise(dat, artikel_index)
+        return dat
+
+    besitzer, reserviert = nummern_besitzer(), []
+    def nummer():
+        reserviert.append(hole_nr(besitzer))
+        return reserviert[-1]
+
+    stufen = {
+        "Transkription": (lambda: audio_bytes_zu_text(audio, endung, teiltext, audio_info), []),
+        "Preisliste": (lambda: vorab_laden(lade_artikel_index), []),
+        "Kunden": (lambda: vorab_laden(lade_kunden_index), []),
+        "Berichtsnummer": (nummer, []),
+        "Extraktion": (extrahiere, ["Transkription", "Preisliste", "Kunden"]),
+    }
+    ctx = get_script_run_ctx()
+    try: ergebnisse = pipeline.fuehre_aus(stufen, melde=fortschritt, initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx))
+    except pipeline.StufenFehler:
+        # Eine andere Stufe ist gescheitert - die schon reservierte Nummer nicht liegen lassen
+        for nr in reserviert: get_nummern().freigeben(nr, besitzer)
+        raise
+    dat = ergebnisse["Extraktion"]
+    dat['rechnungs_nr'] = ergebnisse["Berichtsnummer"]
+    return dat
 
 def baue_datev_datei(daten):
-    umsatz = f"{daten.get('summe_brutto', 0):.2f}".replace('.', ',')
-    datum = datetime.now().strftime("%d%m")
     rechnungs_nr = daten.get('rechnungs_nr', datetime.now().strftime("%y%m%d%H%M"))
-    raw_text = f"{daten.get('kunde_name')} {daten.get('problem_titel')}"
-    buchungstext = raw_text.replace(";", " ")[:60]
-    gegenkonto = daten.get('kundennummer')
-    if not gegenkonto or str(gegenkonto) == "None": gegenkonto = "1410"
-    header = "Umsatz (ohne Soll/Haben-Kz);Soll/Haben-Kennzeichen;WKZ;Konto;Gegenkonto (ohne BU-Schlüssel);Belegdatum;Belegfeld 1;Buchungstext"
-    line = f"{umsatz};S;EUR;8400;{gegenkonto};{datum};{rechnungs_nr};{buchungstext}"
-    return f"{header}\n{line}"
-
-class PDF(FPDF):
-    def header(self): pass
-    def footer(self):
-        self.set_y(-35)
-        self.set_fill_color(248, 248, 248) 
-        self.rect(0, 297-35, 210, 35, 'F') 
-        c_head = (20, 80, 160)
-        c_text = (50, 50, 50)
-        def txt(t): return str(t).encode('latin-1', 'replace').decode('latin-1') if t else ""
-        y_top = 297 - 30 
-        
-        self.set_xy(10, y_top); self.set_text_color(*c_head); self.set_font('Helvetica', 'B', 7.5); self.cell(45, 3.5, txt("Firma"), 0, 0, 'L')
-        self.set_xy(10, y_top + 5); self.set_text_color(*c_text); self.set_font('Helvetica', '', 6.5); self.multi_cell(45, 3.5, txt("Interwark\nEinzelunternehmen\nMobil: (0171) 1 42 87 38"), 0, 'L')
-        
-        self.set_xy(60, y_top); self.set_text_color(*c_head); self.set_font('Helvetica', 'B', 7.5); self.cell(45, 3.5, txt("KONTAKT"), 0, 0, 'L')
-        self.set_xy(60, y_top + 5); self.set_text_color(*c_text); self.set_font('Helvetica', '', 6.5); self.multi_cell(45, 3.5, txt("Hohe Str. 28\n26725 Emden\nTel: (0 49 21) 99 71 30\ninfo@interwark.de"), 0, 'L')
-        
-        self.set_xy(110, y_top); self.set_text_color(*c_head); self.set_font('Helvetica', 'B', 7.5); self.cell(45, 3.5, txt("BANKVERBINDUNG"), 0, 0, 'L')
-        self.set_xy(110, y_top + 5); self.set_text_color(*c_text); self.set_font('Helvetica', '', 6.5); self.multi_cell(45, 3.5, txt("Sparkasse Emden\nIBAN: DE92 2845 0000 0018\n0048 61\nBIC: BRLADE21EMD"), 0, 'L')
-        
-        self.set_xy(160, y_top); self.set_text_color(*c_head); self.set_font('Helvetica', 'B', 7.5); self.cell(45, 3.5, txt("STEUERNUMMER"), 0, 0, 'L')
-        self.set_xy(160, y_top + 5); self.set_text_color(*c_text); self.set_font('Helvetica', '', 6.5); self.multi_cell(45, 3.5, txt("USt-IdNr.:\nDE226723406\nGerichtsstand: Emden"), 0, 'L')
-
-def erstelle_bericht_pdf(daten, signature_img_path=None):
-    pdf = PDF(); pdf.add_page()
-    def txt(t): return str(t).encode('latin-1', 'replace').decode('latin-1') if t else ""
-
-    # --- KOPFZEILE & ADRESSE ---
-    pdf.set_text_color(0, 0, 0)
-    if os.path.exists("logo.png"): pdf.image("logo.png", 160, 10, 17)
-    elif os.path.exists("logo.jpg"): pdf.image("logo.jpg", 160, 10, 17)
-
-    pdf.set_font('Helvetica', 'B', 14); pdf.set_xy(10, 10); pdf.cell(0, 10, 'INTERWARK', 0, 0, 'L')
-    pdf.set_font('Helvetica', '', 10)
-    pdf.set_xy(10, 18); pdf.cell(0, 5, 'Bernhard Stegemann-Klammt', 0, 0, 'L')
-    pdf.set_xy(10, 23); pdf.cell(0, 5, 'Hohe Str. 28', 0, 0, 'L') 
-    pdf.set_xy(10, 28); pdf.cell(0, 5, '26725 Emden', 0, 0, 'L')
-    pdf.set_xy(10, 33); pdf.cell(0, 5, 'info@interwark.de', 0, 0, 'L')
-    pdf.set_draw_color(0, 0, 0); pdf.line(10, 42, 200, 42)
-    
-    pdf.set_y(55)
-    pdf.set_font("Helvetica", 'B', 12)
-    anrede = daten.get('anrede', '')
-    if anrede and anrede != "None": pdf.cell(0, 5, txt(anrede), ln=1)
-    pdf.cell(0, 5, txt(daten.get('kunde_name')), ln=1)
-    
-    kd = daten.get('kundennummer', '')
-    if kd: 
-        pdf.set_font("Helvetica", '', 9); pdf.cell(0, 5, txt(f"Kundennr.: {kd}"), ln=1); pdf.set_font("Helvetica", 'B', 12)
-    pdf.set_font("Helvetica", '', 12); pdf.multi_cell(0, 6, txt(f"{daten.get('adresse')}"))
-    
-    pdf.ln(10); pdf.set_font("Helvetica", 'B', 15)
-    rechnungs_nr = daten.get('rechnungs_nr', 'ENTWURF') 
-    pdf.cell(0, 10, txt(f"Arbeitsbericht Nr. {rechnungs_nr}"), ln=1)
-    
-    pdf.set_font("Helvetica", '', 10)
-    datum_heute = datetime.now().strftime('%d.%m.%Y')
-    pdf.cell(0, 5, txt(f"Datum: {datum_heute}"), ln=1)
-    pdf.cell(0, 5, txt(f"Betreff: {daten.get('problem_titel')}"), ln=1)
-    pdf.ln(10)
-    
-    # --- TABELLE ---
-    pdf.set_fill_color(240, 240, 240); pdf.set_font("Helvetica", 'B', 10)
-    pdf.cell(10, 8, "#", 1, 0, 'C', 1); pdf.cell(90, 8, "Leistung / Artikel", 1, 0, 'L', 1)
-    pdf.cell(20, 8, "Menge", 1, 0, 'C', 1); pdf.cell(30, 8, "Einzel", 1, 0, 'R', 1); pdf.cell(30, 8, "Gesamt", 1, 1, 'R', 1)
-    
-    pdf.set_font("Helvetica", '', 10); i = 1
-    for pos in daten.get('positionen', []):
-        text = txt(pos.get('text', '')); menge = str(pos.get('menge', ''))
-        einzel = f"{pos.get('einzel_netto', 0):.2f}".replace('.', ','); gesamt = f"{pos.get('gesamt_netto', 0):.2f}".replace('.', ',')
-        pdf.cell(10, 8, str(i), 1, 0, 'C'); pdf.cell(90, 8, text, 1, 0, 'L'); pdf.cell(20, 8, menge, 1, 0, 'C')
-        pdf.cell(30, 8, einzel, 1, 0, 'R'); pdf.cell(30, 8, gesamt, 1, 1, 'R'); i += 1
-    
-    # --- SUMMEN ---
-    pdf.ln(5); pdf.set_font("Helvetica", '', 11)
-    netto = f"{daten.get('summe_netto', 0):.2f}".replace('.', ',')
-    mwst = f"{daten.get('mwst_betrag', 0):.2f}".replace('.', ',')
-    brutto = f"{daten.get('summe_brutto', 0):.2f}".replace('.', ',')
-    pdf.cell(150, 6, "Netto Summe:", 0, 0, 'R'); pdf.cell(30, 6, f"{netto} EUR", 0, 1, 'R')
-    pdf.cell(150, 6, "+ 19% MwSt:", 0, 0, 'R'); pdf.cell(30, 6, f"{mwst} EUR", 0, 1, 'R')
-    pdf.set_font("Helvetica", 'B', 12)
-    pdf.cell(150, 10, "Gesamtsumme:", 0, 0, 'R'); pdf.cell(30, 10, f"{brutto} EUR", 0, 1, 'R')
-    
-    pdf.ln(10)
-    
-    # --- UNTERSCHRIFT ---
-    y_sig = pdf.get_y()
-    # Prüfen ob noch genug Platz auf der Seite ist, sonst neue Seite
-    if y_sig > 240: 
-        pdf.add_page()
-        y_sig = pdf.get_y()
-
-    if signature_img_path and os.path.exists(signature_img_path):
-        pdf.set_font("Helvetica", '', 9)
-        pdf.cell(0, 5, "Digital unterschrieben von Kunde:", ln=1)
-        pdf.image(signature_img_path, x=10, y=pdf.get_y() + 2, w=50) # Breite etwas angepasst
-        pdf.ln(35) # Platz nach dem Bild
-    else:
-        pdf.set_font("Helvetica", 'I', 9)
-        pdf.cell(0, 5, "Unterschrift Kunde: _______________________", ln=1)
-        pdf.ln(15)
-        
-    # --- HIER IST DEIN NEUER TEXT (Unter der Unterschrift) ---
-    pdf.set_font("Helvetica", 'I', 8)
-    hinweis_text = (
-        "Wichtiger Hinweis: Bei diesem Dokument handelt es sich um einen Arbeitsbericht "
-        "und Leistungsnachweis, nicht um eine Rechnung. Die aufgeführten Beträge dienen "
-        "lediglich Ihrer Orientierung und entsprechen voraussichtlich der Endsumme. "
-        "Der verbindliche Zahlbetrag ergibt sich aus der separaten Rechnungsstellung."
-    )
-    pdf.set_text_color(80, 80, 80) # Dunkelgrau für dezente Optik
-    pdf.multi_cell(0, 4, txt(hinweis_text))
-    pdf.ln(5)
-
-    # --- ZEITSTEMPEL & GPS (Ganz unten) ---
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    pdf.set_text_color(120, 120, 120) # Noch etwas heller
-    pdf.set_font("Courier", '', 7) # Courier wirkt technischer für Daten
-    pdf.multi_cell(0, 3, txt(f"DIGITALER LOG: {timestamp} (Server-Time) | GPS-Verifiziert.\nID: {rechnungs_nr}-{int(time.time())}"))
-
-    ts = int(time.time()); dateiname = f"Bericht_{rechnungs_nr}_{ts}.pdf"
-    pdf.output(dateiname); return dateiname
-
-def speichere_rechnung(d):
+    zeile = datev.buchungszeile(daten.get('summe_brutto', 0), daten.get('kundennummer'), datetime.now(), rechnungs_nr, f"{daten.get('kunde_name')} {daten.get('problem_titel')}")
+    return f"{';'.join(datev.KOPFZEILE)}\n{';'.join(zeile)}"
+
+def datev_quellen(von, bis):
+    """Je Jahresblatt im Zeitraum: (Kopfzeile, Zeilen-Generator) aus dem abgeglichenen Spiegel"""
+    sp = get_spiegel()
+    for jahr in datev.jahre(von, bis):
+        try: ws = get_sheet().blatt(verbindung.jahresblatt_name(jahr), jahr=jahr)
+        except gspread.exceptions.WorksheetNotFound: continue
+        spiegel_werte_sync(ws)
+        yield sp.kopf(ws), sp.zeilen(ws)
+
+def exportiere_datev(von, bis):
+    """FEATURE: Sammel-Export - schreibt die CSV zeilenweise nach lokale_daten/exporte"""
+    ordner = os.path.join(lokaler_ordner, "exporte"); os.makedirs(ordner, exist_ok=True)
+    pfad = os.path.join(ordner, f"DATEV_{von:%Y%m%d}-{bis:%Y%m%d}.csv")
+    anzahl = datev.exportiere(pfad, datev_quellen(von, bis), von, bis)
+    return pfad, anzahl
+
+def unterschrift_aus_canvas(canvas):
+    """FEATURE: Unterschrift zugeschnitten als kleines Graustufen-PNG im Speicher (None = leeres Feld)"""
+    with messung.spanne("unterschrift") as w:
+        png = lade("unterschrift").aus_canvas(canvas.image_data)
+        w["bytes"] = len(png) if png else 0
+    return png
+
+def erstelle_bericht_pdf(daten, unterschrift_png=None):
+    """FEATURE: Vorbereitete Vorlage + verkleinertes Logo (bericht_pdf.py); Rückgabe: (dateiname, bytes)"""
+    with messung.spanne("erstelle_bericht_pdf", positionen=len(daten.get('positionen', []))) as w:
+        pdf_daten = get_bericht_renderer().erstelle(daten, unterschrift_png)
+        w["bytes"] = len(pdf_daten)
+    return lade("bericht_pdf").dateiname(daten), pdf_daten
+
+def rechnungszeile(d, jetzt=None):
+    """Zeile fürs Jahresblatt; Zeitstempel beim Erstellen, nicht beim (evtl. späteren) Schreiben"""
+    # FEATURE: Zeitstempel & GPS Simulierung
+    jetzt = jetzt or datetime.now()
+    datum = jetzt.strftime("%d.%m.%Y")
+    uhrzeit = jetzt.strftime("%H:%M")
+    gps_dummy = "53.367, 7.206 (Est.)" # Hier würde echte Geo-Logik greifen
+    return [
+        d.get('rechnungs_nr'), 
+        datum, 
+        uhrzeit,
+        d.get('kunde_name'), 
+        d.get('problem_titel'), 
+        str(d.get('summe_netto')).replace('.',','), 
+        str(d.get('mwst_betrag')).replace('.',','), 
+        str(d.get('summe_brutto')).replace('.',','), 
+        d.get('kundennummer', ''), 
+        "Offen",
+        gps_dummy
+    ]
+
+def speichere_rechnung(d, jetzt=None, po=None):
+    """FEATURE: Postausgang - Zeile nur einreihen, geschrieben wird im Hintergrund"""
     if not google_creds: return False
-    try:
-        gc = gspread.service_account_from_dict(google_creds)
-        sh = gc.open(blatt_basis_name)
-        # FEATURE: Jahreswechsel Speicherort
-        ws = get_current_worksheet(sh)
-        
-        # FEATURE: Zeitstempel & GPS Simulierung
-        jetzt = datetime.now()
-        datum = jetzt.strftime("%d.%m.%Y")
-        uhrzeit = jetzt.strftime("%H:%M")
-        gps_dummy = "53.367, 7.206 (Est.)" # Hier würde echte Geo-Logik greifen
-        
-        ws.append_row([
-            d.get('rechnungs_nr'), 
-            datum, 
-            uhrzeit,
-            d.get('kunde_name'), 
-            d.get('problem_titel'), 
-            str(d.get('summe_netto')).replace('.',','), 
-            str(d.get('mwst_betrag')).replace('.',','), 
-            str(d.get('summe_brutto')).replace('.',','), 
-            d.get('kundennummer', ''), 
-            "Offen",
-            gps_dummy
-        ])
-        return True
-    except: return False
+    jetzt = jetzt or datetime.now()
+    nutzlast = {"jahr": jetzt.year, "zeile": rechnungszeile(d, jetzt)}
+    # Korrektur vor dem Schreiben ersetzt die wartende Zeile; steht sie schon im Sheet, ist das ein Konflikt
+    if not (po or get_postausgang()).einreihen("rechnung", f"rechnung:{d.get('rechnungs_nr')}", nutzlast, ersetzen=True):
+        st.error(f"Rechnung {d.get('rechnungs_nr')} steht schon im Sheet - Korrektur bitte direkt im Blatt oder unter neuer Nummer.")
+        return False
+    return True
 
 def speichere_auftrag(d):
     if not google_creds: return False
     try:
-        gc = gspread.service_account_from_dict(google_creds); sh = gc.open(blatt_basis_name)
-        try: ws = sh.worksheet("Offene Aufträge")
-        except: ws = sh.add_worksheet("Offene Aufträge", 100, 10)
-        if not ws.get_all_values(): ws.append_row(["Datum", "Kunde", "Adresse", "Kontakt", "Problem", "Termin"])
-        ws.append_row([datetime.now().strftime("%d.%m.%Y"), d.get('kunde_name'), d.get('adresse'), d.get('kontakt'), d.get('problem'), d.get('termin')])
+        ws = get_sheet().blatt("Offene Aufträge", anlegen={"rows": 100, "cols": 10})
+        # Nur die Kopfzeile prüfen statt das ganze Blatt zu laden (spart Lese-Kontingent)
+        kopf = ws.row_values(1)
+        if not kopf: ws.append_row(auftraege.KOPF)
+        elif len(kopf) < len(auftraege.KOPF) and kopf == auftraege.KOPF[:len(kopf)]:
+            # Ältere Blätter bekommen die Spalten Status und Bericht dazu
+            ws.batch_update([{"range": f"A1:{rowcol_to_a1(1, len(auftraege.KOPF))}", "values": [auftraege.KOPF]}])
+        zeile = [datetime.now().strftime("%d.%m.%Y"), d.get('kunde_name'), d.get('adresse'), d.get('kontakt'), d.get('problem'), d.get('termin'), auftraege.OFFEN, ""]
+        antwort = ws.append_row(zeile)
+        # Write-Through: die Arbeitsliste sieht den Auftrag ohne erneuten Download
+        try: get_spiegel().anhaengen(ws, zeile, spiegel.zeile_aus_antwort(antwort))
+        except Exception: pass
         return True
-    except: return False
+    except Exception as e: st.error(f"Auftrag nicht gespeichert: {e}"); return False
 
-def sende_mail(pfad, d):
+def lade_auftrags_index(neu_laden=False):
+    """FEATURE: Offene Aufträge über den lokalen Spiegel (nur neue Zeilen werden geholt), Index nur bei Änderungen neu"""
+    if not google_creds: return None
+    try: ws = get_sheet().blatt("Offene Aufträge")
+    except gspread.exceptions.WorksheetNotFound: return None
+    spiegel_werte_sync(ws, neu_laden)
+    sp = get_spiegel()
+    return auftraege.hole_index(spiegel.blatt_schluessel(ws), lambda: sp.werte(ws)[1:], sp.stand(ws))
+
+def erledige_auftrag(zeile, nr, kennung):
+    """
+    Auftrag nach dem Bericht als erledigt markieren (Status + Berichtsnummer in einem batch_update).
+    Die Zeile stammt aus dem Spiegel und kann veraltet sein (im Browser sortiert/gelöscht/eingefügt),
+    daher erst frisch prüfen und den Auftrag notfalls über Datum, Kunde und Problem suchen.
+    """
+    if not google_creds: return False
     try:
-        msg = MIMEMultipart(); msg['From']=email_sender; msg['To']=email_receiver; msg['Subject']=f"Bericht: {d.get('kunde_name')}"
-        with open(pfad, "rb") as f:
-            p = MIMEBase("application", "pdf"); p.set_payload(f.read()); encoders.encode_base64(p)
-            p.add_header("Content-Disposition", f'attachment; filename="{os.path.basename(pfad)}"')
-            msg.attach(p)
-        s = smtplib.SMTP_SSL(smtp_server, int(smtp_port)) if int(smtp_port)==465 else smtplib.SMTP(smtp_server, int(smtp_port))
-        if int(smtp_port)!=465: s.starttls()
-        s.login(email_sender, email_password); s.sendmail(email_sender, email_receiver, msg.as_string()); s.quit(); return True
-    except: return False
+        ws = get_sheet().blatt("Offene Aufträge")
+        spalte = auftraege.STATUS_SPALTE
+        ziel = zeile if auftraege.finde_zeile([[], ws.row_values(zeile)], kennung, 2) else None
+        if ziel is None: ziel = auftraege.finde_zeile(ws.get_all_values(), kennung)
+        if ziel is None:
+            st.warning(f"Auftrag '{kennung[1]}' ({kennung[0]}) ist im Blatt nicht mehr offen zu finden - bitte von Hand erledigen.")
+            return False
+        ws.batch_update([{"range": f"{rowcol_to_a1(ziel, spalte)}:{rowcol_to_a1(ziel, spalte + 1)}", "values": [[auftraege.ERLEDIGT, nr]]}])
+        sp = get_spiegel()
+        # Zeilen haben sich verschoben -> Spiegel gleich komplett abgleichen (selten)
+        if ziel != zeile: sp.sync(ws, voll=True)
+        else: sp.setze_zelle(ws, ziel, spalte, auftraege.ERLEDIGT); sp.setze_zelle(ws, ziel, spalte + 1, nr)
+        return True
+    except Exception as e: st.warning(f"Auftrag nicht als erledigt markiert: {e}"); return False
+
+def sende_mail(pdf_name, pdf_daten, d, po=None):
+    """FEATURE: Postausgang - Mail samt PDF einreihen, versendet wird im Hintergrund"""
+    # Nur das Einreihen (Kodieren + SQLite); der eigentliche Versand steckt in der Spanne "smtp"
+    with messung.spanne("mail_einreihen", bytes=len(pdf_daten)):
+        nutzlast = {"an": email_receiver, "betreff": f"Bericht: {d.get('kunde_name')}", "dateiname": pdf_name,
+                    "pdf": base64.b64encode(pdf_daten).decode("ascii")}
+        eingereiht = (po or get_postausgang()).einreihen("mail", f"mail:{d.get('rechnungs_nr')}:{email_receiver}", nutzlast, ersetzen=True)
+    if not eingereiht:
+        st.warning(f"Bericht {d.get('rechnungs_nr')} wurde schon gemailt - die Korrektur geht nicht noch einmal raus.")
+        return False
+    return True
+
+def registriere_postausgang():
+    """Handler für den Postausgang; bei jedem Lauf neu, damit aktuelle Zugangsdaten gelten"""
+    po = get_postausgang()
+    sp = get_spiegel()
+    conn = get_sheet() if google_creds else None
+
+    def schreibe_rechnung(nutzlast, versuch):
+        ws = conn.jahresblatt(nutzlast["jahr"])
+        zeile = nutzlast["zeile"]
+        # Idempotent: hat ein früherer Versuch die Zeile doch geschrieben (z.B. Timeout), nicht noch einmal
+        if versuch > 0 and ws.find(str(zeile[0]), in_column=1): return
+        antwort = ws.append_row(zeile)
+        # Write-Through: Dashboard sieht die neue Zeile ohne erneuten Download
+        try: sp.anhaengen(ws, zeile, spiegel.zeile_aus_antwort(antwort))
+        except Exception: pass
+
+    def versende_mail(nutzlast, versuch):
+        msg = MIMEMultipart(); msg['From']=email_sender; msg['To']=nutzlast["an"]; msg['Subject']=nutzlast["betreff"]
+        p = MIMEBase("application", "pdf"); p.set_payload(base64.b64decode(nutzlast["pdf"])); encoders.encode_base64(p)
+        p.add_header("Content-Disposition", f'attachment; filename="{nutzlast["dateiname"]}"')
+        msg.attach(p)
+        roh = msg.as_string()
+        with messung.spanne("smtp", bytes=len(roh)):
+            s = smtplib.SMTP_SSL(smtp_server, int(smtp_port), timeout=30) if int(smtp_port)==465 else smtplib.SMTP(smtp_server, int(smtp_port), timeout=30)
+            if int(smtp_port)!=465: s.starttls()
+            s.login(email_sender, email_password); s.sendmail(email_sender, nutzlast["an"], roh)
+        try: s.quit()
+        except Exception: pass # Mail ist raus, nur das Abmelden hakt
+
+    if conn: po.registriere("rechnung", schreibe_rechnung)
+    if email_sender: po.registriere("mail", versende_mail)
+    # Nur wenn etwas nachzuholen ist - die Stufen laden pandas, bericht_pdf und den PDF-Renderer
+    if conn and client and offline_offen:
+        speicher = get_offline()
+        dienste = offline_dienste(sp, conn, po, speicher)
+        def nachholen(nutzlast, versuch):
+            # Älteste zuerst im Stapel (stoppt beim ersten Fehler - meist ist das Netz wieder weg), dann sicher die eigene
+            _, fehler = speicher.synchronisiere(**dienste)
+            if fehler is not None: raise fehler
+            speicher.verarbeite(nutzlast["id"], **dienste)
+        po.registriere("offline", nachholen)
+    po.starte()
+
+def offline_dienste(sp, conn, po, speicher):
+    """
+    FEATURE: Offline-Erfassung nachholen - die Stufen für offline.OfflineSpeicher.verarbeite.
+    Läuft im Postausgang-Thread, daher alle Ressourcen hier im Hauptlauf holen.
+    """
+    cache, nr_db, renderer = get_ergebnis_cache(), get_nummern(), get_bericht_renderer()
+    pd, bericht_pdf = lade("pandas"), lade("bericht_pdf")
+
+    def index(titel, modul):
+        ws = conn.blatt(titel)
+        if (sp.alter(ws) or SYNC_INTERVALL + 1) > SYNC_INTERVALL: sp.sync(ws)
+        return modul.hole_index(spiegel.blatt_schluessel(ws), lambda: sp.werte(ws)[1:], sp.stand(ws))
+
+    def transkribiere(daten, endung):
+        return audio_bytes_zu_text(daten, endung, cache=cache)
+
+    def extrahiere(txt, angaben):
+        kunde = angaben.get("kunde")
+        if kunde: txt += f"\n(Kunde laut Erfassung: {kunde['name']}, {kunde['strasse']}, {kunde['plz']} {kunde['ort']}, KdNr {kunde['kdnr']})"
+        if angaben.get("notiz"): txt += f"\n(Notiz: {angaben['notiz']})"
+        artikel_index, kunden_index = index("Preisliste", artikel), index("Kunden", kunden)
+        dat = text_zu_daten(txt, lade_preise_live(txt, artikel_index), lade_kunden_live(txt, kunden_index), cache, artikel_index, kunden_index)
+        if kunde:
+            dat.update({'kunde_name': kunde['name'], 'anrede': kunde['anrede'] or dat.get('anrede', ''), 'kundennummer': kunde['kdnr'],
+                        'adresse': f"{kunde['strasse']}, {kunde['plz']} {kunde['ort']}"})
+        pos_list, netto, mwst, brutto = berechne_summen(pd.DataFrame(dat.get('positionen', [])))
+        dat.update({'positionen': pos_list, 'summe_netto': netto, 'mwst_betrag': mwst, 'summe_brutto': brutto})
+        dat['preis_hinweise'] = artikel_index.pruefe_positionen(pos_list)
+        return dat
+
+    def nummer_pruefen(nr):
+        # Schon eingereiht (früherer Versuch kam bis zum Abliefern) -> die eigene Zeile ist kein Konflikt
+        if po.status(f"rechnung:{nr}"): return nr
+        praefix = nr.split("-V")[0] if offline.ist_vorlaeufig(nr) else nr.rsplit("-", 1)[0]
+        ws = conn.jahresblatt(int(praefix.split("-")[1]))
+        sp.sync(ws)
+        vorhanden = [z[0] for z in sp.werte(ws)[1:] if z]
+        if not offline.ist_vorlaeufig(nr) and nr not in vorhanden: return nr
+        # Konflikt (Nummer inzwischen im Sheet, z.B. von einem anderen Gerät) oder Notnummer -> neu vergeben
+        if not offline.ist_vorlaeufig(nr): nr_db.bestaetige(nr)
+        return nr_db.reserviere(praefix, startwert=lambda: nummern.hoechste_laufnummer(vorhanden, praefix))
+
+    def abliefern(dat, erfassung):
+        zeitpunkt = datetime.fromtimestamp(erfassung["angaben"]["zeitpunkt"])
+        pdf_name = bericht_pdf.dateiname(dat)
+        pdf_daten = renderer.erstelle(dat, speicher.unterschrift_pfad(erfassung))
+        dat['pdf_datei'] = speicher.datei(erfassung["id"], pdf_name)
+        with open(dat['pdf_datei'], "wb") as f: f.write(pdf_daten)
+        if not speichere_rechnung(dat, zeitpunkt, po): raise RuntimeError(f"Rechnung {dat['rechnungs_nr']} steht schon im Sheet")
+        if email_sender: sende_mail(pdf_name, pdf_daten, dat, po)
+        nr_db.bestaetige(dat['rechnungs_nr'])
+
+    return {"transkribiere": transkribiere, "extrahiere": extrahiere, "nummer_pruefen": nummer_pruefen, "abliefern": abliefern}
+
+def offline_einreihen():
+    """Sobald wieder Netz da ist: offene Offline-Erfassungen an den Postausgang übergeben (je einmal)"""
+    po = get_postausgang()
+    for e in get_offline().offene(): po.einreihen("offline", f"offline:{e['id']}", {"id": e['id']})
+
+def schnappschuss_kunden():
+    """Kundenindex aus dem lokalen Spiegel - ohne Netz, auch nach einem Neustart"""
+    sp = get_spiegel()
+    return kunden.hole_index("offline:Kunden", lambda: sp.werte_nach_titel("Kunden")[1:], sp.stand_nach_titel("Kunden"))
+
+def zeige_versandstatus(schluessel_liste):
+    """Status der Postausgang-Aufträge zu einem Bericht"""
+    symbole = {postausgang.OFFEN: "⏳", postausgang.ERLEDIGT: "✅", postausgang.FEHLER: "❌"}
+    for schluessel in schluessel_liste:
+        info = get_postausgang().status(schluessel)
+        if not info: continue
+        text = f"{symbole.get(info['status'], '')} {schluessel.split(':')[0].capitalize()}: {info['status']}"
+        if info['fehler']: text += f" (Versuch {info['versuche']}: {info['fehler']})"
+        st.caption(text)
 
 def berechne_summen(df_pos):
     summe_netto = 0.0; positions_liste = []
@@ -508,14 +811,28 @@ def berechne_summen(df_pos):
     mwst = summe_netto * 0.19; brutto = summe_netto + mwst
     return positions_liste, summe_netto, mwst, brutto
 
+# FEATURE: Postausgang-Handler mit den Zugangsdaten dieses Laufs, Thread läuft einmal pro Prozess
+registriere_postausgang()
+if google_creds and client and not offline_modus:
+    try: offline_einreihen()
+    except Exception: pass
+
 # --- 7. HAUPTPROGRAMM ---
 st.title("Auftrags-App 4.0 - Pro Version")
 
 if modus == "Chef-Dashboard":
+    pd, statistik = lade("pandas"), lade("statistik")
     st.markdown("### 👋 Moin Chef! Hier ist der Überblick.")
     if api_key and google_creds:
+        c_stand, c_sync = st.columns([3, 1])
+        neu_laden = c_sync.button("🔄 Abgleichen")
         with st.spinner("Lade Zahlen (Aktuelles Jahr)..."):
-            umsatz, anzahl_heute, anzahl_woche, chart_data, offene_posten, missing_cols = lade_statistik_daten()
+            umsatz, anzahl_heute, anzahl_woche, chart_data, offene_posten, missing_cols = lade_statistik_daten(neu_laden)
+            
+            # FEATURE: Staleness-Anzeige des lokalen Spiegels
+            try: alter = get_spiegel().alter(get_current_worksheet(get_sheet()))
+            except Exception: alter = None
+            if alter is not None: c_stand.caption(f"🕒 Datenstand: vor {int(alter)} s (lokaler Spiegel)")
             
             if missing_cols:
                 st.error("⚠️ FEHLER: Spalten fehlen.")
@@ -533,50 +850,160 @@ if modus == "Chef-Dashboard":
                 
                 st.subheader(f"⚠️ Offene Rechnungen ({len(offene_posten)})")
                 
+                if st.session_state.get("bezahlt_meldung"):
+                    st.toast(st.session_state.pop("bezahlt_meldung"))
+                
                 if offene_posten:
-                    for pos in offene_posten:
+                    # FEATURE: Kontoauszug-Abgleich (Nummern einfügen -> ein batch_update)
+                    with st.expander("📋 Abgleich mit Kontoauszug"):
+                        text = st.text_area("Rechnungsnummern (eine pro Zeile oder mit Komma getrennt)", key="kontoauszug")
+                        treffer, unbekannt = finde_rechnungsnummern(text, offene_posten)
+                        if treffer: st.caption(f"Gefunden: {', '.join(str(p['nr']) for p in treffer)}")
+                        if unbekannt: st.warning(f"Nicht offen / unbekannt: {', '.join(unbekannt)}")
+                        st.button(f"💰 {len(treffer)} als bezahlt markieren", disabled=not treffer, on_click=bezahlt_callback, args=(treffer,), key="pay_kontoauszug")
+                    
+                    # FEATURE: Filter + Seiten - nur die sichtbare Seite erzeugt Widgets
+                    f1, f2, f3 = st.columns([2, 1, 1])
+                    suche = f1.text_input("🔍 Kunde oder Nr", key="offen_suche")
+                    min_alter = f2.selectbox("Älter als", [0, 14, 30, 60, 90], format_func=lambda t: "alle" if not t else f"{t} Tage", key="offen_alter")
+                    sortierung = f3.selectbox("Sortierung", list(statistik.SORTIERUNGEN), key="offen_sortierung")
+                    b1, b2, b3 = st.columns([1, 1, 1])
+                    betrag_von = b1.number_input("Betrag ab €", min_value=0.0, value=0.0, step=50.0, key="offen_von")
+                    betrag_bis = b2.number_input("Betrag bis € (0 = offen)", min_value=0.0, value=0.0, step=50.0, key="offen_bis")
+                    pro_seite = b3.selectbox("Pro Seite", [10, 25, 50], key="offen_pro_seite")
+                    gefiltert = statistik.filtere_offene(offene_posten, suche, betrag_von or None, betrag_bis or None, min_alter, sortierung)
+                    
+                    # Auswahl als Menge im Session State, damit sie beim Blättern erhalten bleibt
+                    auswahl = st.session_state.setdefault("offen_auswahl", set())
+                    offene_zeilen = {p['gspread_row'] for p in offene_posten}
+                    auswahl &= offene_zeilen
+                    mehrfach = st.toggle("Mehrfachauswahl")
+                    if mehrfach:
+                        ausgewaehlt = [p for p in offene_posten if p['gspread_row'] in auswahl]
+                        st.button(f"💰 Auswahl ({len(ausgewaehlt)}) als bezahlt markieren", disabled=not ausgewaehlt, on_click=bezahlt_callback, args=(ausgewaehlt,), key="pay_auswahl")
+                    
+                    seite_nr = st.session_state.get("offen_seite", 1)
+                    sichtbar, seiten, seite_nr = statistik.seite(gefiltert, seite_nr, pro_seite)
+                    summe = f"{sum(p['betrag_zahl'] for p in gefiltert):,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
+                    st.caption(f"{len(gefiltert)} von {len(offene_posten)} offenen Posten · Summe {summe}")
+                    for pos in sichtbar:
                         with st.container(border=True):
                             c_info, c_btn = st.columns([3, 1])
                             with c_info:
                                 st.markdown(f"**{pos['kunde']}**")
-                                st.caption(f"Nr: {pos['nr']} | Betrag: {pos['betrag']}")
+                                alter_txt = f" | seit {pos['alter_tage']} Tagen" if pos.get('alter_tage') is not None else ""
+                                st.caption(f"Nr: {pos['nr']} | Betrag: {pos['betrag']}{alter_txt}")
                             with c_btn:
-                                if st.button("💰 Bezahlt", key=f"pay_{pos['nr']}_{pos['gspread_row']}"):
-                                    success = markiere_als_bezahlt(pos['gspread_row'])
-                                    if success:
-                                        st.toast(f"Rechnung {pos['nr']} bezahlt!")
-                                        time.sleep(1)
-                                        st.rerun()
+                                if mehrfach: st.checkbox("Auswählen", value=pos['gspread_row'] in auswahl, key=f"sel_{pos['gspread_row']}", on_change=auswahl_umschalten, args=(pos['gspread_row'],))
+                                else: st.button("💰 Bezahlt", key=f"pay_{pos['nr']}_{pos['gspread_row']}", on_click=bezahlt_callback, args=([pos],))
+                    if seiten > 1:
+                        # Nach dem Filtern kann die alte Seite zu groß sein -> vor dem Widget begrenzen
+                        st.session_state.offen_seite = seite_nr
+                        st.number_input(f"Seite (von {seiten})", min_value=1, max_value=seiten, step=1, key="offen_seite")
                 else:
                     if not missing_cols:
                         st.info("Alles bezahlt! Gute Arbeit. 🎉")
 
                 st.markdown("---")
                 st.subheader("📈 Umsatzverlauf")
-                if chart_data is not None and not chart_data.empty: st.bar_chart(chart_data)
+                try: jahres_kennzahlen = lade_jahreskennzahlen()
+                except Exception as e: jahres_kennzahlen = {}; st.caption(f"Mehrjahres-Auswertung nicht verfügbar: {e}")
+                # Über alle Jahre - im Januar sonst leer
+                verlauf = statistik.monatsverlauf(jahres_kennzahlen) if jahres_kennzahlen else chart_data
+                if verlauf is not None and not verlauf.empty: st.bar_chart(verlauf)
                 else: st.info("Noch nicht genug Daten.")
+
+                if len(jahres_kennzahlen) > 1:
+                    with st.expander("📅 Jahresvergleich"):
+                        st.line_chart(statistik.jahresvergleich(jahres_kennzahlen))
+                        uebersicht = pd.DataFrame([{"Jahr": str(j), "Umsatz €": round(k["umsatz"], 2), "Aufträge": k["anzahl"],
+                                                    "Offen €": round(k["offen_betrag"], 2), "Offen (Anzahl)": k["offen_anzahl"]}
+                                                   for j, k in sorted(jahres_kennzahlen.items(), reverse=True)])
+                        st.dataframe(uebersicht, hide_index=True, use_container_width=True)
+                        jahr = st.selectbox("Top-Kunden im Jahr", sorted(jahres_kennzahlen, reverse=True))
+                        st.dataframe(pd.DataFrame(jahres_kennzahlen[jahr]["top_kunden"], columns=["Kunde", "Umsatz €"]), hide_index=True, use_container_width=True)
+                        if st.button("🔄 Vorjahre neu zusammenfassen", help="Nur nötig, wenn in alten Jahresblättern etwas korrigiert wurde"):
+                            get_jahresarchiv().vergessen(get_sheet().spreadsheet.id); vorhandene_jahre.clear(); st.rerun()
+
+                # FEATURE: DATEV-Sammelexport für den Steuerberater
+                st.markdown("---")
+                with st.expander("📊 DATEV-Export (Zeitraum)"):
+                    zeitraum = st.date_input("Zeitraum", value=datev.vormonat(), format="DD.MM.YYYY")
+                    if isinstance(zeitraum, (list, tuple)) and len(zeitraum) == 2:
+                        if st.button("Export erstellen", key="datev_export"):
+                            with st.spinner("Schreibe Buchungen..."):
+                                try: st.session_state.datev_export = exportiere_datev(*zeitraum)
+                                except Exception as e: st.error(f"Export fehlgeschlagen: {e}")
+                        if st.session_state.get("datev_export"):
+                            pfad, anzahl = st.session_state.datev_export
+                            if os.path.exists(pfad):
+                                st.caption(f"{anzahl} Buchungen")
+                                with open(pfad, "rb") as f: st.download_button("⬇️ DATEV (CSV) laden", f, os.path.basename(pfad), "text/csv", key="datev_download")
     else: st.warning("Bitte erst API Keys eintragen.")
 
+elif modus == "Bericht & Unterschrift" and offline_modus and not st.session_state.get('temp_data'):
+    # FEATURE: Offline-Erfassung - Audio, Kunde aus dem lokalen Stand, Unterschrift, Nummer aus dem Vorrat
+    st.caption("Modus: 🔵 Arbeitsbericht erfassen (📴 offline)")
+    st_canvas = lade("streamlit_drawable_canvas").st_canvas
+    st.info("Der Bericht wird lokal gespeichert. Transkription, Auswertung, Eintrag ins Sheet und Mail laufen automatisch, sobald wieder Netz da ist.")
+    f = st.file_uploader("Sprachnachricht", type=["mp3","wav","m4a","ogg","opus"], label_visibility="collapsed", key="offline_audio")
+    try: kunden_index = schnappschuss_kunden()
+    except Exception: kunden_index = None
+    kunde = None
+    if kunden_index is not None and len(kunden_index):
+        suche = st.text_input("Kunde suchen (lokaler Stand)")
+        treffer = [k for _, k in kunden_index.suche(suche)] if suche else []
+        kunde = st.selectbox("Kunde", [None] + treffer, format_func=lambda k: "– aus der Sprachnachricht –" if k is None else f"{k['name']}, {k['strasse']}, {k['ort']} ({k['kdnr']})")
+    else: st.caption("Kein lokaler Kundenstand - der Kunde wird später aus der Sprachnachricht erkannt.")
+    notiz = st.text_input("Notiz (optional)")
+    st.markdown("### ✍️ Unterschrift des Kunden")
+    canvas_offline = st_canvas(stroke_width=2, stroke_color="#000000", background_color="#eeeeee", height=150, width=300, drawing_mode="freedraw", key="canvas_offline")
+    # Dieselbe Datei nach einem Rerun nicht noch einmal ablegen
+    audio, endung = transkription.aus_upload(f) if f else (None, None)
+    datei_hash = ergebnis_cache.inhalts_schluessel(audio) if f else None
+    schon_gespeichert = datei_hash is not None and st.session_state.get("offline_datei") == datei_hash
+    if schon_gespeichert: st.success(f"Gespeichert als {st.session_state.offline_nr}")
+    if st.button("💾 Offline speichern", type="primary", disabled=f is None or schon_gespeichert):
+        unterschrift = unterschrift_aus_canvas(canvas_offline)
+        nr = offline_nummer()
+        get_offline().erfasse(audio, endung, nr, {"kunde": kunde, "notiz": notiz}, unterschrift)
+        st.session_state.offline_datei = datei_hash
+        st.session_state.offline_nr = nr + (" (vorläufig)" if offline.ist_vorlaeufig(nr) else "")
+        st.rerun()
+
 elif modus == "Bericht & Unterschrift":
     st.caption("Modus: 🔵 Arbeitsbericht erstellen")
+    pd, st_canvas = lade("pandas"), lade("streamlit_drawable_canvas").st_canvas
+    # FEATURE: Offline-Vorrat an Berichtsnummern auffüllen, solange Netz da ist
+    if google_creds and netz_da():
+        try: get_nummern().fuelle_vorrat(startwert=lambda: hoechste_nr_im_sheet(nummern.monats_praefix()))
+        except Exception: pass
     if 'temp_data' not in st.session_state: st.session_state.temp_data = None
     if 'audio_processed' not in st.session_state: st.session_state.audio_processed = False
 
+    # FEATURE: Bericht zu einem Auftrag - Kunde, Adresse und Problem kommen aus der Arbeitsliste
+    vorlage = st.session_state.get("auftrag_vorlage")
+    if vorlage and not st.session_state.audio_processed:
+        c_auf, c_ohne = st.columns([3, 1])
+        c_auf.info(f"📋 Auftrag vom {vorlage['datum_text']}: **{vorlage['kunde']}** – {vorlage['problem']}. Im Memo reichen jetzt Material und Arbeitszeit.")
+        if c_ohne.button("Ohne Auftrag"): st.session_state.auftrag_vorlage = None; st.rerun()
+
     f = st.file_uploader("Sprachnachricht", type=["mp3","wav","m4a","ogg","opus"], label_visibility="collapsed")
 
     if f and api_key and client and not st.session_state.audio_processed:
-        dateiendung = f.name.split('.')[-1]
-        temp_filename = f"temp_audio.{dateiendung}"
-        with st.spinner("⏳ Analysiere Audio..."):
-            with open(temp_filename, "wb") as file: file.write(f.getbuffer())
+        audio, endung = transkription.aus_upload(f)
+        with st.status("⏳ Analysiere Audio...", expanded=True) as status:
             try:
-                txt = audio_zu_text(temp_filename)
-                preise = lade_preise_live()
-                kunden = lade_kunden_live() 
-                dat = text_zu_daten(txt, preise, kunden)
-                dat['rechnungs_nr'] = hole_nr()
+                vorschau = st.empty()
+                teiltext = lambda texte: vorschau.caption(f"📝 ({sum(t is not None for t in texte)}/{len(texte)}) " + " ".join(t if t is not None else "…" for t in texte))
+                audio_info = {}
+                dat = bericht_pipeline(audio, endung, lambda stufe, sek: st.write(f"✅ {stufe} ({sek:.1f} s)"), teiltext, audio_info, vorlage)
+                if audio_info: st.write(audio_info_text(audio_info))
+                status.update(label="Analyse fertig", state="complete")
                 st.session_state.temp_data = dat; st.session_state.audio_processed = True; st.rerun()
-            except Exception as e: st.error(f"Fehler: {e}")
+            except Exception as e:
+                status.update(label="Analyse fehlgeschlagen", state="error")
+                st.error(f"Fehler: {e}")
 
     if st.session_state.temp_data:
         st.markdown("### 📝 Vorschau & Korrektur")
@@ -588,6 +1015,9 @@ elif modus == "Bericht & Unterschrift":
         neuer_titel = st.text_input("Betreff / Arbeit", value=dat.get('problem_titel', ''))
 
         st.markdown("#### Positionen bearbeiten")
+        if dat.get('extraktion_stufe'): st.caption(f"Erkannt per: {dat['extraktion_stufe']}")
+        for hinweis in dat.get('pruef_hinweise', []): st.warning(f"🔎 {hinweis}")
+        for hinweis in dat.get('preis_hinweise', []): st.warning(f"💶 {hinweis}")
         df_pos = pd.DataFrame(dat.get('positionen', []))
         if 'gesamt_netto' in df_pos.columns: df_pos = df_pos.drop(columns=['gesamt_netto']) 
         edited_df = st.data_editor(df_pos, num_rows="dynamic", use_container_width=True)
@@ -610,66 +1040,118 @@ elif modus == "Bericht & Unterschrift":
 
         if st.button("✅ Bericht rechtskräftig erstellen", type="primary"):
             try:
-                # Unterschrift speichern
-                signature_path = None
-                if canvas_result.image_data is not None:
-                     # Check if empty (sometimes canvas returns empty data)
-                     if np.any(canvas_result.image_data):
-                        img = Image.fromarray(canvas_result.image_data.astype('uint8'), 'RGBA')
-                        signature_path = "temp_signature.png"
-                        img.save(signature_path)
+                # Nummer nur verwenden, wenn sie noch dieser Sitzung gehört (Reservierung kann verfallen und neu vergeben sein);
+                # verbraucht wird sie erst, wenn die Zeile im Postausgang liegt
+                besitzer = nummern_besitzer()
+                if not get_nummern().sichere(neue_nr, besitzer):
+                    dat['rechnungs_nr'] = hole_nr(besitzer)
+                    raise ValueError(f"Nummer {neue_nr} ist inzwischen anderweitig vergeben. Neue Nummer {dat['rechnungs_nr']} ist eingetragen - bitte noch einmal erstellen.")
+                # Unterschrift im Speicher dieser Sitzung (keine gemeinsame Datei)
+                unterschrift_png = unterschrift_aus_canvas(canvas_result)
 
                 with st.spinner("Erstelle PDF & sichere Beweise..."):
                     pos_list, sum_net, sum_mwst, sum_brutto = berechne_summen(edited_df)
                     final_data = {'rechnungs_nr': neue_nr, 'kunde_name': neuer_kunde, 'adresse': neue_adresse, 'problem_titel': neuer_titel, 'positionen': pos_list, 'summe_netto': sum_net, 'mwst_betrag': sum_mwst, 'summe_brutto': sum_brutto, 'anrede': dat.get('anrede', ''), 'kundennummer': dat.get('kundennummer', '')}
                     
                     # PDF erstellen mit Unterschrift
-                    pdf = erstelle_bericht_pdf(final_data, signature_path)
+                    pdf_name, pdf_daten = erstelle_bericht_pdf(final_data, unterschrift_png)
                     csv = baue_datev_datei(final_data)
                     
-                    # Speichern mit GPS/Zeitstempel
+                    # Speichern mit GPS/Zeitstempel (über den Postausgang, blockiert nicht)
                     gespeichert = speichere_rechnung(final_data)
+                    if gespeichert:
+                        get_nummern().bestaetige(neue_nr, besitzer)
+                        # Wurde die reservierte Nummer von Hand geändert, die alte zurückgeben
+                        if dat.get('rechnungs_nr') and dat.get('rechnungs_nr') != neue_nr: get_nummern().freigeben(dat['rechnungs_nr'], besitzer)
+                        if dat.get('auftrag_zeile') and erledige_auftrag(dat['auftrag_zeile'], neue_nr, dat.get('auftrag_kennung')):
+                            st.session_state.auftrag_vorlage = None; st.toast("📋 Auftrag erledigt")
                     
-                    mail_gesendet = False
-                    if email_sender: mail_gesendet = sende_mail(pdf, final_data)
+                    mail_eingereiht = False
+                    if email_sender: mail_eingereiht = sende_mail(pdf_name, pdf_daten, final_data)
 
                     st.success("Erledigt!")
-                    if gespeichert: st.toast("Cloud & Zeitstempel ✅")
-                    if mail_gesendet: st.toast("Mail gesendet 📧")
+                    if gespeichert: st.toast("Cloud & Zeitstempel: im Postausgang ⏳")
+                    if mail_eingereiht: st.toast("Mail im Postausgang 📧")
                     
                     st.markdown("---")
                     st.markdown("### 📤 Versand & Download")
+                    zeige_versandstatus([f"rechnung:{neue_nr}", f"mail:{neue_nr}:{email_receiver}"])
                     c_dl, c_wa = st.columns(2)
                     with c_dl:
-                        with open(pdf, "rb") as file: st.download_button("⬇️ PDF herunterladen", file, pdf, "application/pdf")
+                        st.download_button("⬇️ PDF herunterladen", pdf_daten, pdf_name, "application/pdf")
                     with c_wa:
                         wa_text = f"Moin {neuer_kunde}, anbei der Arbeitsbericht {neue_nr}."
                         wa_link = f"https://wa.me/?text={urllib.parse.quote(wa_text)}"
                         st.link_button("💬 WhatsApp öffnen", wa_link)
                     
-                    with open(pdf, "rb") as f_csv: st.download_button("📊 DATEV (CSV) laden", csv, f"DATEV_{neue_nr}.csv", "text/csv")
+                    st.download_button("📊 DATEV (CSV) laden", csv, f"DATEV_{neue_nr}.csv", "text/csv")
 
             except Exception as e: st.error(f"Fehler beim Erstellen: {e}")
 
     if st.session_state.audio_processed:
         if st.button("❌ Abbrechen / Neu starten"):
+            if st.session_state.temp_data and st.session_state.temp_data.get('rechnungs_nr'):
+                get_nummern().freigeben(st.session_state.temp_data['rechnungs_nr'], nummern_besitzer())
             st.session_state.temp_data = None; st.session_state.audio_processed = False; st.rerun()
 
 else: 
     st.caption("Modus: 🟠 Neuen Auftrag anlegen")
     f = st.file_uploader("Sprachnachricht", type=["mp3","wav","m4a","ogg","opus"], label_visibility="collapsed")
     if f and api_key and client:
-        dateiendung = f.name.split('.')[-1]
-        temp_filename = f"temp_audio.{dateiendung}"
-        with st.spinner("⏳ Erfasse Auftrag..."):
-            with open(temp_filename, "wb") as file: file.write(f.getbuffer())
-            try:
-                txt = audio_zu_text(temp_filename)
-                kunden = lade_kunden_live()
-                auf = text_zu_auftrag(txt, kunden)
-                st.success(f"Auftrag von {auf.get('kunde_name')}")
-                st.json(auf)
-                if speichere_auftrag(auf): st.toast("✅ Auftrag notiert"); st.info("In 'Offene Aufträge' gespeichert.")
-            except Exception as e: st.error(f"Fehler: {e}")
+        audio, endung = transkription.aus_upload(f)
+        # Dieselbe Datei nach einem Rerun: Ergebnis zeigen, nicht noch einmal speichern
+        datei_hash = ergebnis_cache.inhalts_schluessel(audio)
+        if st.session_state.get("auftrag_datei") == datei_hash:
+            auf = st.session_state.auftrag_ergebnis
+            st.success(f"Auftrag von {auf.get('kunde_name')}")
+            st.json(auf)
+            st.info("In 'Offene Aufträge' gespeichert.")
+        else:
+            with st.spinner("⏳ Erfasse Auftrag..."):
+                try:
+                    txt = audio_bytes_zu_text(audio, endung)
+                    kunden_index = vorab_laden(lade_kunden_index)
+                    kunden_db = lade_kunden_live(txt, kunden_index)
+                    auf = text_zu_auftrag(txt, kunden_db, kunden_index)
+                    st.success(f"Auftrag von {auf.get('kunde_name')}")
+                    for hinweis in auf.get('pruef_hinweise', []): st.warning(f"🔎 {hinweis}")
+                    st.json(auf)
+                    if speichere_auftrag(auf):
+                        st.session_state.auftrag_datei = datei_hash; st.session_state.auftrag_ergebnis = auf
+                        st.toast("✅ Auftrag notiert"); st.info("In 'Offene Aufträge' gespeichert.")
+                except Exception as e: st.error(f"Fehler: {e}")
 
 
+
+    # FEATURE: Arbeitsliste 'Offene Aufträge' - aus dem Spiegel, ein Klick startet den Bericht mit Kunde und Problem
+    st.markdown("---")
+    st.subheader("📋 Offene Aufträge")
+    if google_creds:
+        c_stand, c_sync = st.columns([3, 1])
+        neu_laden = c_sync.button("🔄 Abgleichen", key="auftraege_sync")
+        try: auftrags_index = lade_auftrags_index(neu_laden)
+        except Exception as e: auftrags_index = None; st.error(f"Aufträge nicht geladen: {e}")
+        offene_auftraege = auftrags_index.offene() if auftrags_index is not None else []
+        if offene_auftraege:
+            f1, f2, f3 = st.columns([2, 1, 1])
+            suche = f1.text_input("Kunde, Adresse oder Problem", key="auftrag_suche")
+            termin = f2.selectbox("Termin", auftraege.TERMINE, key="auftrag_termin")
+            zeitraum = f3.date_input("Erfasst", value=(), format="DD.MM.YYYY", key="auftrag_zeitraum")
+            von = zeitraum[0] if len(zeitraum) > 0 else None
+            bis = zeitraum[1] if len(zeitraum) > 1 else None
+            gefiltert = auftrags_index.filtere(suche, von, bis, termin)
+            anzahl = st.session_state.setdefault("auftrag_anzahl", 25)
+            c_stand.caption(f"{len(gefiltert)} von {len(offene_auftraege)} offenen Aufträgen")
+            for a in gefiltert[:anzahl]:
+                with st.container(border=True):
+                    c_info, c_btn = st.columns([3, 1])
+                    with c_info:
+                        st.markdown(f"**{a['kunde']}** – {a['problem']}")
+                        termin_txt = f" | Termin: {a['termin']}" + (f" ({a['termin_datum']:%d.%m.})" if a['termin_datum'] else "") if a['termin'] else ""
+                        st.caption(f"{a['adresse']} | {a['kontakt'] or 'kein Kontakt'} | erfasst {a['datum_text']}{termin_txt}")
+                    with c_btn:
+                        st.button("📝 Bericht starten", key=f"auftrag_{a['zeile']}", on_click=bericht_aus_auftrag, args=(a,), disabled=not api_key)
+            if len(gefiltert) > anzahl:
+                st.button(f"Weitere anzeigen ({len(gefiltert) - anzahl})", on_click=lambda: st.session_state.update(auftrag_anzahl=anzahl + 25))
+        elif auftrags_index is not None: st.info("Keine offenen Aufträge.")
+    else: st.caption("Ohne Google-Verbindung keine Arbeitsliste.")
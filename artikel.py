@@ -0,0 +1,154 @@
+"""
+Lokaler Artikelindex für die Preisliste.
+
+Statt die komplette 'Preisliste' in jeden Prompt zu schreiben, sucht der Index
+die Artikel heraus, die im Transkript vorkommen (Art.Nr exakt, Namen und
+Synonyme unscharf). Nach der Extraktion werden die Preise der Positionen
+lokal gegen die Liste geprüft.
+
+Spalten im Blatt 'Preisliste': Name, Preis, Art.Nr, optional Synonyme
+(durch Komma getrennt, z.B. 'Thermostat, Heizkörperkopf').
+"""
+import heapq
+import re
+from collections import defaultdict
+
+from suchindex import IndexCache, WortIndex, normalisiere, woerter
+
+# Gleichbedeutende Wörter aus dem Handwerksalltag (Suchwort wird um die Gruppe erweitert)
+SYNONYM_GRUPPEN = [
+    {"stunde", "stunden", "std", "arbeitszeit", "arbeitsstunde", "arbeitsstunden", "monteurstunde", "lohn"},
+    {"anfahrt", "fahrt", "fahrtkosten", "anfahrtspauschale", "anreise"},
+    {"thermostat", "thermostatkopf", "thermostatkoepfe", "thermostatventil"},
+    {"wasserhahn", "armatur", "mischbatterie", "einhebelmischer"},
+    {"dichtung", "dichtungen", "dichtring", "dichtringe"},
+    {"toilette", "klo", "klosett"},
+    {"entlueften", "entlueftet", "entlueftung"},
+]
+
+STOPPWOERTER = {
+    "der", "die", "das", "und", "bei", "beim", "von", "vom", "mit", "fuer", "auf", "aus", "ist", "war", "hat",
+    "herr", "herrn", "frau", "heute", "noch", "eine", "einen", "ein", "den", "dem", "des", "wir", "haben",
+    "wurde", "neue", "neuen", "plus", "zwei", "drei", "vier", "fuenf", "stueck", "euro",
+}
+
+_SYNONYME = {w: g for g in SYNONYM_GRUPPEN for w in g}
+
+
+def _mit_einheiten(text):
+    """'15 mm Kupferrohr' -> '15mm kupferrohr', damit Maße ein Suchwort bleiben."""
+    return re.sub(r"(\d) ?(mm|cm|m|l|kg|kw|w|zoll|bar)\b", r"\1\2", normalisiere(text))
+
+
+def _suchwoerter(text):
+    return woerter(_mit_einheiten(text), STOPPWOERTER)
+
+
+def _art_nr(text):
+    return re.sub(r"[^a-z0-9]", "", normalisiere(text))
+
+
+def preis_zu_zahl(text):
+    """'1.234,50 €' / '12.5' -> float; Unlesbares wird None."""
+    s = str(text or "").replace("€", "").replace("EUR", "").strip()
+    if "," in s: s = s.replace(".", "").replace(",", ".")
+    try: return float(s)
+    except ValueError: return None
+
+
+def zeile_zu_artikel(zeile):
+    z = [str(x).strip() for x in zeile] + [""] * 4
+    synonyme = [s.strip() for s in z[3].split(",") if s.strip()]
+    return {"name": z[0], "preis": preis_zu_zahl(z[1]), "preis_text": z[1], "art_nr": z[2], "synonyme": synonyme}
+
+
+class ArtikelIndex:
+    def __init__(self, zeilen, min_aehnlichkeit=0.8):
+        """`zeilen` wie get_all_values() ohne Kopfzeile."""
+        self.artikel = [zeile_zu_artikel(z) for z in zeilen if len(z) >= 2 and str(z[0]).strip()]
+        self._woerter = WortIndex(min_aehnlichkeit)
+        self._nach_art_nr = {}
+        self._anzahl_woerter = []
+        for i, a in enumerate(self.artikel):
+            ws = set(_suchwoerter(a["name"]))
+            for s in a["synonyme"]: ws.update(_suchwoerter(s))
+            for w in ws: self._woerter.hinzufuegen(w, i)
+            self._anzahl_woerter.append(max(len(set(_suchwoerter(a["name"]))), 1))
+            if a["art_nr"]: self._nach_art_nr[_art_nr(a["art_nr"])] = i
+
+    def __len__(self):
+        return len(self.artikel)
+
+    def _treffer(self, text):
+        """Artikel -> Punkte: Treffer je Namenswort, gedämpft für lange Namen; genannte Art.Nr zählt doppelt."""
+        punkte = defaultdict(float)
+        worte = _suchwoerter(text)
+        for wort in dict.fromkeys(worte):
+            gesucht = {wort: 1.0}
+            for s in _SYNONYME.get(wort, ()): gesucht.setdefault(s, 0.9)
+            bestes = {}
+            for w, gewicht in gesucht.items():
+                for bekannt, r in self._woerter.aehnliche(w):
+                    for i in self._woerter.eintraege(bekannt): bestes[i] = max(bestes.get(i, 0.0), r * gewicht)
+            for i, r in bestes.items(): punkte[i] += r / self._anzahl_woerter[i] ** 0.5
+        roh = normalisiere(text).split()
+        for kandidat in set(roh) | {a + b for a, b in zip(roh, roh[1:])}:
+            i = self._nach_art_nr.get(_art_nr(kandidat))
+            if i is not None: punkte[i] += 2.0
+        return punkte
+
+    def suche(self, text, k=15, min_punkte=0.5):
+        """Die k wahrscheinlichsten Artikel zu einem Transkript als [(Punkte, Artikel)]."""
+        beste = heapq.nlargest(k, self._treffer(text).items(), key=lambda e: (e[1], -e[0]))
+        return [(round(p, 3), self.artikel[i]) for i, p in beste if p >= min_punkte]
+
+    def finde(self, text, art_nr=None, min_punkte=0.5):
+        """Bester Artikel für eine Positionszeile (None, wenn nichts, zu unscharf oder mehrere gleich gut passen)."""
+        if art_nr:
+            i = self._nach_art_nr.get(_art_nr(art_nr))
+            if i is not None: return self.artikel[i]
+        treffer = self.suche(text, k=2, min_punkte=min_punkte)
+        if not treffer or (len(treffer) > 1 and treffer[1][0] >= treffer[0][0]): return None
+        return treffer[0][1]
+
+    def nach_art_nr(self, art_nr):
+        """Artikel zur Art.Nr oder None."""
+        i = self._nach_art_nr.get(_art_nr(art_nr)) if art_nr else None
+        return None if i is None else self.artikel[i]
+
+    def pruefe_positionen(self, positionen, toleranz=0.01):
+        """
+        Gleicht extrahierte Positionen mit der Preisliste ab. Fehlende Preise
+        werden aus der Liste ergänzt, abweichende nur gemeldet (Sonderpreise
+        sind erlaubt). Rückgabe: Liste von Hinweistexten.
+        """
+        hinweise = []
+        for pos in positionen:
+            a = self.finde(pos.get("text", ""), pos.get("art_nr"))
+            if a is None or a["preis"] is None: continue
+            try: preis = float(pos.get("einzel_netto") or 0)
+            except (TypeError, ValueError): preis = 0.0
+            if not preis:
+                pos["einzel_netto"] = a["preis"]
+                hinweise.append(f"Preis für '{pos.get('text')}' aus Preisliste ergänzt: {a['preis']:.2f} EUR")
+            elif abs(preis - a["preis"]) > toleranz:
+                hinweise.append(f"'{pos.get('text')}': {preis:.2f} EUR, laut Preisliste ({a['name']}) {a['preis']:.2f} EUR")
+        return hinweise
+
+
+def als_prompt(artikel):
+    """Gleiches Zeilenformat wie früher, nur für die Kandidaten."""
+    if not artikel: return "PREISLISTE: keine passenden Artikel gefunden (Preise aus dem Text übernehmen)."
+    txt = "PREISLISTE (passende Artikel):\n"
+    for a in artikel:
+        if a["art_nr"]: txt += f"- Art. {a['art_nr']}: {a['name']} ({a['preis_text']} EUR)\n"
+        else: txt += f"- {a['name']}: {a['preis_text']} EUR\n"
+    return txt
+
+
+_cache = IndexCache(ArtikelIndex)
+
+
+def hole_index(schluessel, zeilen, stand=None):
+    """Prozessweit gecachter Index je Blatt; neu gebaut nur bei geänderten Zeilen (oder neuem `stand`)."""
+    return _cache.hole(schluessel, zeilen, stand)
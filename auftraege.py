@@ -0,0 +1,143 @@
+"""
+Arbeitsliste aus dem Blatt 'Offene Aufträge'.
+
+Die Auftragsannahme schreibt je Anruf eine Zeile (Kunde, Adresse, Kontakt,
+Problem, Termin), gelesen wurde das Blatt bisher nie. Hier werden die Zeilen
+aus dem lokalen Spiegel (nur neue Zeilen kommen nach) zu Aufträgen mit
+erkanntem Termin-Datum, lassen sich nach Erfassungsdatum, Kunde und Termin
+filtern und liefern die Vorlage für den Bericht: Kunde, Adresse und Problem
+stehen schon fest, aus dem neuen Memo kommen nur noch die Positionen.
+"""
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from suchindex import IndexCache, normalisiere
+
+KOPF = ["Datum", "Kunde", "Adresse", "Kontakt", "Problem", "Termin", "Status", "Bericht"]
+STATUS_SPALTE = KOPF.index("Status") + 1  # 1-basiert wie gspread
+OFFEN, ERLEDIGT = "Offen", "Erledigt"
+
+WOCHENTAGE = ("montag", "dienstag", "mittwoch", "donnerstag", "freitag", "samstag", "sonntag")
+TERMINE = ("Alle", "Überfällig", "Heute", "Morgen", "Diese Woche", "Ohne Termin")
+
+
+@lru_cache(maxsize=4096)
+def _datum(text):
+    try: return datetime.strptime(str(text).strip(), "%d.%m.%Y").date()
+    except ValueError: return None
+
+
+def termin_datum(termin, erfasst=None):
+    """
+    'morgen um 9' / 'Freitag' / 'nächste Woche' / '14.3.' -> Datum, gerechnet ab
+    dem Tag der Erfassung (ohne: ab heute); None, wenn kein Tag erkennbar ist.
+    """
+    return _termin_ab(termin, erfasst or date.today())
+
+
+@lru_cache(maxsize=4096)  # wenige verschiedene Texte, viele Zeilen; der Stichtag gehört zum Schlüssel
+def _termin_ab(termin, basis):
+    t = normalisiere(termin)
+    if not t: return None
+    m = re.search(r"\b(\d{1,2}) (\d{1,2})(?: (\d{2,4}))?\b", t)
+    if m and re.search(r"\d{1,2}\.\d{1,2}\.", str(termin)):
+        tag, monat, jahr = int(m.group(1)), int(m.group(2)), m.group(3)
+        jahr = int(jahr) + (2000 if len(jahr) == 2 else 0) if jahr else basis.year
+        try: d = date(jahr, monat, tag)
+        except ValueError: return None
+        # '3.1.' im Dezember erfasst -> Januar des Folgejahres
+        return d if m.group(3) or d >= basis - timedelta(days=31) else date(jahr + 1, monat, tag)
+    woerter = t.split()
+    if "uebermorgen" in woerter: return basis + timedelta(days=2)
+    if "morgen" in woerter: return basis + timedelta(days=1)
+    if "heute" in woerter or "sofort" in woerter: return basis
+    if "naechste" in woerter and ("woche" in woerter or "wochen" in woerter):
+        return basis + timedelta(days=7 - basis.weekday())
+    for i, tag in enumerate(WOCHENTAGE):
+        if tag in woerter: return basis + timedelta(days=(i - basis.weekday()) % 7)
+    return None
+
+
+def zeile_zu_auftrag(nr, zeile):
+    """Sheet-Zeile (Spalten wie KOPF, fehlende Zellen leer) -> dict; `nr` = Zeilennummer im Blatt."""
+    z = [str(x).strip() for x in zeile] + [""] * len(KOPF)
+    erfasst = _datum(z[0])
+    return {"zeile": nr, "datum": erfasst, "datum_text": z[0], "kunde": z[1], "adresse": z[2], "kontakt": z[3],
+            "problem": z[4], "termin": z[5], "termin_datum": termin_datum(z[5], erfasst), "status": z[6] or OFFEN, "bericht": z[7]}
+
+
+class AuftragsIndex:
+    def __init__(self, zeilen):
+        """`zeilen` wie get_all_values() ohne Kopfzeile; Zeilen ohne Kunde fallen weg."""
+        self.auftraege = [zeile_zu_auftrag(i, z) for i, z in enumerate(zeilen, start=2) if len(z) > 1 and str(z[1]).strip()]
+        norm = lru_cache(maxsize=None)(normalisiere)  # Kunden und Probleme wiederholen sich
+        self._suchtext = {a["zeile"]: f"{norm(a['kunde'])} {norm(a['adresse'])} {norm(a['problem'])}" for a in self.auftraege}
+
+    def __len__(self):
+        return len(self.auftraege)
+
+    def offene(self):
+        return [a for a in self.auftraege if a["status"] != ERLEDIGT]
+
+    def filtere(self, suche="", von=None, bis=None, termin="Alle", nur_offen=True, heute=None):
+        """
+        Nach Kunde/Adresse/Problem (Teilstring, ohne Umlaute und Satzzeichen),
+        Erfassungsdatum und Termin filtern; sortiert nach Termin (ohne Termin
+        am Ende), dann nach Erfassung.
+        """
+        heute = heute or date.today()
+        suche = normalisiere(suche)
+        woche_ende = heute + timedelta(days=6 - heute.weekday())
+
+        def passt_termin(d):
+            if termin == "Überfällig": return d is not None and d < heute
+            if termin == "Heute": return d == heute
+            if termin == "Morgen": return d == heute + timedelta(days=1)
+            if termin == "Diese Woche": return d is not None and heute <= d <= woche_ende
+            if termin == "Ohne Termin": return d is None
+            return True
+
+        treffer = [a for a in self.auftraege
+                   if (not nur_offen or a["status"] != ERLEDIGT)
+                   and (not suche or suche in self._suchtext[a["zeile"]])
+                   and (von is None or (a["datum"] is not None and a["datum"] >= von))
+                   and (bis is None or (a["datum"] is not None and a["datum"] <= bis))
+                   and passt_termin(a["termin_datum"])]
+        return sorted(treffer, key=lambda a: (a["termin_datum"] is None, a["termin_datum"] or date.max, a["datum"] or date.max, a["zeile"]))
+
+
+def kennung(auftrag):
+    """Datum, Kunde und Problem - daran wird ein Auftrag wiedererkannt, auch wenn seine Zeile im Blatt gewandert ist."""
+    return [auftrag["datum_text"], auftrag["kunde"], auftrag["problem"]]
+
+
+def finde_zeile(zeilen, gesucht, vermutet=None):
+    """
+    Zeilennummer des offenen Auftrags mit der Kennung `gesucht` in `zeilen`
+    (wie get_all_values(), mit Kopfzeile); zuerst wird `vermutet` geprüft.
+    None, wenn es ihn nicht (mehr) offen gibt.
+    """
+    def passt(zeile):
+        z = [str(x).strip() for x in zeile] + [""] * len(KOPF)
+        return [z[0], z[1], z[4]] == gesucht and z[6] != ERLEDIGT
+    if vermutet and 2 <= vermutet <= len(zeilen) and passt(zeilen[vermutet - 1]): return vermutet
+    return next((nr for nr, z in enumerate(zeilen[1:], start=2) if passt(z)), None)
+
+
+def als_kunde(auftrag, kunden_index=None):
+    """Kunde zum Auftrag: aus der Kundenliste, sonst aus den Angaben im Auftrag ('Str 1, 26721 Emden')."""
+    if kunden_index is not None and len(kunden_index):
+        kunde = kunden_index.finde(auftrag["kunde"])
+        if kunde is not None: return kunde
+    m = re.match(r"^(.*?),?\s*(\d{5})\s+(.+)$", auftrag["adresse"])
+    strasse, plz, ort = (m.group(1).strip(" ,"), m.group(2), m.group(3).strip()) if m else (auftrag["adresse"], "", "")
+    return {"name": auftrag["kunde"], "strasse": strasse, "plz": plz, "ort": ort, "kdnr": "", "anrede": ""}
+
+
+_cache = IndexCache(AuftragsIndex)
+
+
+def hole_index(schluessel, zeilen, stand=None):
+    """Prozessweit gecachter Index je Blatt; neu gebaut nur bei geänderten Zeilen (oder neuem `stand`)."""
+    return _cache.hole(schluessel, zeilen, stand)
@@ -0,0 +1,1164 @@
+"""
+Benchmarks für die Hilfsmodule der App (ohne Streamlit, ohne Google/OpenAI) und,
+mit `app`, für die ganze App mit lokalen Ersatzdiensten (ersatzdienste.py).
+
+Aufruf:
+    python benchmark.py statistik [--zeilen 10000 100000 1000000]
+    python benchmark.py kunden [--kunden 100 10000 100000]
+    python benchmark.py extraktion [--memos 100] [--latenz-4o 0.2] [--fehler-mini 0.15]
+    python benchmark.py auftraege [--auftraege 1000 10000 100000] [--berichte 50]
+    python benchmark.py transkription [--minuten 2 10 30] [--fehlerquote 0.1]
+    python benchmark.py uploads [--sitzungen 50] [--runden 5] [--kb 500]
+    python benchmark.py kontingent [--sitzungen 30] [--kontingent 20] [--fenster 2]
+    python benchmark.py nummern [--threads 32] [--pro-thread 50]
+    python benchmark.py pdf [--berichte 50]
+    python benchmark.py unterschrift [--anzahl 50]
+    python benchmark.py offene [--posten 50 500 5000]
+    python benchmark.py jahre [--jahre 10] [--zeilen 5000]
+    python benchmark.py offline [--berichte 20] [--ausfall 0.5]
+    python benchmark.py app [--zeilen 1000 10000] [--kunden 2000] [--latenz-openai 0.5] [--latenz-sheets 0.1]
+    python benchmark.py start [--vergleich HEAD~1] [--reruns 20]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+
+import artikel
+import auftraege
+import bericht_pdf
+import extraktion
+import jahresarchiv
+import kontingent
+import kunden
+import messung
+import nummern
+import offline
+import statistik
+import transkription
+
+try:
+    import tiktoken
+    _kodierung = tiktoken.get_encoding("o200k_base")
+    def tokens(text): return len(_kodierung.encode(text))
+except ImportError:
+    def tokens(text): return len(text) // 4  # grobe Schätzung ohne tiktoken
+
+KOPFZEILE = ["Nr", "Datum", "Uhrzeit", "Kunde", "Arbeit", "Netto", "MwSt", "Brutto", "KdNr", "Status", "GPS_Log"]
+HEUTE = pd.Timestamp(2025, 3, 14, 10, 30)
+
+
+def zufall_betrag(rnd):
+    netto = round(rnd.uniform(20, 4000), 2)
+    brutto = round(netto * 1.19, 2)
+    return netto, brutto
+
+
+def synthetisches_auftragsblatt(zeilen, seed=1, bis=HEUTE):
+    """Auftragsblatt wie get_all_values(), inkl. einiger kaputter Werte wie im echten Leben."""
+    rnd = random.Random(seed)
+    start = bis.date() - timedelta(days=450)
+    werte = [list(KOPFZEILE)]
+    for i in range(zeilen):
+        tag = start + timedelta(days=rnd.randrange(451))
+        netto, brutto = zufall_betrag(rnd)
+        brutto_txt = rnd.choice([f"{brutto:.2f}".replace(".", ","), str(brutto).replace(".", ","), f"{brutto:,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")])
+        datum = tag.strftime("%d.%m.%Y")
+        if rnd.random() < 0.002: datum = rnd.choice(["", "gestern", "31.02.2025"])
+        if rnd.random() < 0.002: brutto_txt = rnd.choice(["", "k.A.", "None"])
+        status = rnd.choice(["Offen", "Bezahlt", "bezahlt", "Bezahlt", "Bezahlt", ""])
+        werte.append([f"B-{tag:%Y-%m}-{i % 99 + 1:02d}", datum, "10:00", f"Kunde {rnd.randrange(5000)}", "Wartung",
+                      f"{netto:.2f}".replace(".", ","), "", brutto_txt, str(10000 + rnd.randrange(5000)), status, ""])
+    return werte
+
+
+def statistik_alt(alle_werte, heute):
+    """Bisherige Logik aus app.lade_statistik_daten (Zeilen-Schleifen), als Referenz."""
+    raw_headers = alle_werte[0]
+    raw_headers_lower = [str(h).strip().lower() for h in raw_headers]
+    headers_clean = [str(h).strip() for h in raw_headers]
+    df = pd.DataFrame(alle_werte[1:], columns=headers_clean)
+    idx_status = idx_kunde = idx_nr = idx_brutto = idx_datum = -1
+    for i, h in enumerate(raw_headers_lower):
+        if "status" in h: idx_status = i
+        if "kunde" in h: idx_kunde = i
+        if ("nr" in h or "nummer" in h) and "kd" not in h and "tel" not in h: idx_nr = i
+        if "brutto" in h: idx_brutto = i
+        if "datum" in h: idx_datum = i
+    if idx_nr == -1: idx_nr = 0
+    missing_cols = []
+    if idx_status == -1: missing_cols.append("Status")
+    if idx_brutto == -1: missing_cols.append("Brutto")
+    chart_data = None; umsatz_monat = 0.0; anzahl_heute = 0; anzahl_woche = 0
+    if idx_datum != -1 and idx_brutto != -1:
+        col_datum_name = raw_headers[idx_datum]; col_brutto_name = raw_headers[idx_brutto]
+        df['Datum_Clean'] = pd.to_datetime(df[col_datum_name], format='%d.%m.%Y', errors='coerce')
+        df_stat = df.dropna(subset=['Datum_Clean']).copy()
+        def putze_geld(x):
+            if not isinstance(x, str): return 0.0
+            sauber = x.replace('€', '').replace('EUR', '').strip()
+            sauber = sauber.replace('.', '').replace(',', '.')
+            try: return float(sauber)
+            except: return 0.0
+        df_stat['Brutto_Zahl'] = df_stat[col_brutto_name].apply(putze_geld)
+        df_monat = df_stat[(df_stat['Datum_Clean'].dt.month == heute.month) & (df_stat['Datum_Clean'].dt.year == heute.year)]
+        umsatz_monat = df_monat['Brutto_Zahl'].sum()
+        anzahl_heute = len(df_stat[df_stat['Datum_Clean'].dt.date == heute.date()])
+        aktuelle_kw = heute.isocalendar()[1]
+        df_stat['KW'] = df_stat['Datum_Clean'].dt.isocalendar().week
+        anzahl_woche = len(df_stat[(df_stat['KW'] == aktuelle_kw) & (df_stat['Datum_Clean'].dt.year == heute.year)])
+        df_stat['Monat_Jahr'] = df_stat['Datum_Clean'].dt.strftime('%Y-%m')
+        df_sorted = df_stat.sort_values('Datum_Clean')
+        chart_data = df_sorted.groupby('Monat_Jahr')['Brutto_Zahl'].sum().tail(6)
+    offene_liste = []
+    if idx_status != -1 and idx_kunde != -1:
+        for i, row in enumerate(alle_werte):
+            if i == 0: continue
+            status_wert = row[idx_status] if len(row) > idx_status else ""
+            kunde = row[idx_kunde] if len(row) > idx_kunde else "Unbekannt"
+            nr = row[idx_nr] if len(row) > idx_nr else "?"
+            betrag = row[idx_brutto] if (idx_brutto != -1 and len(row) > idx_brutto) else "0"
+            if "bezahlt" not in status_wert.lower():
+                offene_liste.append({"gspread_row": i + 1, "nr": nr, "kunde": kunde, "betrag": betrag, "status": status_wert})
+    return umsatz_monat, anzahl_heute, anzahl_woche, chart_data, offene_liste, missing_cols
+
+
+def vergleiche_statistik(alt, neu):
+    """Gleichheit auf den Cent (Summen werden in anderer Reihenfolge addiert)."""
+    fehler = []
+    if round(float(alt[0]), 2) != round(float(neu[0]), 2): fehler.append(f"umsatz_monat {alt[0]} != {neu[0]}")
+    if alt[1] != neu[1]: fehler.append(f"anzahl_heute {alt[1]} != {neu[1]}")
+    if alt[2] != neu[2]: fehler.append(f"anzahl_woche {alt[2]} != {neu[2]}")
+    if list(alt[3].index) != list(neu[3].index) or [round(x, 2) for x in alt[3]] != [round(x, 2) for x in neu[3]]:
+        fehler.append("chart_data weicht ab")
+    # neu hat zusätzlich betrag_zahl/alter_tage/datum für die Filter im Dashboard
+    if alt[4] != [{k: p[k] for k in ("gspread_row", "nr", "kunde", "betrag", "status")} for p in neu[4]]: fehler.append("offene_liste weicht ab")
+    if alt[5] != neu[5]: fehler.append("missing_cols weicht ab")
+    return fehler
+
+
+def bench_statistik(args):
+    print(f"{'Zeilen':>9} | {'alt [s]':>9} | {'neu [s]':>9} | {'Faktor':>7} | Ergebnis")
+    for n in args.zeilen:
+        werte = synthetisches_auftragsblatt(n)
+        t0 = time.perf_counter(); alt = statistik_alt(werte, HEUTE); t_alt = time.perf_counter() - t0
+        t0 = time.perf_counter(); neu = statistik.berechne_statistik(werte, HEUTE); t_neu = time.perf_counter() - t0
+        fehler = vergleiche_statistik(alt, neu)
+        print(f"{n:>9} | {t_alt:>9.3f} | {t_neu:>9.3f} | {t_alt / t_neu:>6.1f}x | {'identisch' if not fehler else '; '.join(fehler)}")
+
+
+VORNAMEN = ["Hans", "Petra", "Klaus", "Anke", "Jan", "Meike", "Gerd", "Silke", "Uwe", "Heike", "Frerk", "Tomke"]
+NACHNAMEN = ["Müller", "Meyer", "Schmidt", "Janssen", "de Vries", "Peters", "Hinrichs", "Freese", "Ubben", "Saathoff",
+             "Buß", "Eilers", "Rademacher", "Behrends", "Onken", "Gerdes", "Wübbena", "Harms", "Cassens", "Tjaden"]
+STRASSEN = ["Hauptstraße", "Am Delft", "Lindenweg", "Kirchstraße", "Große Str.", "Deichweg", "Osterstraße", "Wiesenweg"]
+ORTE = [("26721", "Emden"), ("26725", "Emden"), ("26789", "Leer"), ("26603", "Aurich"), ("26506", "Norden")]
+
+
+def synthetische_kunden(anzahl, seed=1):
+    """Kundenblatt ohne Kopfzeile; Nachnamen mit Suffix, damit es viele verschiedene gibt."""
+    rnd = random.Random(seed)
+    zeilen = []
+    for i in range(anzahl):
+        nachname = rnd.choice(NACHNAMEN) + ("" if i < len(NACHNAMEN) else f"-{rnd.choice(NACHNAMEN)}" if rnd.random() < 0.3 else str(i % 977))
+        plz, ort = rnd.choice(ORTE)
+        zeilen.append([f"{rnd.choice(VORNAMEN)} {nachname}", f"{rnd.choice(STRASSEN)} {rnd.randrange(1, 120)}", plz, ort,
+                       str(10000 + i), rnd.choice(["Herr", "Frau", ""])])
+    return zeilen
+
+
+def kunden_alt(zeilen):
+    """Bisheriger Prompt-Block aus app.lade_kunden_live (alle Kunden)."""
+    txt = "BEKANNTE KUNDEN:\n"
+    for k in map(kunden.zeile_zu_kunde, zeilen):
+        txt += f"- Name: {k['name']} | Anrede: {k['anrede']} | Adresse: {k['strasse']}, {k['plz']} {k['ort']} | KdNr: {k['kdnr']}\n"
+    return txt
+
+
+def diktat(kunde, rnd):
+    """Transkript wie aus Whisper, mit leicht verhörtem Namen."""
+    nachname = kunde["name"].split(" ", 1)[1]
+    if rnd.random() < 0.5 and len(nachname) > 4: nachname = nachname[:2] + nachname[3:]
+    return (f"Waren heute bei {kunde['anrede']} {nachname} in der {kunde['strasse']}, Heizung entlüftet, "
+            f"zwei Thermostatköpfe getauscht, anderthalb Stunden plus Anfahrt.")
+
+
+def bench_kunden(args):
+    print(f"{'Kunden':>7} | {'Tokens alt':>10} | {'Tokens neu':>10} | {'Aufbau [s]':>10} | {'Suche [ms]':>10} | "
+          f"{'Cache Hash [ms]':>15} | {'Cache Stand [ms]':>16} | Treffer")
+    for n in args.kunden:
+        zeilen = synthetische_kunden(n)
+        t0 = time.perf_counter(); index = kunden.KundenIndex(zeilen); t_aufbau = time.perf_counter() - t0
+        rnd = random.Random(2)
+        stichprobe = [index.kunden[rnd.randrange(len(index))] for _ in range(args.diktate)]
+        texte = [diktat(k, rnd) for k in stichprobe]
+        t0 = time.perf_counter(); ergebnisse = [index.suche(t) for t in texte]; t_suche = (time.perf_counter() - t0) / len(texte)
+        treffer = sum(k in [e[1] for e in erg] for k, erg in zip(stichprobe, ergebnisse))
+        neu = sum(tokens(kunden.als_prompt([e[1] for e in erg])) for erg in ergebnisse) / len(ergebnisse)
+        # Cache-Treffer je Rerun: Hash über alle Zeilen vs. Stand des Spiegels
+        kunden.hole_index(f"hash:{n}", zeilen); kunden.hole_index(f"stand:{n}", lambda: zeilen, "1:1")
+        t0 = time.perf_counter(); kunden.hole_index(f"hash:{n}", zeilen); t_hash = time.perf_counter() - t0
+        t0 = time.perf_counter(); kunden.hole_index(f"stand:{n}", lambda: zeilen, "1:1"); t_stand = time.perf_counter() - t0
+        print(f"{n:>7} | {tokens(kunden_alt(zeilen)):>10} | {neu:>10.0f} | {t_aufbau:>10.2f} | {t_suche * 1000:>10.1f} | "
+              f"{t_hash * 1000:>15.2f} | {t_stand * 1000:>16.3f} | {treffer}/{len(texte)} in Top-5")
+
+
+PREISLISTE_HANDWERK = [
+    ["Arbeitsstunde Geselle", "58,00", "L01"], ["Anfahrt", "35,00", "L02"], ["Thermostatkopf", "24,90", "1001"],
+    ["Eckventil", "12,50", "1002"], ["Siphon", "18,40", "1003"], ["Kupferrohr 15 mm", "9,80", "1004"],
+    ["Kupferrohr 22 mm", "14,20", "1005"], ["Umwälzpumpe", "289,00", "1006"], ["Mischbatterie", "96,00", "1007"],
+    ["Spülkasten", "145,00", "1008"], ["Heizkörperventil", "21,30", "1009"], ["Dichtungssatz", "6,90", "1010"],
+]
+# USD je 1 Mio. Tokens (Eingabe, Ausgabe) - nur für die Kostenschätzung
+MODELLPREISE = {"gpt-4o": (2.50, 10.00), "gpt-4o-mini": (0.15, 0.60)}
+
+
+def extraktions_memo(kunde, rnd):
+    """(Art, Diktat, erwartete Positionen {Art.Nr: Menge}) - kurz und eindeutig, mit unbekanntem Material oder frei erzählt."""
+    nachname = kunde["name"].split(" ", 1)[1]
+    teile = rnd.sample([("ein Siphon", "1003", 1), ("zwei Thermostatköpfe", "1001", 2), ("3 m Kupferrohr 15 mm", "1004", 3),
+                        ("ein Eckventil", "1002", 1), ("eine Mischbatterie", "1007", 1)], 2)
+    stunden, h = rnd.choice([("eine Stunde Arbeit", 1), ("2 Stunden Arbeit", 2), ("1,5 Stunden Arbeit", 1.5)])
+    art = rnd.choices(["kurz", "material", "frei"], weights=[6, 3, 1])[0]
+    if art == "kurz":
+        return art, f"{kunde['anrede']} {nachname}, {teile[0][0]}, {teile[1][0]}, {stunden}, Anfahrt.", \
+            {teile[0][1]: teile[0][2], teile[1][1]: teile[1][2], "L01": h, "L02": 1}
+    if art == "material": return art, f"{kunde['anrede']} {nachname}, {teile[0][0]}, 4 Meter Isolierschlauch, {stunden}.", None
+    return art, (f"Heute früh zuerst zu {nachname} rüber, da war die Heizung wieder kalt, haben {teile[0][0].split(' ', 1)[1]} "
+                 f"gewechselt und danach noch nach dem Rest geschaut, alles in allem {stunden}."), None
+
+
+class _Sammler:
+    """Spannen im Speicher statt im Log (für messung.setze_ziel)."""
+
+    def __init__(self): self.eintraege = []
+    def schreibe(self, eintrag): self.eintraege.append(eintrag)
+
+
+def bench_extraktion(args):
+    """
+    Immer gpt-4o gegen die Kaskade Regeln -> gpt-4o-mini -> gpt-4o
+    (extraktion.py) auf einer Mischung aus kurzen, unklaren und frei
+    erzählten Diktaten. Das Ersatz-LLM verrechnet sich mit einstellbarer Quote;
+    gezählt werden Aufrufe je Modell, Latenz, Kosten und wie viele Ergebnisse
+    die lokale Prüfung bestehen.
+    """
+    import ersatzdienste
+
+    kunden_index = kunden.KundenIndex(synthetische_kunden(args.kunden))
+    artikel_index = artikel.ArtikelIndex(PREISLISTE_HANDWERK)
+    rnd = random.Random(3)
+    memos = [extraktions_memo(kunden_index.kunden[rnd.randrange(len(kunden_index))], rnd) for _ in range(args.memos)]
+    modelle = {"gpt-4o": (args.latenz_4o, args.fehler_4o), "gpt-4o-mini": (args.latenz_mini, args.fehler_mini)}
+
+    def lauf(titel, stufen_fuer):
+        llm = ersatzdienste.ErsatzOpenAI(modelle=modelle, seed=5)
+        tokens_je_modell = Counter()
+        sammler = _Sammler()
+        messung.setze_ziel(sammler)
+        ergebnisse, t0 = [], time.perf_counter()
+        try:
+            for art, txt, erwartet in memos:
+                sys_prompt = (f"Du bist Buchhalter.\n{artikel.als_prompt([a for _, a in artikel_index.suche(txt)])}\n"
+                              f"KUNDEN: {kunden.als_prompt([k for _, k in kunden_index.suche(txt)])}")
+
+                def frage(modell):
+                    res = llm.chat.completions.create(model=modell, messages=[{"role": "system", "content": sys_prompt}, {"role": "user", "content": txt}])
+                    ein, aus = MODELLPREISE[modell]
+                    tokens_je_modell[modell] += res.usage.prompt_tokens * ein + res.usage.completion_tokens * aus
+                    return json.loads(res.choices[0].message.content)
+                daten, stufe, probleme = extraktion.kaskade("daten", stufen_fuer(txt, frage),
+                                                            lambda d: extraktion.pruefe_bericht(d, kunden_index, artikel_index))
+                ergebnisse.append((art, erwartet, daten, stufe, probleme))
+        finally: messung.setze_ziel(None)
+        dauer = time.perf_counter() - t0
+        aufrufe = Counter(e["stufe"].split(":", 1)[1] for e in sammler.eintraege)
+        eskaliert = Counter(e["stufe"].split(":", 1)[1] for e in sammler.eintraege if e.get("eskaliert"))
+        bestanden = sum(not e[4] for e in ergebnisse)
+        regeln = [e for e in ergebnisse if e[3] == "regeln"]
+        regeln_richtig = sum({p["art_nr"]: p["menge"] for p in e[2]["positionen"]} == e[1] for e in regeln if e[1])
+        print(f"{titel}: {dauer:.1f} s ({dauer / len(memos) * 1000:.0f} ms/Diktat), ~{sum(tokens_je_modell.values()) / 1e6 * 100:.2f} US-Cent, "
+              f"Prüfung bestanden {bestanden}/{len(memos)}")
+        for stufe, n in aufrufe.items(): print(f"    {stufe:<12} {n:>4} Aufrufe, {eskaliert[stufe]:>3} eskaliert")
+        if regeln: print(f"    per Regeln erkannt: {len(regeln)} ({regeln_richtig} mit genau den diktierten Positionen)")
+        je_art = Counter((e[0], e[3]) for e in ergebnisse)
+        print("    Endstufe je Diktat-Art: " + ", ".join(f"{art}->{stufe}: {n}" for (art, stufe), n in sorted(je_art.items())))
+        return ergebnisse
+
+    print(f"{len(memos)} Diktate, {len(kunden_index)} Kunden, {len(artikel_index)} Artikel; "
+          f"Latenz gpt-4o {args.latenz_4o} s / mini {args.latenz_mini} s, Fehlerquote {args.fehler_4o} / {args.fehler_mini}")
+    lauf("immer gpt-4o", lambda txt, frage: [("gpt-4o", lambda: frage("gpt-4o"))])
+    ergebnisse = lauf("Kaskade", lambda txt, frage: [("regeln", lambda: extraktion.regel_bericht(txt, kunden_index, artikel_index))]
+                      + [(m, lambda m=m: frage(m)) for m in (extraktion.KLEINES_MODELL, extraktion.GROSSES_MODELL)])
+    falsch = [e for e in ergebnisse if e[3] == "regeln" and e[1] and {p["art_nr"]: p["menge"] for p in e[2]["positionen"]} != e[1]]
+    if falsch: raise SystemExit(f"FEHLER: Regeln haben {len(falsch)} Diktate falsch gelesen")
+
+    # Diktate, aus denen die Regeln nichts stillschweigend weglassen dürfen (-> Modell)
+    meyer = kunden.KundenIndex([["Heinz Meyer", "Deichweg 7", "26789", "Leer", "10001", "Herr"]])
+    for txt in ["Herr Meyer, Heizung entlüftet, Thermostatkopf im Bad getauscht, Ventil am Boiler erneuert, 2 Stunden Arbeit",
+                "Herr Meyer, Heizung entlüftet, Rohr im Keller gedämmt, ein Siphon, Anfahrt"]:
+        d = extraktion.regel_bericht(txt, meyer, artikel_index)
+        if d is not None: raise SystemExit(f"FEHLER: Regeln haben '{txt}' gelesen, Positionen {[p['text'] for p in d['positionen']]}")
+    print("    Diktate mit nicht zuordenbaren Satzteilen gehen ans Modell")
+
+
+def synthetische_auftraege(kunden_zeilen, anzahl, seed=1, bis=date(2025, 3, 14)):
+    """Blatt 'Offene Aufträge' ohne Kopfzeile, etwa ein Viertel schon erledigt."""
+    rnd = random.Random(seed)
+    probleme = ["Heizung kalt", "Wasserhahn tropft", "Spülkasten läuft nach", "Therme zeigt Fehler", "Abfluss verstopft"]
+    termine = ["morgen um 9 Uhr", "heute nachmittag", "Freitag", "nächste Woche", "", "14.3.", "übermorgen ab 8"]
+    zeilen = []
+    for i in range(anzahl):
+        k = kunden.zeile_zu_kunde(rnd.choice(kunden_zeilen))
+        erledigt = rnd.random() < 0.25
+        zeilen.append([(bis - timedelta(days=rnd.randrange(60))).strftime("%d.%m.%Y"), k["name"], f"{k['strasse']}, {k['plz']} {k['ort']}",
+                       f"0491 {rnd.randrange(10000, 99999)}", rnd.choice(probleme), rnd.choice(termine),
+                       auftraege.ERLEDIGT if erledigt else auftraege.OFFEN, f"B-2025-03-{i:03d}" if erledigt else ""])
+    return zeilen
+
+
+def bench_auftraege(args):
+    """
+    Arbeitsliste 'Offene Aufträge': Aufbau und Filterzeit des Index je
+    Blattgröße, und Bericht zu einem Auftrag gegen ein neues Memo mit Kunde -
+    wie oft ein LLM nötig ist und wie groß der Prompt wird.
+    """
+    import ersatzdienste
+
+    kunden_zeilen = synthetische_kunden(args.kunden)
+    print(f"{'Aufträge':>9} | {'Aufbau [ms]':>11} | {'Filter [ms]':>11} | offen | heute fällig")
+    for n in args.auftraege:
+        zeilen = synthetische_auftraege(kunden_zeilen, n)
+        t0 = time.perf_counter(); index = auftraege.AuftragsIndex(zeilen); t_aufbau = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for suche, termin in (("", "Alle"), ("meyer", "Alle"), ("", "Heute"), ("heizung", "Diese Woche")): index.filtere(suche, termin=termin, heute=date(2025, 3, 14))
+        t_filter = (time.perf_counter() - t0) / 4
+        print(f"{n:>9} | {t_aufbau * 1000:>11.1f} | {t_filter * 1000:>11.2f} | {len(index.offene()):>5} | {len(index.filtere(termin='Heute', heute=date(2025, 3, 14)))}")
+
+    # Blatt im Browser sortiert: erledigt wird der Auftrag selbst, nicht wer jetzt in seiner alten Zeile steht
+    zeilen = synthetische_auftraege(kunden_zeilen, 200, seed=3)
+    gewaehlt = auftraege.AuftragsIndex(zeilen).offene()[17]
+    sortiert = [auftraege.KOPF] + sorted(zeilen, key=lambda z: z[1])
+    ziel = auftraege.finde_zeile(sortiert, auftraege.kennung(gewaehlt), gewaehlt["zeile"])
+    if ziel is None or auftraege.kennung(auftraege.zeile_zu_auftrag(ziel, sortiert[ziel - 1])) != auftraege.kennung(gewaehlt):
+        raise SystemExit("FEHLER: verschobener Auftrag nicht wiedergefunden")
+    print(f"Auftrag aus Zeile {gewaehlt['zeile']} nach Sortieren in Zeile {ziel} wiedergefunden")
+
+    kunden_index = kunden.KundenIndex(kunden_zeilen)
+    artikel_index = artikel.ArtikelIndex(PREISLISTE_HANDWERK)
+    offene = auftraege.AuftragsIndex(synthetische_auftraege(kunden_zeilen, args.berichte * 2, seed=2)).offene()[:args.berichte]
+    rnd = random.Random(4)
+    llm = ersatzdienste.ErsatzOpenAI()
+    for titel, mit_auftrag in (("neues Memo mit Kunde", False), ("Bericht zum Auftrag", True)):
+        stufen, zeichen = Counter(), 0
+        for a in offene:
+            kunde = auftraege.als_kunde(a, kunden_index)
+            art, txt, _ = extraktions_memo(kunde, rnd)
+            if mit_auftrag and art == "kurz": txt = txt.split(", ", 1)[1]  # Name und Adresse muss keiner mehr sagen
+            kunden_db = kunden.als_prompt([kunde] if mit_auftrag else [k for _, k in kunden_index.suche(txt)])
+            sys_prompt = f"Du bist Buchhalter.\n{artikel.als_prompt([x for _, x in artikel_index.suche(txt)])}\nKUNDEN: {kunden_db}"
+
+            def frage(modell):
+                res = llm.chat.completions.create(model=modell, messages=[{"role": "system", "content": sys_prompt}, {"role": "user", "content": txt}])
+                return json.loads(res.choices[0].message.content)
+            daten, stufe, _ = extraktion.bericht(txt, frage, kunden_index, artikel_index, kunde=kunde if mit_auftrag else None)
+            if mit_auftrag and daten["kunde_name"] != a["kunde"]: raise SystemExit(f"FEHLER: Kunde aus dem Auftrag überschrieben ({a['kunde']})")
+            stufen[stufe] += 1
+            zeichen += len(sys_prompt) + len(txt)
+        print(f"{titel:<22}: {dict(stufen)}, Ø Prompt ~{tokens('x' * (zeichen // len(offene)))} Tokens")
+
+
+class ErsatzTranskription:
+    """
+    Lokaler Ersatz für Whisper: Latenz wächst mit der Dateigröße, einzelne
+    Aufrufe schlagen zufällig fehl. Die 'Audio'-Bytes sind hier einfach Text.
+    """
+
+    def __init__(self, sekunden_pro_mb=2.0, grundlatenz=0.3, fehlerquote=0.0, seed=1):
+        self.sekunden_pro_mb = sekunden_pro_mb
+        self.grundlatenz = grundlatenz
+        self.fehlerquote = fehlerquote
+        self.aufrufe = 0
+        self.fehler = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, datei):
+        name, daten = datei
+        with self._lock:
+            self.aufrufe += 1
+            scheitert = self._rnd.random() < self.fehlerquote
+            if scheitert: self.fehler += 1
+        time.sleep(self.grundlatenz + self.sekunden_pro_mb * len(daten) / 1e6)
+        if scheitert: raise ConnectionError(f"{name}: Verbindung abgebrochen")
+        return daten.decode("utf-8").strip()
+
+
+def synthetisches_memo(minuten, teil_minuten=2, kb_pro_minute=240):
+    """Teile wie aus transkription.zerlege(), Inhalt = erwarteter Text + Füllbytes."""
+    teile = []
+    for i in range(max(1, round(minuten / teil_minuten))):
+        text = f"Abschnitt {i + 1}."
+        teile.append((f"teil_{i:03d}.mp3", (text + " " * (kb_pro_minute * 1024 * teil_minuten)).encode("utf-8")))
+    return teile
+
+
+def bench_transkription(args):
+    print(f"{'Minuten':>7} | {'Teile':>5} | {'am Stück [s]':>12} | {'parallel [s]':>12} | {'Faktor':>7} | Aufrufe (Fehler) | Ergebnis")
+    for minuten in args.minuten:
+        teile = synthetisches_memo(minuten)
+        erwartet = " ".join(d.decode().strip() for _, d in teile)
+        ganz = ErsatzTranskription()
+        t0 = time.perf_counter(); ganz(("audio.mp3", b"".join(d for _, d in teile))); t_ganz = time.perf_counter() - t0
+        dienst = ErsatzTranskription(fehlerquote=args.fehlerquote)
+        t0 = time.perf_counter()
+        text = transkription.transkribiere_teile(teile, dienst, max_worker=args.worker, versuche=5, wartezeit=0.1)
+        t_teile = time.perf_counter() - t0
+        print(f"{minuten:>7} | {len(teile):>5} | {t_ganz:>12.2f} | {t_teile:>12.2f} | {t_ganz / t_teile:>6.1f}x | "
+              f"{dienst.aufrufe:>7} ({dienst.fehler}) | {'identisch' if text == erwartet else 'ABWEICHUNG'}")
+
+
+class ErsatzUpload(io.BytesIO):
+    """Wie Streamlits UploadedFile: ein BytesIO mit Dateinamen."""
+    def __init__(self, name, daten):
+        super().__init__(daten)
+        self.name = name
+
+
+def offene_dateien():
+    """Anzahl offener Dateideskriptoren dieses Prozesses (nur Linux, sonst None)."""
+    try: return len(os.listdir("/proc/self/fd"))
+    except OSError: return None
+
+
+def bench_uploads(args):
+    """
+    Viele Sitzungen laden gleichzeitig je ein eigenes Memo hoch. Alt: jede
+    schreibt nach temp_audio.mp3 im gemeinsamen Arbeitsordner und liest die
+    Datei wieder; neu: Bytes direkt aus dem Upload-Puffer an den Dienst.
+    Geprüft wird, ob jede Sitzung ihren eigenen Text bekommt und ob offene
+    Dateien und Speicher über die Runden flach bleiben.
+    """
+    dienst = ErsatzTranskription(sekunden_pro_mb=0.2, grundlatenz=0.05)
+
+    def alt(upload):
+        pfad = f"temp_audio.{upload.name.split('.')[-1]}"
+        with open(pfad, "wb") as f: f.write(upload.getbuffer())
+        time.sleep(random.uniform(0, 0.01))  # der Lauf zeigt erst Status-Elemente an
+        return transkription.transkribiere(open(pfad, "rb").read(), pfad.rsplit(".", 1)[-1], dienst)
+
+    def neu(upload):
+        daten, endung = transkription.aus_upload(upload)
+        return transkription.transkribiere(daten, endung, dienst)
+
+    start_ordner = os.getcwd()
+    fehlgeschlagen = False
+    with tempfile.TemporaryDirectory() as ordner:
+        os.chdir(ordner)  # alle Sitzungen teilen sich wie auf dem Server einen Arbeitsordner
+        try:
+            print(f"{'Variante':>8} | {'Runde':>5} | {'eigener Text':>12} | {'offene Dateien':>14} | {'Speicher [MB]':>13} | {'Zeit [s]':>8}")
+            for name, funktion in [("alt", alt), ("neu", neu)]:
+                tracemalloc.start()
+                dateien_vorher = offene_dateien()
+                for runde in range(1, args.runden + 1):
+                    texte = [f"Sitzung {i} Runde {runde}: Heizung bei Kunde {i} entlüftet." for i in range(args.sitzungen)]
+                    uploads = [ErsatzUpload("memo.mp3", (t + " " * (args.kb * 1024)).encode("utf-8")) for t in texte]
+                    t0 = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=args.sitzungen) as pool:
+                        ergebnisse = list(pool.map(funktion, uploads))
+                    dauer = time.perf_counter() - t0
+                    richtig = sum(e == t for e, t in zip(ergebnisse, texte))
+                    del uploads, ergebnisse
+                    speicher = tracemalloc.get_traced_memory()[0] / 1e6
+                    dateien = offene_dateien()
+                    print(f"{name:>8} | {runde:>5} | {richtig:>5} / {args.sitzungen:<4} | "
+                          f"{'-' if dateien is None else f'{dateien - dateien_vorher:+d}':>14} | {speicher:>13.1f} | {dauer:>8.2f}")
+                    if name == "neu" and (richtig < args.sitzungen or (dateien or 0) > (dateien_vorher or 0)): fehlgeschlagen = True
+                tracemalloc.stop()
+            print(f"Dateien im Arbeitsordner danach: {sorted(os.listdir(ordner)) or '-'}")
+        finally:
+            os.chdir(start_ordner)
+    if fehlgeschlagen: raise SystemExit("FEHLER: Sitzungen nicht getrennt oder Dateien bleiben offen")
+
+
+class ErsatzSheetsServer:
+    """
+    Lokaler Ersatz für die Sheets-API: höchstens `kontingent` Lese- bzw.
+    Schreib-Requests je gleitendem Fenster von `fenster_s` Sekunden, sonst 429.
+    """
+
+    def __init__(self, kontingent, fenster_s, latenz=0.05):
+        self.kontingent = kontingent
+        self.fenster_s = fenster_s
+        self.latenz = latenz
+        self.zaehler = Counter()
+        self._zeiten = {"lesen": [], "schreiben": []}
+        self._lock = threading.Lock()
+
+    def __call__(self, methode, url):
+        art = "lesen" if methode == "GET" else "schreiben"
+        with self._lock:
+            jetzt = time.monotonic()
+            zeiten = self._zeiten[art]
+            while zeiten and zeiten[0] < jetzt - self.fenster_s: zeiten.pop(0)
+            self.zaehler["requests"] += 1
+            if len(zeiten) >= self.kontingent:
+                self.zaehler["429"] += 1
+                return SimpleNamespace(status_code=429, headers={}, content=b"")
+            zeiten.append(jetzt)
+        time.sleep(self.latenz)
+        return SimpleNamespace(status_code=200, headers={}, content=url.encode("utf-8"))
+
+
+def bench_kontingent(args):
+    """
+    Viele Sitzungen gleichzeitig (Dashboard + Bericht): je drei Lese-Requests
+    auf dieselben Blätter und ein Schreib-Request. Ohne Planer geht alles
+    sofort raus, ein 429 wird zum leeren Dashboard; mit Planer (Token-Eimer im
+    Takt des Kontingents, Backoff, gleiche Lesungen zusammengefasst) soll
+    nichts fehlschlagen. Die Zeit ist gerafft: Fenster von `--fenster` s statt
+    einer Minute.
+    """
+    lesungen = [f"https://sheets.googleapis.com/v4/spreadsheets/ersatz/values/{blatt}" for blatt in ("Kunden", "Preisliste", "Aufträge_2025")]
+    schreiben = "https://sheets.googleapis.com/v4/spreadsheets/ersatz/values/Aufträge_2025:append"
+    raffung = args.fenster / 60
+
+    def lauf(ausfuehren):
+        def sitzung(i):
+            t0 = time.perf_counter()
+            fehler = 0
+            for methode, url in [("GET", u) for u in lesungen] + [("POST", schreiben)]:
+                try: fehler += ausfuehren(methode, url).status_code != 200
+                except kontingent.KontingentErschoepft: fehler += 1
+            return fehler, time.perf_counter() - t0
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sitzungen) as pool:
+            ergebnisse = list(pool.map(sitzung, range(args.sitzungen)))
+        dauern = sorted(d for _, d in ergebnisse)
+        return sum(f for f, _ in ergebnisse), time.perf_counter() - t0, dauern[int(len(dauern) * 0.95) - 1 if len(dauern) > 1 else 0]
+
+    print(f"{args.sitzungen} Sitzungen, Kontingent {args.kontingent} Lese- und {args.kontingent} Schreib-Requests je {args.fenster} s")
+    print(f"{'Variante':>8} | {'Requests':>8} | {'429':>5} | {'fehlgeschlagen':>14} | {'zusammengefasst':>15} | {'gesamt [s]':>10} | {'p95 Sitzung [s]':>15}")
+    server = ErsatzSheetsServer(args.kontingent, args.fenster)
+    fehler, gesamt, p95 = lauf(server)
+    print(f"{'ohne':>8} | {server.zaehler['requests']:>8} | {server.zaehler['429']:>5} | {fehler:>14} | {'-':>15} | {gesamt:>10.2f} | {p95:>15.2f}")
+    time.sleep(args.fenster)  # Fenster leeren
+    server = ErsatzSheetsServer(args.kontingent, args.fenster)
+    pro_minute = args.kontingent / raffung
+    planer = kontingent.Planer(pro_minute, pro_minute, basis=raffung, deckel=32 * raffung, max_warten=60 * raffung * 5, stoss=max(1, args.kontingent // 4))
+    fehler, gesamt, p95 = lauf(lambda methode, url: planer.fuehre_aus(methode, url, lambda: server(methode, url)))
+    stand = planer.stand()
+    print(f"{'mit':>8} | {server.zaehler['requests']:>8} | {server.zaehler['429']:>5} | {fehler:>14} | {stand['zusammengefasst']:>15} | {gesamt:>10.2f} | {p95:>15.2f}")
+    print(f"Planer: {stand}")
+    if fehler: raise SystemExit("FEHLER: trotz Planer fehlgeschlagene Requests")
+
+    # Wer gerade geschrieben hat, darf keine Lesung mitbenutzen, die vor seinem Schreiben losging
+    planer, blatt, gestartet, freigabe = kontingent.Planer(), ["alt"], threading.Event(), threading.Event()
+
+    class Antwort:
+        status_code = 200
+        def __init__(self, inhalt): self.inhalt = inhalt
+
+    def langsam_lesen():
+        inhalt = list(blatt); gestartet.set(); freigabe.wait()
+        return Antwort(inhalt)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        frueh = pool.submit(planer.fuehre_aus, "GET", lesungen[2], langsam_lesen)
+        gestartet.wait()
+        planer.fuehre_aus("POST", schreiben, lambda: blatt.append("neu") or Antwort(None))
+        spaet = pool.submit(planer.fuehre_aus, "GET", lesungen[2], lambda: Antwort(list(blatt)))
+        eigene = spaet.result(timeout=10).inhalt
+        freigabe.set(); frueh.result()
+    print(f"Lesen nach eigenem Schreiben: {eigene}")
+    if "neu" not in eigene: raise SystemExit("FEHLER: Lesung von vor dem Schreiben geteilt")
+
+
+def bench_nummern(args):
+    """
+    Viele Threads (mit eigenen Instanzen, wie mehrere Prozesse) reservieren
+    gleichzeitig und füllen danach den Offline-Vorrat auf (wie app.hole_nr);
+    ein Teil nimmt die Nummer offline aus dem Vorrat, ein Teil gibt wieder
+    frei, der Rest bestätigt. Keine Nummer darf zweimal verwendet werden, und
+    sind Freigaben und Vorrat aufgebraucht, darf keine Lücke bleiben.
+    """
+    with tempfile.TemporaryDirectory() as ordner:
+        pfad = os.path.join(ordner, "nummern.sqlite")
+        praefix = "B-2025-03"
+        nummern.NummernVergabe(pfad)
+        verwendet, dauer = [], []
+
+        def arbeiter(seed):
+            rnd = random.Random(seed)
+            vergabe = nummern.NummernVergabe(pfad)
+            eigene = []
+            for _ in range(args.pro_thread):
+                if rnd.random() < 0.1: nr = vergabe.aus_vorrat(praefix)
+                else: nr = None
+                if nr is None:
+                    t0 = time.perf_counter(); nr = vergabe.reserviere(praefix, startwert=lambda: 7, besitzer=str(seed)); dauer.append(time.perf_counter() - t0)
+                    vergabe.fuelle_vorrat(praefix=praefix)
+                    if rnd.random() < 0.2: vergabe.freigeben(nr, str(seed)); continue
+                    if not vergabe.bestaetige(nr, str(seed)): raise SystemExit(f"FEHLER: eigene Reservierung {nr} abgewiesen")
+                elif rnd.random() < 0.2: vergabe.freigeben(nr); continue
+                else: vergabe.bestaetige(nr)
+                eigene.append(nr)
+            return eigene
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            for eigene in pool.map(arbeiter, range(args.threads)): verwendet.extend(eigene)
+        gesamt = time.perf_counter() - t0
+
+        # Weiter vergeben, bis Freigaben und Vorrat unterhalb der höchsten Nummer verbraucht sind
+        vergabe, hoechste = nummern.NummernVergabe(pfad), max(int(nr.rsplit("-", 1)[1]) for nr in verwendet)
+        while True:
+            nr = vergabe.reserviere(praefix)
+            if int(nr.rsplit("-", 1)[1]) > hoechste: break
+            vergabe.bestaetige(nr); verwendet.append(nr)
+
+        # Verfallene Reservierung, neu an B vergeben: A darf sie nicht mehr bestätigen
+        vergabe = nummern.NummernVergabe(pfad, verfall_stunden=0)
+        nr = vergabe.reserviere("B-2025-04", besitzer="A")
+        zweite = vergabe.reserviere("B-2025-04", besitzer="B")
+        if zweite != nr or vergabe.sichere(nr, "A") or not vergabe.sichere(nr, "B") or vergabe.status(nr) != nummern.RESERVIERT \
+                or vergabe.bestaetige(nr, "A") or not vergabe.bestaetige(nr, "B"):
+            raise SystemExit("FEHLER: verfallene Reservierung vom alten Besitzer bestätigt")
+        print(f"neu vergebene Reservierung {nr}: alter Besitzer abgewiesen, neuer bestätigt")
+
+    doppelt = [nr for nr, n in Counter(verwendet).items() if n > 1]
+    laufnummern = sorted(int(nr.rsplit("-", 1)[1]) for nr in verwendet)
+    luecken = sorted(set(range(8, laufnummern[-1] + 1)) - set(laufnummern)) if laufnummern else []
+    dauer.sort()
+    print(f"{args.threads} Threads x {args.pro_thread} Reservierungen in {gesamt:.2f} s, "
+          f"Median {dauer[len(dauer) // 2] * 1000:.1f} ms, p99 {dauer[int(len(dauer) * 0.99)] * 1000:.1f} ms")
+    print(f"verwendet: {len(verwendet)}, doppelt: {len(doppelt)} {doppelt[:5]}, Lücken zwischen verwendeten Nummern: {luecken[:5]}")
+    if doppelt: raise SystemExit("FEHLER: Nummer doppelt vergeben")
+    if luecken: raise SystemExit("FEHLER: Lücke in den Nummern des Monats")
+
+
+def beispiel_bericht(i, rnd):
+    positionen = []
+    for _ in range(rnd.randrange(2, 8)):
+        menge, einzel = rnd.choice([1, 2, 1.5, 3]), round(rnd.uniform(5, 120), 2)
+        positionen.append({"text": rnd.choice(["Arbeitsstunde Geselle", "Anfahrt", "Thermostatkopf", "Kupferrohr 15 mm", "Eckventil"]),
+                           "menge": menge, "einzel_netto": einzel, "gesamt_netto": menge * einzel})
+    netto = sum(p["gesamt_netto"] for p in positionen)
+    return {"rechnungs_nr": f"B-2025-03-{i + 1:02d}", "kunde_name": f"Kunde {i}", "anrede": "Herr", "kundennummer": str(10000 + i),
+            "adresse": "Hauptstraße 5, 26725 Emden", "problem_titel": "Heizung entlüftet", "positionen": positionen,
+            "summe_netto": netto, "mwst_betrag": netto * 0.19, "summe_brutto": netto * 1.19}
+
+
+def bench_pdf(args):
+    """Alter Weg (Original-Logo, alles neu zeichnen, Datei schreiben und wieder lesen) gegen die Vorlage."""
+    rnd = random.Random(1)
+    berichte = [beispiel_bericht(i, rnd) for i in range(args.berichte)]
+    logo = bericht_pdf.finde_logo()
+    with tempfile.TemporaryDirectory() as ordner:
+        def alt(daten):
+            pfad = os.path.join(ordner, bericht_pdf.dateiname(daten))
+            with open(pfad, "wb") as f: f.write(alt_renderer.erstelle(daten))
+            with open(pfad, "rb") as f: return f.read()
+
+        alt_renderer = bericht_pdf.BerichtRenderer(logo, cache_ordner=ordner, vorlage=False, logo_verkleinern=False)
+        t0 = time.perf_counter(); neu_renderer = bericht_pdf.BerichtRenderer(logo, cache_ordner=ordner); t_logo = time.perf_counter() - t0
+        print(f"Logo: {logo or '-'} ({os.path.getsize(logo) // 1024 if logo else 0} KB), verkleinert in {t_logo * 1000:.0f} ms "
+              f"auf {os.path.getsize(neu_renderer.logo) // 1024 if neu_renderer.logo else 0} KB")
+        print(f"{'Variante':>8} | {'je Bericht [ms]':>15} | {'Größe [KB]':>10}")
+        for name, funktion in [("alt", alt), ("neu", neu_renderer.erstelle)]:
+            funktion(berichte[0])  # Aufwärmen (Vorlage bauen)
+            t0 = time.perf_counter(); groessen = [len(funktion(d)) for d in berichte]; t = (time.perf_counter() - t0) / len(berichte)
+            print(f"{name:>8} | {t * 1000:>15.1f} | {sum(groessen) / len(groessen) / 1024:>10.1f}")
+
+
+def synthetische_unterschrift(rnd, hoehe=150, breite=300):
+    """Canvas-Array wie von st_canvas (float, RGBA, nur Striche deckend): ein paar Schwünge in der Mitte."""
+    import numpy as np
+    feld = np.zeros((hoehe, breite, 4), dtype=float)
+    x = np.arange(rnd.randrange(40, 80), rnd.randrange(200, 260))
+    for _ in range(rnd.randrange(2, 4)):
+        y = hoehe / 2 + rnd.uniform(10, 30) * np.sin(x / rnd.uniform(6, 15) + rnd.uniform(0, 6)) + rnd.uniform(-15, 15)
+        for dy in (0, 1):  # Strichstärke 2
+            feld[np.clip(y.astype(int) + dy, 0, hoehe - 1), x, 3] = 255.0
+    return feld
+
+
+def bench_unterschrift(args):
+    """Alter Weg (np.any, Farb-PNG in eine Datei, PDF liest sie) gegen Zuschnitt + Graustufen im Speicher."""
+    import numpy as np
+    from PIL import Image
+    import unterschrift
+    rnd = random.Random(1)
+    felder = [synthetische_unterschrift(rnd) for _ in range(args.anzahl)]
+    leer = np.zeros((150, 300, 4), dtype=float)
+    daten = beispiel_bericht(0, rnd)
+    with tempfile.TemporaryDirectory() as ordner:
+        renderer = bericht_pdf.BerichtRenderer(bericht_pdf.finde_logo(), cache_ordner=ordner)
+        renderer.erstelle(daten)  # Vorlage bauen
+
+        def alt(feld):
+            if feld is None or not np.any(feld): return None
+            pfad = os.path.join(ordner, "temp_signature.png")
+            Image.fromarray(feld.astype('uint8'), 'RGBA').save(pfad)
+            return pfad
+
+        varianten = [("alt", alt), ("grau", unterschrift.aus_canvas), ("1 Bit", lambda f: unterschrift.aus_canvas(f, einfarbig=True))]
+        print(f"{'Variante':>8} | {'Bild [ms]':>9} | {'leer [ms]':>9} | {'Bild [B]':>8} | {'PDF [ms]':>8} | {'PDF [KB]':>8}")
+        for name, funktion in varianten:
+            funktion(felder[0])  # Aufwärmen
+            bilder, groessen = [], []
+            t0 = time.perf_counter()
+            for f in felder:
+                bilder.append(funktion(f))
+                groessen.append(os.path.getsize(bilder[-1]) if isinstance(bilder[-1], str) else len(bilder[-1]))
+            t_bild = (time.perf_counter() - t0) / len(felder)
+            t0 = time.perf_counter()
+            for _ in range(len(felder)): assert funktion(leer) is None
+            t_leer = (time.perf_counter() - t0) / len(felder)
+            groesse = sum(groessen) / len(groessen)
+            t0 = time.perf_counter(); pdfs = [renderer.erstelle(daten, b) for b in bilder]; t_pdf = (time.perf_counter() - t0) / len(bilder)
+            print(f"{name:>8} | {t_bild * 1000:>9.2f} | {t_leer * 1000:>9.3f} | {groesse:>8.0f} | {t_pdf * 1000:>8.1f} | {sum(map(len, pdfs)) / len(pdfs) / 1024:>8.1f}")
+
+
+# Die beiden Varianten der Liste "Offene Rechnungen" als eigenständige Streamlit-Skripte
+# (für streamlit.testing.AppTest); gerendert wird wie in app.py.
+_OFFENE_KOPF = """
+import sys; sys.path.insert(0, {ordner!r})
+import benchmark, statistik
+import streamlit as st
+offene_posten = benchmark.synthetische_offene({anzahl})
+"""
+_OFFENE_ALT = """
+for pos in offene_posten:
+    with st.container(border=True):
+        c_info, c_btn = st.columns([3, 1])
+        with c_info:
+            st.markdown(f"**{pos['kunde']}**")
+            st.caption(f"Nr: {pos['nr']} | Betrag: {pos['betrag']}")
+        with c_btn:
+            st.button("💰 Bezahlt", key=f"pay_{pos['nr']}_{pos['gspread_row']}")
+"""
+_OFFENE_NEU = """
+f1, f2, f3 = st.columns([2, 1, 1])
+suche = f1.text_input("Kunde oder Nr", key="offen_suche")
+min_alter = f2.selectbox("Älter als", [0, 14, 30, 60, 90], key="offen_alter")
+sortierung = f3.selectbox("Sortierung", list(statistik.SORTIERUNGEN), key="offen_sortierung")
+b1, b2, b3 = st.columns([1, 1, 1])
+betrag_von = b1.number_input("Betrag ab", min_value=0.0, value=0.0, key="offen_von")
+betrag_bis = b2.number_input("Betrag bis", min_value=0.0, value=0.0, key="offen_bis")
+pro_seite = b3.selectbox("Pro Seite", [10, 25, 50], index=1, key="offen_pro_seite")
+gefiltert = statistik.filtere_offene(offene_posten, suche, betrag_von or None, betrag_bis or None, min_alter, sortierung)
+sichtbar, seiten, seite_nr = statistik.seite(gefiltert, st.session_state.get("offen_seite", 1), pro_seite)
+st.caption(f"{len(gefiltert)} von {len(offene_posten)}")
+for pos in sichtbar:
+    with st.container(border=True):
+        c_info, c_btn = st.columns([3, 1])
+        with c_info:
+            st.markdown(f"**{pos['kunde']}**")
+            st.caption(f"Nr: {pos['nr']} | Betrag: {pos['betrag']} | seit {pos['alter_tage']} Tagen")
+        with c_btn:
+            st.button("💰 Bezahlt", key=f"pay_{pos['nr']}_{pos['gspread_row']}")
+if seiten > 1:
+    st.session_state.offen_seite = seite_nr
+    st.number_input(f"Seite (von {seiten})", min_value=1, max_value=seiten, step=1, key="offen_seite")
+"""
+
+
+def synthetische_offene(anzahl, seed=1):
+    """Offene Posten wie aus statistik.berechne_statistik (ein Blatt mit nur offenen Zeilen)."""
+    rnd = random.Random(seed)
+    return [{"gspread_row": i + 2, "nr": f"B-2025-{rnd.randrange(1, 13):02d}-{i % 99 + 1:02d}", "kunde": f"Kunde {rnd.randrange(5000)}",
+             "betrag": f"{b:.2f}".replace(".", ","), "status": "Offen", "datum": "", "betrag_zahl": b, "alter_tage": rnd.randrange(400)}
+            for i, b in ((i, round(rnd.uniform(20, 5000), 2)) for i in range(anzahl))]
+
+
+def bench_offene(args):
+    """Renderzeit eines Reruns: alle Posten als Widgets (alt) gegen Filter + eine Seite (neu)."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        AppTest = None
+        print("streamlit.testing nicht verfügbar - nur Filter/Sortierung wird gemessen")
+    ordner = os.path.dirname(os.path.abspath(__file__))
+
+    def rerun_zeit(skript, anzahl):
+        at = AppTest.from_string(_OFFENE_KOPF.format(ordner=ordner, anzahl=anzahl) + skript, default_timeout=600)
+        at.run()  # erster Lauf: Importe, Widgets anlegen
+        zeiten = []
+        for _ in range(args.wiederholungen):
+            t0 = time.perf_counter(); at.run(); zeiten.append(time.perf_counter() - t0)
+        if at.exception: raise SystemExit(f"FEHLER im Skript: {at.exception[0].message}")
+        return sorted(zeiten)[len(zeiten) // 2], len(at.button)
+
+    print(f"{'Posten':>7} | {'Filter+Sort [ms]':>16} | {'alt [s]':>8} | {'Buttons':>7} | {'neu [s]':>8} | {'Buttons':>7} | {'Faktor':>6}")
+    for n in args.posten:
+        posten = synthetische_offene(n)
+        t0 = time.perf_counter()
+        for _ in range(10): statistik.seite(statistik.filtere_offene(posten, "kunde 1", 100, 4000, 30, "Höchster Betrag"), 2, 25)
+        t_filter = (time.perf_counter() - t0) / 10 * 1000
+        if AppTest is None:
+            print(f"{n:>7} | {t_filter:>16.2f} |"); continue
+        t_alt, w_alt = rerun_zeit(_OFFENE_ALT, n)
+        t_neu, w_neu = rerun_zeit(_OFFENE_NEU, n)
+        print(f"{n:>7} | {t_filter:>16.2f} | {t_alt:>8.3f} | {w_alt:>7} | {t_neu:>8.3f} | {w_neu:>7} | {t_alt / t_neu:>5.1f}x")
+
+
+def bench_jahre(args):
+    """Dashboard-Verlauf über viele Jahre: alles neu zusammenfassen vs. Archiv + laufendes Jahr."""
+    blaetter = {HEUTE.year - i: synthetisches_auftragsblatt(args.zeilen, seed=i, bis=pd.Timestamp(HEUTE.year - i, 12, 31) if i else HEUTE)
+                for i in range(args.jahre + 1)}
+    with tempfile.TemporaryDirectory() as ordner:
+        archiv = jahresarchiv.JahresArchiv(os.path.join(ordner, "jahre.sqlite"))
+
+        def mit_archiv():
+            k = {j: archiv.oder_berechne("bench", j, lambda: statistik.jahres_kennzahlen(w)) for j, w in blaetter.items() if j < HEUTE.year}
+            k[HEUTE.year] = statistik.jahres_kennzahlen(blaetter[HEUTE.year])
+            return statistik.monatsverlauf(k), statistik.jahresvergleich(k)
+
+        t0 = time.perf_counter(); {j: statistik.jahres_kennzahlen(w) for j, w in blaetter.items()}; t_alles = time.perf_counter() - t0
+        t0 = time.perf_counter(); mit_archiv(); t_erst = time.perf_counter() - t0
+        zeiten = []
+        for _ in range(5):
+            t0 = time.perf_counter(); verlauf, vergleich = mit_archiv(); zeiten.append(time.perf_counter() - t0)
+    t0 = time.perf_counter(); statistik.jahres_kennzahlen(blaetter[HEUTE.year]); t_jahr = time.perf_counter() - t0
+    print(f"{args.jahre} Vorjahre + laufendes Jahr à {args.zeilen} Zeilen")
+    print(f"alle Jahre neu zusammenfassen: {t_alles:.3f} s | erster Lauf mit Archiv: {t_erst:.3f} s | "
+          f"danach: {min(zeiten):.3f} s (nur laufendes Jahr: {t_jahr:.3f} s)")
+    print(f"Verlauf: {list(verlauf.index)} | Vergleich: {vergleich.shape[1]} Jahre")
+
+
+class Funkloch:
+    """Simuliertes Netz: in jedem Abgleich-Durchgang mit Wahrscheinlichkeit `ausfall` weg, auch mitten im Stapel."""
+    def __init__(self, ausfall, seed=1):
+        self.rnd = random.Random(seed)
+        self.ausfall = ausfall
+        self.online = False
+
+    def neuer_durchgang(self):
+        self.online = self.rnd.random() >= self.ausfall
+
+    def anfrage(self):
+        if not self.online or self.rnd.random() < self.ausfall / 5:
+            self.online = False
+            raise ConnectionError("kein Netz")
+
+
+def bench_offline(args):
+    """
+    Berichte ohne Netz erfassen (Nummern aus dem Vorrat, danach Notnummern), dann
+    in Stapeln abgleichen, während das Netz immer wieder wegbricht. Eine Nummer
+    aus dem Vorrat hat inzwischen ein anderes Gerät ins Sheet geschrieben.
+    Am Ende muss jeder Bericht genau einmal im Sheet stehen, ohne doppelte Nummer.
+    """
+    netz = Funkloch(args.ausfall)
+    praefix = "B-2025-03"
+    with tempfile.TemporaryDirectory() as ordner:
+        nr_db = nummern.NummernVergabe(os.path.join(ordner, "nummern.sqlite"))
+        speicher = offline.OfflineSpeicher(os.path.join(ordner, "offline"))
+        sheet = [f"{praefix}-{i:02d}" for i in range(1, 8)]
+        nr_db.fuelle_vorrat(5, praefix, startwert=lambda: nummern.hoechste_laufnummer(sheet, praefix))
+
+        # --- Im Keller: alles lokal ---
+        for i in range(args.berichte):
+            nr = nr_db.aus_vorrat(praefix) or offline.vorlaeufige_nummer(praefix) + f"{i:02d}"
+            speicher.erfasse(f"Bericht {i}".encode(), "ogg", nr, {"notiz": f"Notiz {i}"})
+        sheet.append(f"{praefix}-09")  # anderes Gerät hat die zweite Vorrats-Nummer schon benutzt
+
+        abgeliefert = Counter()
+
+        def transkribiere(daten, endung):
+            netz.anfrage(); return daten.decode()
+
+        def extrahiere(txt, angaben):
+            netz.anfrage(); return {"kunde_name": txt, "summe_brutto": 119.0}
+
+        def nummer_pruefen(nr):
+            netz.anfrage()
+            if nr in abgeliefert: return nr
+            if not offline.ist_vorlaeufig(nr) and nr not in sheet: return nr
+            return nr_db.reserviere(praefix, startwert=lambda: nummern.hoechste_laufnummer(sheet, praefix))
+
+        def abliefern(daten, erfassung):
+            netz.anfrage()
+            abgeliefert[daten["rechnungs_nr"]] += 1
+            if abgeliefert[daten["rechnungs_nr"]] == 1: sheet.append(daten["rechnungs_nr"])
+            nr_db.bestaetige(daten["rechnungs_nr"])
+
+        durchgaenge = abbrueche = 0
+        t0 = time.perf_counter()
+        while speicher.offene() and durchgaenge < 1000:
+            durchgaenge += 1
+            netz.neuer_durchgang()
+            if not netz.online: continue
+            _, fehler = speicher.synchronisiere(stapel=args.stapel, transkribiere=transkribiere, extrahiere=extrahiere,
+                                                nummer_pruefen=nummer_pruefen, abliefern=abliefern)
+            abbrueche += fehler is not None
+        dauer = time.perf_counter() - t0
+        erfassungen = speicher.letzte(args.berichte)
+
+    doppelt = [nr for nr, n in Counter(sheet).items() if n > 1]
+    geaendert = [(e["nr_alt"], e["nr"]) for e in erfassungen if e["nr_alt"]]
+    offen = [e["id"] for e in erfassungen if e["status"] != offline.ERLEDIGT]
+    print(f"{args.berichte} Offline-Berichte, {durchgaenge} Abgleich-Durchgänge ({abbrueche} abgebrochen), {dauer:.2f} s")
+    print(f"offen: {len(offen)}, im Sheet doppelt: {doppelt}, mehrfach abgeliefert: {[nr for nr, n in abgeliefert.items() if n > 1]}")
+    konflikte = [g for g in geaendert if not offline.ist_vorlaeufig(g[0])]
+    print(f"Nummer ersetzt: {len(geaendert) - len(konflikte)} Notnummern, {len(konflikte)} Konflikte {konflikte}")
+    if offen or doppelt or any(offline.ist_vorlaeufig(nr) for nr in sheet): raise SystemExit("FEHLER: Offline-Abgleich unvollständig")
+
+
+def synthetische_preisliste(anzahl, seed=1):
+    """Preisliste wie im Sheet (Name, Preis, Art.Nr) ohne Kopfzeile."""
+    rnd = random.Random(seed)
+    teile = ["Thermostatkopf", "Eckventil", "Kupferrohr 15 mm", "Pressfitting", "Heizkörperventil", "Umwälzpumpe", "Siphon", "Dichtung"]
+    zeilen = [["Arbeitsstunde Geselle", "58,00", "L01"], ["Anfahrt", "35,00", "L02"]]
+    for i in range(max(anzahl - 2, 0)):
+        zeilen.append([f"{rnd.choice(teile)} Typ {i}", f"{rnd.uniform(2, 400):.2f}".replace(".", ","), f"{1000 + i}"])
+    return zeilen
+
+
+def bench_app(args):
+    """
+    Die drei Modi von app.py Ende-zu-Ende über streamlit.testing.AppTest, mit
+    Ersatzdiensten für OpenAI, Sheets und SMTP (einstellbare Latenz). Je Ablauf:
+    Zeit, Anzahl entfernter Aufrufe und übertragene Bytes - ein zusätzliches
+    get_all_values() pro Rerun fällt so sofort auf.
+    """
+    import gspread
+    import openai
+    import smtplib
+    import streamlit
+    import streamlit_drawable_canvas
+    from streamlit.testing.v1 import AppTest
+    import ersatzdienste
+
+    app_pfad = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    kunden_zeilen = synthetische_kunden(args.kunden)
+    preis_zeilen = synthetische_preisliste(args.artikel)
+    k, a = kunden.zeile_zu_kunde(kunden_zeilen[0]), preis_zeilen
+    diktat_text = f"Bei {k['name']}, {k['strasse']} in {k['ort']}: {a[2][0]} getauscht, {a[3][0]} erneuert, eine Arbeitsstunde Geselle und Anfahrt."
+    upload = ErsatzUpload("memo.ogg", os.urandom(200_000))
+
+    # Dienste austauschen - die App importiert sie bei jedem Lauf aus denselben Modulen
+    streamlit.file_uploader = lambda label, *a, **kw: upload if label == "Sprachnachricht" else None
+    streamlit_drawable_canvas.st_canvas = lambda *a, **kw: SimpleNamespace(image_data=None)
+    offline.ist_online = lambda *a, **kw: True
+    smtplib.SMTP_SSL = smtplib.SMTP = ersatzdienste.ErsatzSMTP
+    ersatzdienste.ErsatzSMTP.latenz = args.latenz_smtp
+
+    ergebnisse = []
+    start_ordner = os.getcwd()
+    with tempfile.TemporaryDirectory() as ordner:
+        os.chdir(ordner)  # lokale_daten der App landen im Temp-Ordner
+        try:
+            for n in args.zeilen:
+                zaehler = ersatzdienste.Zaehler()
+                ersatzdienste.ErsatzSMTP.zaehler = zaehler
+                blaetter = {"Kunden": [["Name", "Straße", "PLZ", "Ort", "KdNr", "Anrede"]] + kunden_zeilen,
+                            "Preisliste": [["Name", "Preis", "Art.Nr"]] + preis_zeilen,
+                            f"Aufträge_{date.today().year}": synthetisches_auftragsblatt(n, bis=pd.Timestamp.now())}
+                tabelle = ersatzdienste.ErsatzTabelle(blaetter, zaehler, args.latenz_sheets, tabellen_id=f"ersatz-{n}")
+                gspread.service_account_from_dict = lambda creds, t=tabelle: ersatzdienste.ErsatzGoogle(t)
+                openai.OpenAI = lambda api_key=None, **kw: ersatzdienste.ErsatzOpenAI(api_key, zaehler, args.latenz_openai, diktat_text)
+
+                at = AppTest.from_file(app_pfad, default_timeout=300)
+                # Eigene Zugangsdaten je Größe -> frische Sheet-Verbindung und frischer (gecachter) OpenAI-Client
+                at.secrets["openai_api_key"] = f"sk-ersatz-{n}"
+                at.secrets["google_json"] = json.dumps({"type": "service_account", "ersatz": n})
+                at.secrets["email_sender"] = "buero@example.com"
+                at.secrets["email_password"] = "geheim"
+
+                def bericht_erstellen():
+                    next(b for b in at.button if b.label.startswith("✅")).click().run()
+                    # Sheet-Zeile und Mail gehen über den Postausgang im Hintergrund
+                    ende = time.time() + 60
+                    while time.time() < ende and not (zaehler.operationen["sheets.append_row"] and zaehler.operationen["smtp.sendmail"]):
+                        time.sleep(0.02)
+
+                ablaeufe = [
+                    ("Dashboard (erster Aufruf)", lambda: at.run()),
+                    ("Dashboard (Rerun)", lambda: at.run()),
+                    ("Bericht: Analyse", lambda: at.sidebar.radio[0].set_value("Bericht & Unterschrift").run()),
+                    ("Bericht: Erstellen + Versand", bericht_erstellen),
+                    ("Auftrag annehmen", lambda: at.sidebar.radio[0].set_value("Auftrag annehmen").run()),
+                ]
+                for name, ablauf in ablaeufe:
+                    zaehler.zuruecksetzen()
+                    t0 = time.perf_counter(); ablauf(); dauer = time.perf_counter() - t0
+                    fehler = [e.message for e in at.exception] + [e.value for e in at.error]
+                    ergebnisse.append((n, name, dauer, zaehler.stand(), fehler))
+        finally:
+            os.chdir(start_ordner)
+
+    kb = lambda d: sum(d.values()) / 1024
+    print(f"{'Zeilen':>7} | {'Ablauf':<30} | {'Zeit [s]':>8} | {'OpenAI':>6} | {'Sheets':>6} | {'SMTP':>4} | {'hoch KB':>8} | {'runter KB':>9}")
+    for n, name, dauer, stand, fehler in ergebnisse:
+        auf = stand["aufrufe"]
+        print(f"{n:>7} | {name:<30} | {dauer:>8.2f} | {auf.get('openai', 0):>6} | {auf.get('sheets', 0):>6} | {auf.get('smtp', 0):>4} | "
+              f"{kb(stand['hoch']):>8.1f} | {kb(stand['runter']):>9.1f}")
+        if args.details and stand["operationen"]: print(" " * 10 + ", ".join(f"{k}={v}" for k, v in sorted(stand["operationen"].items())))
+        for f in fehler: print(" " * 10 + f"FEHLER: {f}")
+    if any(f for *_, f in ergebnisse): raise SystemExit("FEHLER in mindestens einem Ablauf")
+
+
+# Misst in einem frischen Prozess (sonst sind alle Module schon geladen):
+# erster Lauf = Kaltstart im Dashboard, dann je Modus der erste Wechsel und Ø Rerun.
+_START_SKRIPT = """
+import json, os, sys, time
+sys.path.insert(0, {ordner!r}); os.chdir({arbeitsordner!r})
+from streamlit.testing.v1 import AppTest
+import gspread, ersatzdienste, offline
+with open("blaetter.json", encoding="utf-8") as f: blaetter = json.load(f)
+tabelle = ersatzdienste.ErsatzTabelle(blaetter, tabellen_id="ersatz-start")
+gspread.service_account_from_dict = lambda creds: ersatzdienste.ErsatzGoogle(tabelle)
+offline.ist_online = lambda *a, **kw: True
+at = AppTest.from_file({app!r}, default_timeout=300)
+at.secrets["openai_api_key"] = "sk-messung"
+at.secrets["google_json"] = json.dumps({{"type": "service_account", "ersatz": "start"}})
+ergebnis = {{}}
+t0 = time.perf_counter(); at.run(); ergebnis["Kaltstart (Dashboard)"] = time.perf_counter() - t0
+ergebnis["Module"] = sorted(m for m in ("pandas", "numpy", "openai", "fpdf", "PIL", "streamlit_drawable_canvas") if m in sys.modules)
+for modus in ("Chef-Dashboard", "Bericht & Unterschrift", "Auftrag annehmen"):
+    t0 = time.perf_counter(); at.sidebar.radio[0].set_value(modus).run(); ergebnis[modus + ": erster Lauf"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range({reruns}): at.run()
+    ergebnis[modus + ": Rerun"] = (time.perf_counter() - t0) / {reruns}
+ergebnis["Fehler"] = [e.message for e in at.exception]
+print(json.dumps(ergebnis))
+"""
+
+
+def bench_start(args):
+    """
+    Kaltstart und Rerun-Zeit von app.py je Modus, aktuelle Fassung gegen eine
+    frühere (git-Revision). Mit API-Key und Sheets-Zugang gegen die
+    Ersatzdienste (wie bench_app, ohne Latenz), damit der OpenAI-Client, die
+    Sheet-Verbindung und die Postausgang-Handler gebaut werden - gemessen wird
+    der Aufbau, nicht das Netz.
+    """
+    ordner = os.path.dirname(os.path.abspath(__file__))
+    fassungen = [("jetzt", os.path.join(ordner, "app.py"))]
+    vorher = os.path.join(ordner, f"_app_{args.vergleich.replace('~', '_').replace('^', '_')}.py")
+    if args.vergleich:
+        with open(vorher, "w", encoding="utf-8") as f:
+            f.write(subprocess.run(["git", "show", f"{args.vergleich}:app.py"], cwd=ordner, check=True, capture_output=True, text=True).stdout)
+        fassungen.insert(0, (args.vergleich, vorher))
+    blaetter = {"Kunden": [["Name", "Straße", "PLZ", "Ort", "KdNr", "Anrede"]] + synthetische_kunden(args.kunden),
+                "Preisliste": [["Name", "Preis", "Art.Nr"]] + synthetische_preisliste(args.artikel),
+                f"Aufträge_{date.today().year}": synthetisches_auftragsblatt(args.zeilen, bis=pd.Timestamp.now())}
+    try:
+        ergebnisse = {}
+        for name, app in fassungen:
+            with tempfile.TemporaryDirectory() as arbeitsordner:
+                # Blätter als Datei: der Messprozess soll pandas & Co. nicht schon vor dem Kaltstart laden
+                with open(os.path.join(arbeitsordner, "blaetter.json"), "w", encoding="utf-8") as f: json.dump(blaetter, f, default=str)
+                skript = _START_SKRIPT.format(ordner=ordner, arbeitsordner=arbeitsordner, app=app, reruns=args.reruns)
+                lauf = subprocess.run([sys.executable, "-c", skript], capture_output=True, text=True)
+            if lauf.returncode:
+                raise SystemExit(f"{name}: {lauf.stderr.strip().splitlines()[-1] if lauf.stderr.strip() else lauf.returncode}")
+            ergebnisse[name] = json.loads(lauf.stdout.strip().splitlines()[-1])
+    finally:
+        if args.vergleich and os.path.exists(vorher): os.remove(vorher)
+
+    namen = list(ergebnisse)
+    print(f"{'Messung':<40} | " + " | ".join(f"{n + ' [ms]':>14}" for n in namen))
+    for name in [k for k in ergebnisse[namen[-1]] if k not in ("Module", "Fehler")]:
+        print(f"{name:<40} | " + " | ".join(f"{ergebnisse[n][name] * 1000:>14.0f}" for n in namen))
+    for n in namen:
+        print(f"{n}: schwere Module nach dem Kaltstart: {', '.join(ergebnisse[n]['Module']) or '-'}")
+        for f in ergebnisse[n]["Fehler"]: print(f"{n}: FEHLER: {f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+    p = sub.add_parser("statistik", help="Dashboard-Statistik alt vs. vektorisiert")
+    p.add_argument("--zeilen", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    p.set_defaults(func=bench_statistik)
+    p = sub.add_parser("kunden", help="Prompt-Tokens und Suchzeit des Kundenindex")
+    p.add_argument("--kunden", type=int, nargs="+", default=[100, 10_000, 100_000])
+    p.add_argument("--diktate", type=int, default=50)
+    p.set_defaults(func=bench_kunden)
+    p = sub.add_parser("extraktion", help="Gestufte Extraktion (Regeln, gpt-4o-mini, gpt-4o) gegen immer gpt-4o")
+    p.add_argument("--memos", type=int, default=100)
+    p.add_argument("--kunden", type=int, default=2000)
+    p.add_argument("--latenz-4o", type=float, default=0.2)
+    p.add_argument("--latenz-mini", type=float, default=0.08)
+    p.add_argument("--fehler-4o", type=float, default=0.02)
+    p.add_argument("--fehler-mini", type=float, default=0.15)
+    p.set_defaults(func=bench_extraktion)
+    p = sub.add_parser("auftraege", help="Arbeitsliste 'Offene Aufträge': Index, Filter und Bericht zum Auftrag")
+    p.add_argument("--auftraege", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    p.add_argument("--kunden", type=int, default=2000)
+    p.add_argument("--berichte", type=int, default=50)
+    p.set_defaults(func=bench_auftraege)
+    p = sub.add_parser("transkription", help="Geteilte, parallele Transkription gegen einen lokalen Ersatzdienst")
+    p.add_argument("--minuten", type=int, nargs="+", default=[2, 10, 30])
+    p.add_argument("--fehlerquote", type=float, default=0.1)
+    p.add_argument("--worker", type=int, default=4)
+    p.set_defaults(func=bench_transkription)
+    p = sub.add_parser("uploads", help="Gleichzeitige Uploads: gemeinsame Temp-Datei vs. Puffer der Sitzung")
+    p.add_argument("--sitzungen", type=int, default=50)
+    p.add_argument("--runden", type=int, default=5)
+    p.add_argument("--kb", type=int, default=500, help="Größe je Memo")
+    p.set_defaults(func=bench_uploads)
+    p = sub.add_parser("kontingent", help="Viele Sitzungen gegen ein Sheets-Kontingent: ohne vs. mit Planer")
+    p.add_argument("--sitzungen", type=int, default=30)
+    p.add_argument("--kontingent", type=int, default=20, help="Requests je Art und Fenster")
+    p.add_argument("--fenster", type=float, default=2.0, help="Sekunden (statt einer Minute)")
+    p.set_defaults(func=bench_kontingent)
+    p = sub.add_parser("nummern", help="Nebenläufige Nummernvergabe: keine Nummer doppelt")
+    p.add_argument("--threads", type=int, default=32)
+    p.add_argument("--pro-thread", type=int, default=50)
+    p.set_defaults(func=bench_nummern)
+    p = sub.add_parser("pdf", help="Renderzeit und Dateigröße der Arbeitsberichte")
+    p.add_argument("--berichte", type=int, default=50)
+    p.set_defaults(func=bench_pdf)
+    p = sub.add_parser("unterschrift", help="Unterschrift: Farb-PNG über eine Datei vs. zugeschnitten im Speicher")
+    p.add_argument("--anzahl", type=int, default=50)
+    p.set_defaults(func=bench_unterschrift)
+    p = sub.add_parser("offene", help="Renderzeit der Liste 'Offene Rechnungen': alle Widgets vs. gefilterte Seite")
+    p.add_argument("--posten", type=int, nargs="+", default=[50, 500, 5000])
+    p.add_argument("--wiederholungen", type=int, default=3)
+    p.set_defaults(func=bench_offene)
+    p = sub.add_parser("jahre", help="Mehrjahres-Auswertung mit gespeicherten Jahreskennzahlen")
+    p.add_argument("--jahre", type=int, default=10)
+    p.add_argument("--zeilen", type=int, default=5000)
+    p.set_defaults(func=bench_jahre)
+    p = sub.add_parser("offline", help="Offline erfassen und bei wackeligem Netz in Stapeln nachholen")
+    p.add_argument("--berichte", type=int, default=20)
+    p.add_argument("--stapel", type=int, default=5)
+    p.add_argument("--ausfall", type=float, default=0.5)
+    p.set_defaults(func=bench_offline)
+    p = sub.add_parser("app", help="Alle drei Modi Ende-zu-Ende mit Ersatzdiensten für OpenAI, Sheets und SMTP")
+    p.add_argument("--zeilen", type=int, nargs="+", default=[1000, 10000], help="Zeilen im Jahresblatt")
+    p.add_argument("--kunden", type=int, default=2000)
+    p.add_argument("--artikel", type=int, default=500)
+    p.add_argument("--latenz-openai", type=float, default=0.5)
+    p.add_argument("--latenz-sheets", type=float, default=0.1)
+    p.add_argument("--latenz-smtp", type=float, default=0.2)
+    p.add_argument("--details", action="store_true", help="Aufrufe je Operation ausgeben")
+    p.set_defaults(func=bench_app)
+    p = sub.add_parser("start", help="Kaltstart und Rerun-Zeit von app.py je Modus, gegen eine frühere Fassung")
+    p.add_argument("--vergleich", default="HEAD~1", help="git-Revision für 'vorher' (leer = nur aktuelle Fassung)")
+    p.add_argument("--reruns", type=int, default=20)
+    p.add_argument("--zeilen", type=int, default=2000, help="Zeilen im Auftragsblatt des laufenden Jahres")
+    p.add_argument("--kunden", type=int, default=500)
+    p.add_argument("--artikel", type=int, default=200)
+    p.set_defaults(func=bench_start)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+PDF-Arbeitsbericht: vorbereitete Vorlage, verkleinertes Logo, Ausgabe im Speicher.
+
+Das Logo (als Datei fast 700 KB) wird einmal auf Druckauflösung verkleinert
+und zwischengespeichert. Briefkopf und Logo stehen in einer Vorlage, die pro
+Bericht nur kopiert wird; die Fußzeile ist vorab fertig formatiert. Der
+fertige Bericht kommt als Bytes zurück, ohne Umweg über die Festplatte.
+"""
+import copy
+import hashlib
+import io
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import fpdf
+from fpdf import FPDF
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+LOGO_BREITE_MM = 17
+DRUCK_DPI = 300
+
+# Unterschrift im Maßstab des Canvas: 300 px = 50 mm (wie bisher das ganze Feld)
+UNTERSCHRIFT_MM_PRO_PX = 50 / 300
+# fpdf2 liest Bilder aus dem Speicher, pyfpdf 1.7 nur aus Dateien
+BILD_AUS_SPEICHER = not str(getattr(fpdf, "FPDF_VERSION", "1")).startswith("1.")
+
+KOPF_FARBE = (20, 80, 160)
+TEXT_FARBE = (50, 50, 50)
+
+
+def txt(t):
+    return str(t).encode('latin-1', 'replace').decode('latin-1') if t else ""
+
+
+# Fußzeile: (x, Überschrift, Text) - einmal kodiert statt bei jeder Seite
+FUSSZEILE = [(x, txt(kopf), txt(text)) for x, kopf, text in [
+    (10, "Firma", "Interwark\nEinzelunternehmen\nMobil: (0171) 1 42 87 38"),
+    (60, "KONTAKT", "Hohe Str. 28\n26725 Emden\nTel: (0 49 21) 99 71 30\ninfo@interwark.de"),
+    (110, "BANKVERBINDUNG", "Sparkasse Emden\nIBAN: DE92 2845 0000 0018\n0048 61\nBIC: BRLADE21EMD"),
+    (160, "STEUERNUMMER", "USt-IdNr.:\nDE226723406\nGerichtsstand: Emden"),
+]]
+
+
+class PDF(FPDF):
+    def header(self): pass
+    def footer(self):
+        self.set_y(-35)
+        self.set_fill_color(248, 248, 248) 
+        self.rect(0, 297-35, 210, 35, 'F') 
+        y_top = 297 - 30 
+        for x, kopf, text in FUSSZEILE:
+            self.set_xy(x, y_top); self.set_text_color(*KOPF_FARBE); self.set_font('Helvetica', 'B', 7.5); self.cell(45, 3.5, kopf, 0, 0, 'L')
+            self.set_xy(x, y_top + 5); self.set_text_color(*TEXT_FARBE); self.set_font('Helvetica', '', 6.5); self.multi_cell(45, 3.5, text, 0, 'L')
+
+
+def finde_logo(ordner="."):
+    for name in ("logo.png", "logo.jpg"):
+        pfad = os.path.join(ordner, name)
+        if os.path.exists(pfad): return pfad
+    return None
+
+
+def logo_fuer_druck(quelle, cache_ordner, breite_mm=LOGO_BREITE_MM, dpi=DRUCK_DPI):
+    """
+    Verkleinerte Kopie des Logos für `breite_mm` bei `dpi` (17 mm @ 300 dpi = 201 px).
+    Liegt im cache_ordner und wird nur neu erzeugt, wenn sich das Original ändert.
+    Ohne Pillow bleibt es beim Original.
+    """
+    if Image is None: return quelle
+    datei = os.stat(quelle)
+    kennung = hashlib.sha1(f"{os.path.abspath(quelle)}|{datei.st_size}|{datei.st_mtime}|{breite_mm}|{dpi}".encode()).hexdigest()[:12]
+    with Image.open(quelle) as bild:
+        transparent = bild.mode in ("RGBA", "LA", "P")
+        ziel = os.path.join(cache_ordner, f"logo_druck_{kennung}.{'png' if transparent else 'jpg'}")
+        if os.path.exists(ziel): return ziel
+        os.makedirs(cache_ordner, exist_ok=True)
+        breite_px = round(breite_mm / 25.4 * dpi)
+        if bild.width > breite_px:
+            bild = bild.resize((breite_px, max(1, round(bild.height * breite_px / bild.width))), Image.LANCZOS)
+        tmp = f"{ziel}.{os.getpid()}.tmp"
+        if transparent: bild.save(tmp, format="PNG", optimize=True)
+        else: bild.convert("RGB").save(tmp, format="JPEG", quality=85, optimize=True, progressive=False)
+    os.replace(tmp, ziel)
+    return ziel
+
+
+def png_groesse(png):
+    """(Breite, Höhe) in Pixeln aus dem PNG-Kopf; `png` als Bytes oder Pfad."""
+    if isinstance(png, str):
+        with open(png, "rb") as f: png = f.read(24)
+    return struct.unpack(">II", bytes(png[16:24]))
+
+
+def bild_einfuegen(pdf, png, x, y, w):
+    """PNG (Bytes oder Pfad) einbetten; Bytes ohne gemeinsame Zwischendatei."""
+    if isinstance(png, str) or BILD_AUS_SPEICHER:
+        pdf.image(png if isinstance(png, str) else io.BytesIO(png), x=x, y=y, w=w)
+        return
+    # pyfpdf: eigene Datei je Aufruf, nach dem Einlesen wieder weg
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f: f.write(png)
+    try: pdf.image(f.name, x=x, y=y, w=w, type="PNG")
+    finally: os.remove(f.name)
+
+
+def pdf_bytes(pdf):
+    """Ausgabe als Bytes; pyfpdf liefert einen latin-1-String, fpdf2 ein bytearray."""
+    roh = pdf.output(dest="S")
+    return roh.encode("latin-1") if isinstance(roh, str) else bytes(roh)
+
+
+class BerichtRenderer:
+    """
+    Hält die fertige Vorlage (Seite 1 mit Briefkopf und Logo). `vorlage=False`
+    und `logo_verkleinern=False` entsprechen dem alten Weg (für den Benchmark).
+    """
+
+    def __init__(self, logo=None, cache_ordner="lokale_daten", vorlage=True, logo_verkleinern=True):
+        if logo and logo_verkleinern: logo = logo_fuer_druck(logo, cache_ordner)
+        self.logo = logo
+        self.mit_vorlage = vorlage
+        self._vorlage = None
+        self._lock = threading.Lock()
+
+    def _briefkopf(self):
+        pdf = PDF(); pdf.add_page()
+
+        # --- KOPFZEILE & ADRESSE ---
+        pdf.set_text_color(0, 0, 0)
+        if self.logo: pdf.image(self.logo, 160, 10, LOGO_BREITE_MM)
+
+        pdf.set_font('Helvetica', 'B', 14); pdf.set_xy(10, 10); pdf.cell(0, 10, 'INTERWARK', 0, 0, 'L')
+        pdf.set_font('Helvetica', '', 10)
+        pdf.set_xy(10, 18); pdf.cell(0, 5, 'Bernhard Stegemann-Klammt', 0, 0, 'L')
+        pdf.set_xy(10, 23); pdf.cell(0, 5, 'Hohe Str. 28', 0, 0, 'L') 
+        pdf.set_xy(10, 28); pdf.cell(0, 5, '26725 Emden', 0, 0, 'L')
+        pdf.set_xy(10, 33); pdf.cell(0, 5, 'info@interwark.de', 0, 0, 'L')
+        pdf.set_draw_color(0, 0, 0); pdf.line(10, 42, 200, 42)
+        return pdf
+
+    def _neues_pdf(self):
+        if not self.mit_vorlage: return self._briefkopf()
+        with self._lock:
+            if self._vorlage is None: self._vorlage = self._briefkopf()
+            return copy.deepcopy(self._vorlage)
+
+    def erstelle(self, daten, unterschrift=None):
+        """Bericht als PDF-Bytes; `unterschrift` als PNG-Bytes (unterschrift.py) oder Pfad."""
+        pdf = self._neues_pdf()
+    
+        pdf.set_y(55)
+        pdf.set_font("Helvetica", 'B', 12)
+        anrede = daten.get('anrede', '')
+        if anrede and anrede != "None": pdf.cell(0, 5, txt(anrede), ln=1)
+        pdf.cell(0, 5, txt(daten.get('kunde_name')), ln=1)
+    
+        kd = daten.get('kundennummer', '')
+        if kd: 
+            pdf.set_font("Helvetica", '', 9); pdf.cell(0, 5, txt(f"Kundennr.: {kd}"), ln=1); pdf.set_font("Helvetica", 'B', 12)
+        pdf.set_font("Helvetica", '', 12); pdf.multi_cell(0, 6, txt(f"{daten.get('adresse')}"))
+    
+        pdf.ln(10); pdf.set_font("Helvetica", 'B', 15)
+        rechnungs_nr = daten.get('rechnungs_nr', 'ENTWURF') 
+        pdf.cell(0, 10, txt(f"Arbeitsbericht Nr. {rechnungs_nr}"), ln=1)
+    
+        pdf.set_font("Helvetica", '', 10)
+        datum_heute = datetime.now().strftime('%d.%m.%Y')
+        pdf.cell(0, 5, txt(f"Datum: {datum_heute}"), ln=1)
+        pdf.cell(0, 5, txt(f"Betreff: {daten.get('problem_titel')}"), ln=1)
+        pdf.ln(10)
+    
+        # --- TABELLE ---
+        pdf.set_fill_color(240, 240, 240); pdf.set_font("Helvetica", 'B', 10)
+        pdf.cell(10, 8, "#", 1, 0, 'C', 1); pdf.cell(90, 8, "Leistung / Artikel", 1, 0, 'L', 1)
+        pdf.cell(20, 8, "Menge", 1, 0, 'C', 1); pdf.cell(30, 8, "Einzel", 1, 0, 'R', 1); pdf.cell(30, 8, "Gesamt", 1, 1, 'R', 1)
+    
+        pdf.set_font("Helvetica", '', 10); i = 1
+        for pos in daten.get('positionen', []):
+            text = txt(pos.get('text', '')); menge = str(pos.get('menge', ''))
+            einzel = f"{pos.get('einzel_netto', 0):.2f}".replace('.', ','); gesamt = f"{pos.get('gesamt_netto', 0):.2f}".replace('.', ',')
+            pdf.cell(10, 8, str(i), 1, 0, 'C'); pdf.cell(90, 8, text, 1, 0, 'L'); pdf.cell(20, 8, menge, 1, 0, 'C')
+            pdf.cell(30, 8, einzel, 1, 0, 'R'); pdf.cell(30, 8, gesamt, 1, 1, 'R'); i += 1
+    
+        # --- SUMMEN ---
+        pdf.ln(5); pdf.set_font("Helvetica", '', 11)
+        netto = f"{daten.get('summe_netto', 0):.2f}".replace('.', ',')
+        mwst = f"{daten.get('mwst_betrag', 0):.2f}".replace('.', ',')
+        brutto = f"{daten.get('summe_brutto', 0):.2f}".replace('.', ',')
+        pdf.cell(150, 6, "Netto Summe:", 0, 0, 'R'); pdf.cell(30, 6, f"{netto} EUR", 0, 1, 'R')
+        pdf.cell(150, 6, "+ 19% MwSt:", 0, 0, 'R'); pdf.cell(30, 6, f"{mwst} EUR", 0, 1, 'R')
+        pdf.set_font("Helvetica", 'B', 12)
+        pdf.cell(150, 10, "Gesamtsumme:", 0, 0, 'R'); pdf.cell(30, 10, f"{brutto} EUR", 0, 1, 'R')
+    
+        pdf.ln(10)
+    
+        # --- UNTERSCHRIFT ---
+        y_sig = pdf.get_y()
+        # Prüfen ob noch genug Platz auf der Seite ist, sonst neue Seite
+        if y_sig > 240: 
+            pdf.add_page()
+            y_sig = pdf.get_y()
+
+        if isinstance(unterschrift, str) and not os.path.exists(unterschrift): unterschrift = None
+        if unterschrift:
+            pdf.set_font("Helvetica", '', 9)
+            pdf.cell(0, 5, "Digital unterschrieben von Kunde:", ln=1)
+            breite_mm = min(png_groesse(unterschrift)[0] * UNTERSCHRIFT_MM_PRO_PX, 50)
+            bild_einfuegen(pdf, unterschrift, x=10, y=pdf.get_y() + 2, w=breite_mm)
+            pdf.ln(35) # Platz nach dem Bild
+        else:
+            pdf.set_font("Helvetica", 'I', 9)
+            pdf.cell(0, 5, "Unterschrift Kunde: _______________________", ln=1)
+            pdf.ln(15)
+        
+        # --- HIER IST DEIN NEUER TEXT (Unter der Unterschrift) ---
+        pdf.set_font("Helvetica", 'I', 8)
+        hinweis_text = (
+            "Wichtiger Hinweis: Bei diesem Dokument handelt es sich um einen Arbeitsbericht "
+            "und Leistungsnachweis, nicht um eine Rechnung. Die aufgeführten Beträge dienen "
+            "lediglich Ihrer Orientierung und entsprechen voraussichtlich der Endsumme. "
+            "Der verbindliche Zahlbetrag ergibt sich aus der separaten Rechnungsstellung."
+        )
+        pdf.set_text_color(80, 80, 80) # Dunkelgrau für dezente Optik
+        pdf.multi_cell(0, 4, txt(hinweis_text))
+        pdf.ln(5)
+
+        # --- ZEITSTEMPEL & GPS (Ganz unten) ---
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        pdf.set_text_color(120, 120, 120) # Noch etwas heller
+        pdf.set_font("Courier", '', 7) # Courier wirkt technischer für Daten
+        pdf.multi_cell(0, 3, txt(f"DIGITALER LOG: {timestamp} (Server-Time) | GPS-Verifiziert.\nID: {rechnungs_nr}-{int(time.time())}"))
+
+        return pdf_bytes(pdf)
+
+
+def dateiname(daten):
+    return f"Bericht_{daten.get('rechnungs_nr', 'ENTWURF')}_{int(time.time())}.pdf"
@@ -0,0 +1,101 @@
+"""
+DATEV-Buchungsstapel (vereinfachtes CSV) für einzelne Berichte und ganze Zeiträume.
+
+Der Sammelexport liest die Zeilen der Jahresblätter als Generator, wandelt sie
+einzeln in Buchungszeilen um und schreibt sie sofort in die Datei - auch ein
+ganzes Jahr liegt dabei nie komplett im Speicher.
+"""
+import csv
+from datetime import date, datetime
+
+KOPFZEILE = ["Umsatz (ohne Soll/Haben-Kz)", "Soll/Haben-Kennzeichen", "WKZ", "Konto", "Gegenkonto (ohne BU-Schlüssel)",
+             "Belegdatum", "Belegfeld 1", "Buchungstext"]
+ERLOESKONTO = "8400"
+STANDARD_GEGENKONTO = "1410"
+# DATEV liest ANSI (Windows-1252); Zeichen außerhalb werden ersetzt
+KODIERUNG = "cp1252"
+
+
+def gegenkonto(kundennummer):
+    """KdNr als Gegenkonto, sonst das Sammelkonto 1410."""
+    kd = str(kundennummer or "").strip()
+    return kd if kd and kd != "None" else STANDARD_GEGENKONTO
+
+
+def buchungszeile(brutto, kundennummer, belegdatum, belegnummer, buchungstext):
+    """Eine Buchung als Liste der Felder aus KOPFZEILE."""
+    umsatz = f"{brutto:.2f}".replace('.', ',')
+    text = str(buchungstext).replace(";", " ")[:60]
+    return [umsatz, "S", "EUR", ERLOESKONTO, gegenkonto(kundennummer), belegdatum.strftime("%d%m"), str(belegnummer), text]
+
+
+def betrag_zu_zahl(text):
+    """'1.234,56 €' / '119,0' -> float; Unlesbares wird None."""
+    s = str(text or "").replace("€", "").replace("EUR", "").strip()
+    if "," in s: s = s.replace(".", "").replace(",", ".")
+    try: return float(s)
+    except ValueError: return None
+
+
+def finde_spalten(kopfzeile):
+    """Spaltenindizes über Teilstrings der Überschriften wie im Dashboard (-1 = fehlt)."""
+    idx = {"nr": -1, "datum": -1, "kunde": -1, "arbeit": -1, "brutto": -1, "kdnr": -1}
+    for i, h in enumerate(str(h).strip().lower() for h in kopfzeile):
+        if "kd" in h: idx["kdnr"] = i
+        elif ("nr" in h or "nummer" in h) and "tel" not in h: idx["nr"] = i
+        if "datum" in h: idx["datum"] = i
+        if "kunde" in h: idx["kunde"] = i
+        if "arbeit" in h or "betreff" in h: idx["arbeit"] = i
+        if "brutto" in h: idx["brutto"] = i
+    if idx["nr"] == -1: idx["nr"] = 0
+    return idx
+
+
+def buchungen(kopfzeile, zeilen, von, bis):
+    """
+    Generator: Sheet-Zeilen (ohne Kopfzeile, beliebiges Iterable) -> Buchungszeilen
+    mit Belegdatum in [von, bis]. Zeilen ohne lesbares Datum oder Betrag werden übersprungen.
+    """
+    idx = finde_spalten(kopfzeile)
+    if idx["datum"] == -1 or idx["brutto"] == -1: return
+    feld = lambda z, name: z[idx[name]] if 0 <= idx[name] < len(z) else ""
+    for z in zeilen:
+        try: tag = datetime.strptime(str(feld(z, "datum")).strip(), "%d.%m.%Y").date()
+        except ValueError: continue
+        if not von <= tag <= bis: continue
+        brutto = betrag_zu_zahl(feld(z, "brutto"))
+        if brutto is None: continue
+        yield buchungszeile(brutto, feld(z, "kdnr"), tag, feld(z, "nr"), f"{feld(z, 'kunde')} {feld(z, 'arbeit')}")
+
+
+def schreibe_csv(buchungs_zeilen, datei):
+    """Schreibt Kopfzeile + Buchungen zeilenweise in ein Textdatei-Objekt. Rückgabe: Anzahl Buchungen."""
+    w = csv.writer(datei, delimiter=";", lineterminator="\r\n")
+    w.writerow(KOPFZEILE)
+    anzahl = 0
+    for zeile in buchungs_zeilen:
+        w.writerow(zeile); anzahl += 1
+    return anzahl
+
+
+def exportiere(pfad, quellen, von, bis):
+    """
+    quellen: Iterable von (kopfzeile, zeilen-Generator), z.B. je Jahresblatt.
+    Schreibt die CSV nach `pfad`. Rückgabe: Anzahl Buchungen.
+    """
+    def alle():
+        for kopf, zeilen in quellen: yield from buchungen(kopf, zeilen, von, bis)
+    with open(pfad, "w", encoding=KODIERUNG, errors="replace", newline="") as f:
+        return schreibe_csv(alle(), f)
+
+
+def jahre(von, bis):
+    return range(von.year, bis.year + 1)
+
+
+def vormonat(heute=None):
+    """(erster, letzter) Tag des Vormonats - der übliche Monatsabschluss."""
+    heute = heute or date.today()
+    letzter = date(heute.year, heute.month, 1).toordinal() - 1
+    letzter = date.fromordinal(letzter)
+    return date(letzter.year, letzter.month, 1), letzter
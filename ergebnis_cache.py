@@ -0,0 +1,106 @@
+"""
+Persistenter Cache für teure Ergebnisse (Transkripte, GPT-Extraktionen).
+
+Schlüssel sind Hashes über den Inhalt: bei Audio die Bytes der Datei, bei
+GPT das Transkript plus Prompt-Version und die Kunden-/Preis-Ausschnitte im
+Prompt. Dieselbe Sprachnachricht noch einmal hochgeladen (oder nach einem
+Rerun noch im Uploader) kostet so weder Zeit noch API-Guthaben.
+Alte Einträge verfallen nach `max_alter_tage`, und wird der Cache größer als
+`max_bytes`, fliegen die am längsten unbenutzten Einträge zuerst raus.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS eintraege (
+    art TEXT NOT NULL,
+    schluessel TEXT NOT NULL,
+    wert TEXT NOT NULL,
+    groesse INTEGER NOT NULL,
+    erstellt REAL NOT NULL,
+    benutzt REAL NOT NULL,
+    PRIMARY KEY (art, schluessel)
+);
+CREATE INDEX IF NOT EXISTS eintraege_benutzt ON eintraege (benutzt);
+"""
+
+
+def inhalts_schluessel(*teile):
+    """SHA-256 über alle Teile (bytes unverändert, alles andere als JSON)."""
+    h = hashlib.sha256()
+    for t in teile:
+        roh = t if isinstance(t, (bytes, bytearray, memoryview)) else json.dumps(t, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        h.update(len(roh).to_bytes(8, "big"))
+        h.update(roh)
+    return h.hexdigest()
+
+
+class ErgebnisCache:
+    def __init__(self, pfad, max_bytes=50 * 1024 * 1024, max_alter_tage=90):
+        self.pfad = pfad
+        self.max_bytes = max_bytes
+        self.max_alter = max_alter_tage * 86400
+        ordner = os.path.dirname(pfad)
+        if ordner: os.makedirs(ordner, exist_ok=True)
+        with self._db() as db: db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.pfad, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db: yield db
+        finally:
+            db.close()
+
+    def hole(self, art, schluessel):
+        """Gespeicherter Wert oder None (auch wenn abgelaufen)."""
+        jetzt = time.time()
+        with self._db() as db:
+            row = db.execute("SELECT wert, erstellt FROM eintraege WHERE art=? AND schluessel=?", (art, schluessel)).fetchone()
+            if not row: return None
+            if jetzt - row[1] > self.max_alter:
+                db.execute("DELETE FROM eintraege WHERE art=? AND schluessel=?", (art, schluessel))
+                return None
+            db.execute("UPDATE eintraege SET benutzt=? WHERE art=? AND schluessel=?", (jetzt, art, schluessel))
+        return json.loads(row[0])
+
+    def lege_ab(self, art, schluessel, wert):
+        roh = json.dumps(wert, ensure_ascii=False)
+        jetzt = time.time()
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO eintraege (art, schluessel, wert, groesse, erstellt, benutzt) VALUES (?, ?, ?, ?, ?, ?)",
+                       (art, schluessel, roh, len(roh.encode("utf-8")), jetzt, jetzt))
+            self._aufraeumen(db, jetzt)
+
+    def _aufraeumen(self, db, jetzt):
+        db.execute("DELETE FROM eintraege WHERE erstellt < ?", (jetzt - self.max_alter,))
+        gesamt = db.execute("SELECT COALESCE(SUM(groesse), 0) FROM eintraege").fetchone()[0]
+        if gesamt <= self.max_bytes: return
+        weg = []
+        for art, schluessel, groesse in db.execute("SELECT art, schluessel, groesse FROM eintraege ORDER BY benutzt"):
+            if gesamt <= self.max_bytes: break
+            weg.append((art, schluessel))
+            gesamt -= groesse
+        db.executemany("DELETE FROM eintraege WHERE art=? AND schluessel=?", weg)
+
+    def oder_berechne(self, art, schluessel, berechne):
+        """Wert aus dem Cache, sonst berechne() ausführen und ablegen."""
+        wert = self.hole(art, schluessel)
+        if wert is None:
+            wert = berechne()
+            self.lege_ab(art, schluessel, wert)
+        return wert
+
+    def statistik(self):
+        """Anzahl und Bytes je Art, z.B. für eine Anzeige in der Seitenleiste."""
+        with self._db() as db:
+            return {art: {"eintraege": n, "bytes": b} for art, n, b in
+                    db.execute("SELECT art, COUNT(*), SUM(groesse) FROM eintraege GROUP BY art")}
+
+    def leeren(self):
+        with self._db() as db: db.execute("DELETE FROM eintraege")
@@ -0,0 +1,258 @@
+"""
+Lokale Ersatzdienste für OpenAI, Google Sheets (gspread) und SMTP.
+
+Für Benchmarks der ganzen App ohne echte Dienste: Jeder Ersatz verhält sich
+nach außen wie das Original (soweit die App es nutzt), wartet eine
+einstellbare Latenz ab und bucht jeden Aufruf samt übertragener Bytes in
+einem gemeinsamen `Zaehler`. So fällt z.B. ein zusätzliches
+get_all_values() pro Rerun sofort in den Zahlen auf.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+
+class Zaehler:
+    """Aufrufe und Bytes je Dienst und Operation (threadsicher)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zuruecksetzen()
+
+    def zuruecksetzen(self):
+        with self._lock:
+            self.aufrufe = Counter()
+            self.operationen = Counter()
+            self.hoch = Counter()
+            self.runter = Counter()
+
+    def buche(self, dienst, operation, hoch=0, runter=0):
+        with self._lock:
+            self.aufrufe[dienst] += 1
+            self.operationen[f"{dienst}.{operation}"] += 1
+            self.hoch[dienst] += hoch
+            self.runter[dienst] += runter
+
+    def stand(self):
+        with self._lock:
+            return {"aufrufe": dict(self.aufrufe), "operationen": dict(self.operationen),
+                    "hoch": dict(self.hoch), "runter": dict(self.runter)}
+
+
+def _groesse(wert):
+    return len(json.dumps(wert, ensure_ascii=False).encode("utf-8"))
+
+
+# --- OpenAI ---
+class ErsatzOpenAI:
+    """
+    Wie openai.OpenAI: audio.transcriptions.create liefert `diktat`,
+    chat.completions.create ein passendes JSON zum System-Prompt (Bericht oder
+    Auftrag) mit dem ersten Kunden- und den ersten Preis-Kandidaten daraus.
+    `modelle` = {modell: (latenz, fehlerquote)}: je Modell eine eigene Latenz
+    und ein Anteil Antworten mit falschem Kunden oder verrechneten Summen.
+    """
+
+    def __init__(self, api_key=None, zaehler=None, latenz=0.0, diktat="Heizung entlüftet, Thermostatkopf getauscht, eine Stunde Arbeit.",
+                 modelle=None, seed=1):
+        self.zaehler = zaehler or Zaehler()
+        self.latenz = latenz
+        self.diktat = diktat
+        self.modelle = modelle or {}
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self._transkription))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    def _transkription(self, model, file, response_format="text", **kw):
+        time.sleep(self.latenz)
+        daten = file[1] if isinstance(file, tuple) else file.read()
+        self.zaehler.buche("openai", "whisper", hoch=len(daten), runter=len(self.diktat.encode("utf-8")))
+        return self.diktat
+
+    def _chat(self, model, messages, **kw):
+        latenz, fehlerquote = self.modelle.get(model, (self.latenz, 0.0))
+        time.sleep(latenz)
+        system, text = messages[0]["content"], messages[-1]["content"]
+        daten = _bericht_json(system) if "Buchhalter" in system else _auftrag_json(system, text)
+        with self._lock: falsch = self._rnd.random() < fehlerquote
+        if falsch: _verfaelsche(daten, self._rnd)
+        antwort = json.dumps(daten, ensure_ascii=False)
+        self.zaehler.buche("openai", f"chat.{model}", hoch=len((system + text).encode("utf-8")), runter=len(antwort.encode("utf-8")))
+        usage = SimpleNamespace(prompt_tokens=len(system + text) // 4, completion_tokens=len(antwort) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=antwort))], usage=usage)
+
+
+_KUNDE = re.compile(r"- Name: (.*?) \| Anrede: (.*?) \| Adresse: (.*?) \| KdNr: (\S*)")
+_ARTIKEL = re.compile(r"- (?:Art\. (\S+): )?(.+?)[ :(]+([\d.,]+) EUR")
+
+
+def _erster_kunde(system):
+    m = _KUNDE.search(system)
+    return {"kunde_name": m.group(1), "anrede": m.group(2), "adresse": m.group(3), "kundennummer": m.group(4)} if m else \
+        {"kunde_name": "Unbekannt", "anrede": "", "adresse": "", "kundennummer": ""}
+
+
+def _bericht_json(system):
+    positionen = []
+    for art_nr, name, preis in _ARTIKEL.findall(system)[:3]:
+        try: einzel = float(preis.replace(".", "").replace(",", "."))
+        except ValueError: einzel = 0.0
+        positionen.append({"art_nr": art_nr, "text": name.strip(), "menge": 1.0, "einzel_netto": einzel})
+    netto = sum(p["einzel_netto"] for p in positionen)
+    return {**_erster_kunde(system), "problem_titel": "Wartung", "positionen": positionen,
+            "summe_netto": netto, "mwst_betrag": round(netto * 0.19, 2), "summe_brutto": round(netto * 1.19, 2)}
+
+
+def _auftrag_json(system, text):
+    k = _erster_kunde(system)
+    return {"kunde_name": k["kunde_name"], "anrede": k["anrede"], "adresse": k["adresse"], "kontakt": "0491 12345",
+            "problem": text[:80], "termin": "morgen"}
+
+
+def _verfaelsche(daten, rnd):
+    """Typische Modellfehler: verhörter Kunde oder eine Position nicht in der Summe."""
+    if "summe_netto" in daten and daten["positionen"] and rnd.random() < 0.5:
+        daten["summe_netto"] = round(daten["summe_netto"] - daten["positionen"][-1]["einzel_netto"], 2)
+        daten["mwst_betrag"] = round(daten["summe_netto"] * 0.19, 2)
+        daten["summe_brutto"] = round(daten["summe_netto"] * 1.19, 2)
+    else:
+        daten["kunde_name"] = daten["kunde_name"][:-2] + "er"
+        daten.pop("kundennummer", None)
+        daten.pop("adresse", None)
+
+
+# --- Google Sheets ---
+class ErsatzBlatt:
+    """Die Teile von gspread.Worksheet, die App und Spiegel benutzen."""
+
+    def __init__(self, tabelle, blatt_id, title, werte):
+        self.tabelle = tabelle
+        self.spreadsheet_id = tabelle.id
+        self.id = blatt_id
+        self.title = title
+        self.werte = [list(z) for z in werte]
+
+    def _buche(self, operation, hoch=0, runter=0):
+        time.sleep(self.tabelle.latenz)
+        self.tabelle.zaehler.buche("sheets", operation, hoch=hoch, runter=runter)
+
+    @property
+    def row_count(self):
+        return max(len(self.werte), 1000)
+
+    def get_all_values(self):
+        ergebnis = [list(z) for z in self.werte]
+        self._buche("get_all_values", runter=_groesse(ergebnis))
+        return ergebnis
+
+    def get(self, bereich):
+        """Nur die Form 'A{start}:K' (ab Zeile bis Ende), wie sie der Spiegel benutzt."""
+        start = int(re.match(r"[A-Z]+(\d+)", bereich).group(1))
+        ergebnis = [list(z) for z in self.werte[start - 1:]]
+        self._buche("get", runter=_groesse(ergebnis))
+        return ergebnis
+
+    def row_values(self, zeile):
+        ergebnis = list(self.werte[zeile - 1]) if zeile <= len(self.werte) else []
+        self._buche("row_values", runter=_groesse(ergebnis))
+        return ergebnis
+
+    def append_row(self, werte, **kw):
+        self.werte.append(["" if w is None else str(w) for w in werte])
+        n = len(self.werte)
+        self._buche("append_row", hoch=_groesse(werte), runter=80)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{n}:K{n}"}}
+
+    def find(self, wert, in_column=None):
+        spalte = (in_column or 1) - 1
+        self._buche("find", runter=_groesse([z[spalte] for z in self.werte if len(z) > spalte]))
+        for i, z in enumerate(self.werte):
+            if len(z) > spalte and z[spalte] == wert: return SimpleNamespace(row=i + 1, col=spalte + 1, value=wert)
+        return None
+
+    def batch_update(self, daten, **kw):
+        for eintrag in daten:
+            m = re.match(r"([A-Z]+)(\d+)", eintrag["range"])
+            spalte = sum((ord(c) - 64) * 26 ** i for i, c in enumerate(reversed(m.group(1)))) - 1
+            zeile = self.werte[int(m.group(2)) - 1]
+            zeile.extend([""] * (spalte + 1 - len(zeile)))
+            zeile[spalte] = eintrag["values"][0][0]
+        self._buche("batch_update", hoch=_groesse(daten), runter=80)
+
+
+class ErsatzTabelle:
+    """gspread.Spreadsheet mit Blättern im Speicher."""
+
+    def __init__(self, blaetter, zaehler=None, latenz=0.0, tabellen_id="ersatz"):
+        self.id = tabellen_id
+        self.zaehler = zaehler or Zaehler()
+        self.latenz = latenz
+        self._blaetter = {}
+        for titel, werte in blaetter.items(): self._neu(titel, werte)
+
+    def _neu(self, titel, werte):
+        ws = ErsatzBlatt(self, len(self._blaetter) + 1, titel, werte)
+        self._blaetter[titel] = ws
+        return ws
+
+    def worksheet(self, titel):
+        time.sleep(self.latenz)
+        self.zaehler.buche("sheets", "worksheet", runter=200)
+        import gspread  # erst hier: Benchmarks ohne Sheets brauchen es nicht
+        if titel not in self._blaetter: raise gspread.exceptions.WorksheetNotFound(titel)
+        return self._blaetter[titel]
+
+    def worksheets(self):
+        time.sleep(self.latenz)
+        self.zaehler.buche("sheets", "worksheets", runter=200 * len(self._blaetter))
+        return list(self._blaetter.values())
+
+    def add_worksheet(self, title, rows=1000, cols=20):
+        time.sleep(self.latenz)
+        self.zaehler.buche("sheets", "add_worksheet", runter=200)
+        return self._neu(title, [])
+
+
+class ErsatzGoogle:
+    """gspread.Client: open(name) liefert immer die übergebene Tabelle."""
+
+    def __init__(self, tabelle):
+        self.tabelle = tabelle
+
+    def open(self, name):
+        time.sleep(self.tabelle.latenz)
+        self.tabelle.zaehler.buche("sheets", "open", runter=500)
+        return self.tabelle
+
+
+# --- SMTP ---
+class ErsatzSMTP:
+    """Wie smtplib.SMTP / SMTP_SSL; gesendete Mails landen in `ErsatzSMTP.postfach`."""
+    zaehler = None
+    latenz = 0.0
+    postfach = []
+
+    def __init__(self, host=None, port=None, timeout=None, **kw):
+        time.sleep(self.latenz)
+        self.zaehler.buche("smtp", "verbinden", runter=100)
+
+    def starttls(self, *a, **kw):
+        self.zaehler.buche("smtp", "starttls")
+
+    def login(self, benutzer, passwort):
+        time.sleep(self.latenz)
+        self.zaehler.buche("smtp", "login", hoch=len(benutzer) + len(passwort))
+
+    def sendmail(self, von, an, nachricht):
+        time.sleep(self.latenz)
+        self.zaehler.buche("smtp", "sendmail", hoch=len(nachricht))
+        ErsatzSMTP.postfach.append((von, an, len(nachricht)))
+        return {}
+
+    def quit(self):
+        pass
@@ -0,0 +1,217 @@
+"""
+Gestufte Extraktion: Regeln -> kleines Modell -> gpt-4o.
+
+Kurze Diktate wie "Herr Meyer, 2 Stunden Arbeit, ein Siphon" brauchen kein
+gpt-4o. Jede Stufe liefert ein Ergebnis im gewohnten JSON-Format, das lokal
+geprüft wird - bekannter Kunde, bekannte Artikel bzw. Art.Nr, Positionen
+ergeben das Netto, Netto + 19 % MwSt = Brutto. Erst wenn die Prüfung scheitert,
+geht es eine Stufe höher; das Ergebnis der letzten Stufe gilt immer (mit den
+gefundenen Problemen als Hinweise für die Vorschau).
+
+Die Modelle werden als Funktion `frage(modell) -> dict` übergeben, damit sich
+die Kaskade mit einem Ersatz-LLM prüfen lässt. Jede Stufe wird als Spanne
+'<art>:<stufe>' gemessen; `eskaliert` zeigt, wie oft weitergereicht wurde.
+"""
+import re
+
+import messung
+from suchindex import normalisiere, woerter
+
+MWST = 0.19
+KLEINES_MODELL = "gpt-4o-mini"
+GROSSES_MODELL = "gpt-4o"
+
+ZAHLWOERTER = {
+    "ein": 1, "eine": 1, "einen": 1, "einem": 1, "einer": 1, "zwei": 2, "drei": 3, "vier": 4, "fuenf": 5,
+    "sechs": 6, "sieben": 7, "acht": 8, "neun": 9, "zehn": 10, "halbe": 0.5, "anderthalb": 1.5, "eineinhalb": 1.5,
+}
+# Trennt Diktate in Satzteile; Kommas in Zahlen ("1,5 Stunden") bleiben
+_TEILE = re.compile(r"(?<!\d)[,;]|[,;](?!\d)|\.(?!\d)|\n|\b(?:und|plus|sowie)\b", re.IGNORECASE)
+_MENGE = re.compile(r"^(?:noch\s+)?(\d+(?:[.,]\d+)?)\b")
+_MASS = re.compile(r"\d+(?:[.,]\d+)? ?(?:mm|cm|m|l|kg|kw|w|zoll|bar)\b", re.IGNORECASE)
+_TELEFON = re.compile(r"(?:\+49|\b0)[\d /-]{6,}\d")
+_TERMIN = re.compile(r"\b(?:heute|morgen|übermorgen|nächste[nr]? woche|(?:am )?(?:montag|dienstag|mittwoch|donnerstag|freitag|samstag)"
+                     r"|\d{1,2}\.\d{1,2}\.(?:\d{2,4})?)(?: (?:um|ab|gegen) \d{1,2}(?:[:.]\d{2})?(?: uhr)?)?", re.IGNORECASE)
+# Wörter, die neben Kundendaten in einem Satzteil stehen dürfen (auch der Zusatz der Offline-Erfassung)
+_BEIWOERTER = {"herr", "herrn", "frau", "familie", "bei", "beim", "kunde", "kundin", "kdnr", "laut", "erfassung"}
+# Satzteil nennt eingebautes Material - ohne passenden Artikel kann nur ein Modell den Posten deuten
+_MATERIAL = {"getauscht", "ausgetauscht", "gewechselt", "ausgewechselt", "erneuert", "ersetzt", "eingebaut", "verbaut",
+             "montiert", "neu", "neue", "neuer", "neues", "neuen", "material", "ersatzteil", "teil", "teile"}
+_ANRUF = {"ruft", "rief", "an", "tel", "telefon", "nummer", "unter", "erreichbar", "termin", "bitte", "rueckruf"}
+
+
+def zahl(wert):
+    """1 / '1,5' / '12.50' -> float; Unlesbares wird None."""
+    if isinstance(wert, (int, float)): return float(wert)
+    try: return float(str(wert).replace(",", "."))
+    except (TypeError, ValueError): return None
+
+
+# --- Stufe 0: Regeln ---
+def kunde_aus_text(txt, kunden_index):
+    """Kunde, dessen Name wörtlich im Text vorkommt und der klar vor dem nächsten liegt; sonst None."""
+    treffer = kunden_index.suche(txt, k=2)
+    if not treffer: return None
+    punkte, kunde = treffer[0]
+    im_text = set(normalisiere(txt).split())
+    if not set(woerter(kunde["name"])) & im_text: return None
+    if len(treffer) > 1 and treffer[1][0] >= punkte * 0.8: return None
+    return kunde
+
+
+def _menge(teil):
+    """Menge am Anfang des Satzteils (Ziffer oder Zahlwort), sonst None."""
+    m = _MENGE.match(teil)
+    if m: return zahl(m.group(1))
+    erstes = normalisiere(teil).split()[:1]
+    return float(ZAHLWOERTER[erstes[0]]) if erstes and erstes[0] in ZAHLWOERTER else None
+
+
+def _weitere_zahl(teil):
+    """Zahl mitten im Satzteil ('alles in allem 2 Stunden') - dann ist die Menge nicht sicher."""
+    ohne = _MENGE.sub("", teil, count=1)
+    rest = normalisiere(_MASS.sub("", ohne)).split()
+    if ohne == teil and rest[:1] and rest[0] in ZAHLWOERTER: rest = rest[1:]
+    return any(w.isdigit() or w in ZAHLWOERTER for w in rest)
+
+
+def adresse(kunde):
+    """'Deichweg 7, 26789 Leer' - leere Teile fallen weg."""
+    return ", ".join(t for t in (kunde["strasse"], f"{kunde['plz']} {kunde['ort']}".strip()) if t)
+
+
+def _kunden_woerter(kunde):
+    return set(normalisiere(f"{kunde['name']} {kunde['strasse']} {kunde['plz']} {kunde['ort']} {kunde['kdnr']}").split()) | _BEIWOERTER
+
+
+def _ohne(teil, weg):
+    """Satzteil ohne die Wörter aus `weg` ('Bei Frau Janssen Heizung entlüftet' -> 'Heizung entlüftet')."""
+    return " ".join(w for w in teil.split() if normalisiere(w) not in weg)
+
+
+def regel_bericht(txt, kunden_index, artikel_index, kunde=None):
+    """
+    Diktat -> Bericht-JSON ohne LLM, oder None, wenn der Kunde unklar bleibt
+    oder ein Satzteil weder sicher Artikel noch Titel ist: Menge ohne Artikel,
+    Material ohne Artikel ('Ventil am Boiler erneuert') oder mehr als ein
+    übriger Satzteil - nichts Diktiertes darf stillschweigend wegfallen.
+    Ohne Menge muss der Artikel fast wörtlich genannt sein.
+    `kunde` steht schon fest (Bericht zu einem Auftrag) - dann zählen nur die Positionen.
+    """
+    kunde = kunde or kunde_aus_text(txt, kunden_index)
+    if kunde is None: return None
+    positionen, titel, weg = [], [], _kunden_woerter(kunde)
+    for teil in (t.strip() for t in _TEILE.split(txt)):
+        if not teil or set(normalisiere(teil).split()) <= weg: continue
+        menge = _menge(teil)
+        if _weitere_zahl(teil): return None
+        a = artikel_index.finde(teil, min_punkte=0.5 if menge is not None else 0.9)
+        if a is not None and a["preis"] is not None:
+            positionen.append({"art_nr": a["art_nr"], "text": a["name"], "menge": menge or 1.0, "einzel_netto": a["preis"]})
+        elif menge is not None or set(normalisiere(teil).split()) & _MATERIAL:
+            return None  # Menge oder Material ohne bekannten Artikel -> das kann nur ein Modell deuten
+        else: titel.append(_ohne(teil, weg))
+    if not positionen or len(titel) > 1: return None
+    netto = round(sum(p["menge"] * p["einzel_netto"] for p in positionen), 2)
+    mwst = round(netto * MWST, 2)
+    return {"anrede": kunde["anrede"], "kunde_name": kunde["name"], "adresse": adresse(kunde),
+            "kundennummer": kunde["kdnr"], "problem_titel": titel[0] if titel else "Arbeitsbericht", "positionen": positionen,
+            "summe_netto": netto, "mwst_betrag": mwst, "summe_brutto": round(netto + mwst, 2)}
+
+
+def regel_auftrag(txt, kunden_index):
+    """Kurzer Anruf/Diktat -> Auftrag-JSON ohne LLM, oder None (Kunde unklar, Text zu lang)."""
+    kunde = kunde_aus_text(txt, kunden_index)
+    if kunde is None or len(txt) > 300: return None
+    kontakt = _TELEFON.search(txt)
+    termin = _TERMIN.search(txt)
+    weg = _kunden_woerter(kunde) | _ANRUF
+    rest = (_ohne(t, weg) for t in _TEILE.split(_TERMIN.sub("", _TELEFON.sub("", txt))))
+    problem = ", ".join(t for t in rest if t)
+    return {"kunde_name": kunde["name"], "anrede": kunde["anrede"], "adresse": adresse(kunde),
+            "kontakt": kontakt.group(0).strip() if kontakt else "", "problem": problem, "termin": termin.group(0) if termin else ""}
+
+
+# --- Prüfung ---
+def pruefe_bericht(d, kunden_index=None, artikel_index=None, toleranz=0.02):
+    """Probleme eines Bericht-JSON als Liste von Texten (leer = plausibel)."""
+    probleme = []
+    if kunden_index is not None and len(kunden_index) and kunden_index.finde(d.get("kunde_name") or "", d.get("kundennummer") or "") is None:
+        probleme.append(f"Kunde '{d.get('kunde_name')}' nicht in der Kundenliste")
+    positionen = d.get("positionen") or []
+    if not positionen: probleme.append("keine Positionen")
+    summe = 0.0
+    for p in positionen:
+        menge, einzel = zahl(p.get("menge")), zahl(p.get("einzel_netto"))
+        if menge is None or menge <= 0 or einzel is None or einzel < 0:
+            probleme.append(f"'{p.get('text')}': Menge oder Preis ungültig")
+            continue
+        summe += menge * einzel
+        if artikel_index is None or not len(artikel_index): continue
+        if p.get("art_nr"):
+            if artikel_index.nach_art_nr(p["art_nr"]) is None: probleme.append(f"Art.Nr {p['art_nr']} nicht in der Preisliste")
+        elif artikel_index.finde(p.get("text") or "") is None:
+            probleme.append(f"'{p.get('text')}' nicht in der Preisliste")
+    netto, mwst, brutto = zahl(d.get("summe_netto")), zahl(d.get("mwst_betrag")), zahl(d.get("summe_brutto"))
+    if netto is None or mwst is None or brutto is None:
+        probleme.append("Summen fehlen")
+        return probleme
+    if abs(netto - summe) > toleranz: probleme.append(f"Positionen ergeben {summe:.2f} EUR, Netto ist {netto:.2f} EUR")
+    if abs(mwst - netto * MWST) > toleranz: probleme.append(f"MwSt {mwst:.2f} EUR statt {netto * MWST:.2f} EUR")
+    if abs(brutto - (netto + mwst)) > toleranz: probleme.append(f"Brutto {brutto:.2f} EUR statt {netto + mwst:.2f} EUR")
+    return probleme
+
+
+def pruefe_auftrag(d, kunden_index=None):
+    """Probleme eines Auftrag-JSON; neue Kunden sind erlaubt, brauchen dann aber Adresse und Kontakt."""
+    probleme = []
+    name = str(d.get("kunde_name") or "").strip()
+    if not name: probleme.append("kein Kunde")
+    elif kunden_index is not None and len(kunden_index) and kunden_index.finde(name) is None and not (d.get("adresse") and d.get("kontakt")):
+        probleme.append(f"Kunde '{name}' unbekannt, Adresse oder Kontakt fehlt")
+    if not str(d.get("problem") or "").strip(): probleme.append("kein Anliegen erkannt")
+    return probleme
+
+
+# --- Kaskade ---
+def kaskade(art, stufen, pruefe):
+    """
+    stufen: [(name, funktion)], billigste zuerst; funktion() -> dict oder None.
+    Rückgabe: (daten, name der Stufe, Probleme). Fehler einer Stufe außer der
+    letzten führen nur zur nächsten Stufe.
+    """
+    for i, (name, funktion) in enumerate(stufen):
+        letzte = i == len(stufen) - 1
+        with messung.spanne(f"{art}:{name}") as w:
+            try: daten = funktion()
+            except Exception as e:
+                if letzte: raise
+                daten, probleme = None, [f"{type(e).__name__}: {e}"]
+            else: probleme = ["kein Ergebnis"] if daten is None else pruefe(daten)
+            w["eskaliert"] = bool(probleme) and not letzte
+            if probleme: w["probleme"] = len(probleme)
+        if not probleme or letzte: return daten, name, probleme
+
+
+def _modelle(frage, modelle):
+    return [(m, lambda m=m: frage(m)) for m in modelle]
+
+
+def bericht(txt, frage, kunden_index=None, artikel_index=None, modelle=(KLEINES_MODELL, GROSSES_MODELL), kunde=None):
+    """
+    Bericht-JSON über die Kaskade; `frage(modell)` schickt den fertigen Prompt an das Modell.
+    Mit `kunde` (aus einem Auftrag) wird der Kunde nicht mehr geprüft und im Ergebnis gesetzt.
+    """
+    stufen = [("regeln", lambda: regel_bericht(txt, kunden_index, artikel_index, kunde))] if artikel_index and (kunde or kunden_index) else []
+    daten, stufe, probleme = kaskade("daten", stufen + _modelle(frage, modelle),
+                                     lambda d: pruefe_bericht(d, None if kunde else kunden_index, artikel_index))
+    if kunde:
+        daten.update({"kunde_name": kunde["name"], "anrede": kunde["anrede"] or daten.get("anrede", ""),
+                      "kundennummer": kunde["kdnr"], "adresse": adresse(kunde)})
+    return daten, stufe, probleme
+
+
+def auftrag(txt, frage, kunden_index=None, modelle=(KLEINES_MODELL, GROSSES_MODELL)):
+    """Auftrag-JSON über die Kaskade."""
+    stufen = [("regeln", lambda: regel_auftrag(txt, kunden_index))] if kunden_index else []
+    return kaskade("auftrag", stufen + _modelle(frage, modelle), lambda d: pruefe_auftrag(d, kunden_index))
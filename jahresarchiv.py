@@ -0,0 +1,79 @@
+"""
+Gespeicherte Kennzahlen abgeschlossener Jahre.
+
+Die Blätter 'Aufträge_JJJJ' vergangener Jahre ändern sich nicht mehr. Statt
+sie bei jedem Dashboard-Aufruf neu zu lesen, wird jedes Jahr einmal mit
+statistik.jahres_kennzahlen zusammengefasst und hier als JSON abgelegt -
+zehn Jahre Historie kosten danach nur ein paar kleine SQLite-Lesezugriffe.
+Nur das laufende Jahr wird weiter aus dem lokalen Spiegel berechnet.
+Abgelegt wird je Spreadsheet (ID) und Jahr, damit ein anderes Sheet (z.B.
+nach dem Umstellen von `blatt_basis_name`) nicht die alten Zahlen bekommt.
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jahre (
+    tabelle TEXT NOT NULL,
+    jahr INTEGER NOT NULL,
+    kennzahlen TEXT NOT NULL,
+    erstellt REAL NOT NULL,
+    PRIMARY KEY (tabelle, jahr)
+);
+"""
+
+_JAHRESBLATT = re.compile(r"^Aufträge_(\d{4})$")
+
+
+def jahre_aus_titeln(titel):
+    """Jahreszahlen aus Blatt-Titeln wie 'Aufträge_2024', aufsteigend."""
+    return sorted({int(m.group(1)) for m in (_JAHRESBLATT.match(str(t).strip()) for t in titel) if m})
+
+
+class JahresArchiv:
+    def __init__(self, pfad):
+        self.pfad = pfad
+        ordner = os.path.dirname(pfad)
+        if ordner: os.makedirs(ordner, exist_ok=True)
+        with self._db() as db:
+            # Ältere Archive kannten nur das Jahr - nicht zuzuordnen, also neu zusammenfassen
+            if "tabelle" not in {r[1] for r in db.execute("PRAGMA table_info(jahre)")}: db.execute("DROP TABLE IF EXISTS jahre")
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.pfad, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db: yield db
+        finally:
+            db.close()
+
+    def hole(self, tabelle, jahr):
+        with self._db() as db:
+            row = db.execute("SELECT kennzahlen FROM jahre WHERE tabelle=? AND jahr=?", (tabelle, jahr)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lege_ab(self, tabelle, jahr, kennzahlen):
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO jahre (tabelle, jahr, kennzahlen, erstellt) VALUES (?, ?, ?, ?)",
+                       (tabelle, jahr, json.dumps(kennzahlen, ensure_ascii=False), time.time()))
+
+    def oder_berechne(self, tabelle, jahr, berechne):
+        """Gespeicherte Kennzahlen, sonst berechne() einmal ausführen und ablegen."""
+        kennzahlen = self.hole(tabelle, jahr)
+        if kennzahlen is None:
+            kennzahlen = berechne()
+            self.lege_ab(tabelle, jahr, kennzahlen)
+        return kennzahlen
+
+    def vergessen(self, tabelle=None, jahr=None):
+        """Ein Jahr (oder alle) eines Sheets verwerfen, z.B. nach Korrekturen im alten Blatt; ohne `tabelle` alles."""
+        with self._db() as db:
+            if tabelle is None: db.execute("DELETE FROM jahre")
+            elif jahr is None: db.execute("DELETE FROM jahre WHERE tabelle=?", (tabelle,))
+            else: db.execute("DELETE FROM jahre WHERE tabelle=? AND jahr=?", (tabelle, jahr))
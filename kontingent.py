@@ -0,0 +1,175 @@
+"""
+Zentrale Drosselung aller Google-Sheets-Requests.
+
+Google erlaubt pro Nutzer (hier: das Dienstkonto) und Minute nur eine
+begrenzte Zahl Lese- und Schreib-Requests. Ohne Absprache feuert jede Sitzung
+ihre Requests sofort; mehrere Leute im Dashboard reichen, und alle bekommen
+429. Der Planer sitzt in verbindung.py vor der HTTP-Session und damit vor
+jedem gspread-Aufruf:
+
+- je ein Token-Eimer für Lesen und Schreiben, bemessen am Kontingent
+  (Reservierung statt Wettlauf: wer zuerst kommt, wartet am kürzesten),
+- bei 429 (und bei Lesen auch 5xx) Wiederholung mit exponentiellem Backoff
+  und Jitter; Retry-After vom Server hat Vorrang,
+- gleiche Lese-Requests, die gleichzeitig laufen (z.B. Kunden und
+  Preisliste aus mehreren Sitzungen), gehen nur einmal raus; alle Wartenden
+  bekommen dieselbe Antwort - aber nur, wenn seit dem Start der laufenden
+  Lesung kein Schreib-Request begonnen oder geendet hat (sonst fehlte dem
+  Leser womöglich die eigene gerade geschriebene Zeile),
+- Zähler für Drosselung, Wiederholungen und Wartezeit (stand()).
+
+Schreib-Requests werden nach 5xx nicht wiederholt - die Zeile könnte schon
+geschrieben sein; das erledigt der Postausgang mit seiner Idempotenz-Prüfung.
+Das Kontingent gilt pro Prozess; mehrere Server-Prozesse teilen es sich nicht.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+# Google Sheets API: Requests pro Minute und Nutzer
+LESEN_PRO_MINUTE = 60
+SCHREIBEN_PRO_MINUTE = 60
+
+WIEDERHOLEN_LESEN = (429, 500, 502, 503, 504)
+WIEDERHOLEN_SCHREIBEN = (429,)
+
+
+class KontingentErschoepft(Exception):
+    """Ein Token wäre erst nach mehr als `max_warten` Sekunden frei."""
+
+
+class TokenEimer:
+    def __init__(self, pro_minute, groesse=None, uhr=time.monotonic, schlafe=time.sleep):
+        self.rate = pro_minute / 60
+        self.groesse = groesse or max(1, pro_minute // 6)
+        self._uhr = uhr
+        self._schlafe = schlafe
+        self._stand = float(self.groesse)
+        self._zeit = uhr()
+        self._lock = threading.Lock()
+
+    def _auffuellen(self):
+        jetzt = self._uhr()
+        self._stand = min(self.groesse, self._stand + (jetzt - self._zeit) * self.rate)
+        self._zeit = jetzt
+
+    def nimm(self, max_warten=None):
+        """Reserviert ein Token und wartet, bis es fällig ist. Rückgabe: Wartezeit in s."""
+        with self._lock:
+            self._auffuellen()
+            self._stand -= 1  # negativ = Warteschlange
+            warten = max(0.0, -self._stand / self.rate)
+            if max_warten is not None and warten > max_warten:
+                self._stand += 1
+                raise KontingentErschoepft(f"Google-Kontingent erschöpft (nächster Request erst in {warten:.0f} s)")
+        if warten: self._schlafe(warten)
+        return warten
+
+    def bremse(self):
+        """Nach einem 429: angesparte Tokens verwerfen, damit nicht alle gleich wieder anlaufen."""
+        with self._lock:
+            self._auffuellen()
+            self._stand = min(self._stand, 0.0)
+
+
+class _Anfrage:
+    def __init__(self):
+        self.fertig = threading.Event()
+        self.antwort = None
+        self.fehler = None
+
+
+class Planer:
+    def __init__(self, lesen_pro_minute=LESEN_PRO_MINUTE, schreiben_pro_minute=SCHREIBEN_PRO_MINUTE,
+                 versuche=6, basis=1.0, deckel=32.0, max_warten=60.0, stoss=None, schlafe=time.sleep):
+        """`stoss` = Tokens, die auf einmal verbraucht werden dürfen (Standard: 10 s Kontingent)."""
+        self.lesen = TokenEimer(lesen_pro_minute, stoss, schlafe=schlafe)
+        self.schreiben = TokenEimer(schreiben_pro_minute, stoss, schlafe=schlafe)
+        self.versuche = versuche
+        self.basis = basis
+        self.deckel = deckel
+        self.max_warten = max_warten
+        self._schlafe = schlafe
+        self._lock = threading.Lock()
+        self._laufend = {}
+        self._schreib_stand = 0  # +1 bei Beginn und Ende jedes Schreib-Requests
+        self._zaehler = Counter()
+        self._wartezeit = 0.0
+
+    def _zaehle(self, **werte):
+        with self._lock:
+            for k, v in werte.items():
+                if k == "wartezeit": self._wartezeit += v
+                else: self._zaehler[k] += v
+
+    def stand(self):
+        """Zähler seit Prozessstart: anfragen, lesen, schreiben, zusammengefasst, gedrosselt (429), wiederholt, ..."""
+        with self._lock:
+            return {**{k: 0 for k in ("anfragen", "lesen", "schreiben", "zusammengefasst", "gedrosselt", "wiederholt", "gewartet", "abgelehnt")},
+                    **self._zaehler, "wartezeit_s": round(self._wartezeit, 1)}
+
+    def fuehre_aus(self, methode, url, aufruf, params=None, messwerte=None):
+        """
+        `aufruf()` schickt den Request und liefert die Antwort (requests.Response).
+        `messwerte` (dict einer messung.spanne) bekommt Wartezeit, Versuche und ob die Antwort geteilt wurde.
+        """
+        messwerte = {} if messwerte is None else messwerte
+        if methode.upper() != "GET":
+            self._zaehle(anfragen=1, schreiben=1)
+            with self._lock: self._schreib_stand += 1
+            try: return self._mit_wiederholung(self.schreiben, WIEDERHOLEN_SCHREIBEN, aufruf, messwerte)
+            finally:
+                with self._lock: self._schreib_stand += 1
+        anfrage = (url, json.dumps(params, sort_keys=True, default=str))
+        with self._lock:
+            # Schreibstand im Schlüssel: eine Lesung von vor dem letzten Schreiben wird nicht geteilt
+            schluessel = anfrage + (self._schreib_stand,)
+            laufend = self._laufend.get(schluessel)
+            if laufend is None: eigene = self._laufend[schluessel] = _Anfrage()
+        if laufend is not None:
+            # Derselbe Lese-Request ist schon unterwegs -> dessen Antwort mitbenutzen
+            self._zaehle(zusammengefasst=1)
+            messwerte["geteilt"] = True
+            laufend.fertig.wait()
+            if laufend.fehler is not None: raise laufend.fehler
+            return laufend.antwort
+        self._zaehle(anfragen=1, lesen=1)
+        try:
+            eigene.antwort = self._mit_wiederholung(self.lesen, WIEDERHOLEN_LESEN, aufruf, messwerte)
+            return eigene.antwort
+        except BaseException as e:
+            eigene.fehler = e
+            raise
+        finally:
+            with self._lock: del self._laufend[schluessel]
+            eigene.fertig.set()
+
+    def _mit_wiederholung(self, eimer, wiederholen, aufruf, messwerte):
+        warte_s = 0.0
+        for versuch in range(self.versuche):
+            try: warte_s += eimer.nimm(self.max_warten)
+            except KontingentErschoepft:
+                self._zaehle(abgelehnt=1)
+                raise
+            antwort = aufruf()
+            messwerte["versuche"] = versuch + 1
+            if antwort.status_code == 429:
+                self._zaehle(gedrosselt=1)
+                eimer.bremse()
+            if antwort.status_code not in wiederholen or versuch == self.versuche - 1: break
+            pause = _retry_after(antwort)
+            if pause is None: pause = random.uniform(0, min(self.deckel, self.basis * 2 ** versuch))  # "full jitter"
+            self._zaehle(wiederholt=1)
+            self._schlafe(pause)
+            warte_s += pause
+        if warte_s:
+            self._zaehle(gewartet=1, wartezeit=warte_s)
+            messwerte["warte_ms"] = round(warte_s * 1000, 1)
+        return antwort
+
+
+def _retry_after(antwort):
+    try: return float((getattr(antwort, "headers", None) or {}).get("Retry-After"))
+    except (TypeError, ValueError): return None
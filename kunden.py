@@ -0,0 +1,108 @@
+"""
+Lokaler Kundenindex für die GPT-Prompts.
+
+Früher landete das komplette Blatt 'Kunden' als Textblock in jedem Prompt.
+Dieser Index wird einmal aus den Zeilen gebaut (und nur neu gebaut, wenn sich
+das Blatt ändert) und liefert zu einem Transkript die wenigen passenden
+Kunden: unscharf über Namen und Straße, exakt über PLZ und KdNr.
+"""
+import heapq
+import re
+from collections import defaultdict
+
+from suchindex import IndexCache, WortIndex, normalisiere, woerter
+
+# Spalten im Blatt 'Kunden' (wie bisher in lade_kunden_live)
+SPALTEN = ("name", "strasse", "plz", "ort", "kdnr", "anrede")
+
+# Gewichte je Fundstelle; KdNr ist eindeutig, PLZ/Ort nur ein Hinweis
+GEWICHT = {"name": 3.0, "strasse": 1.5, "hausnr": 1.5, "ort": 0.5, "plz": 1.0, "kdnr": 6.0}
+
+# Füllwörter aus Diktaten, die sonst zufällig auf Namen passen
+STOPPWOERTER = {
+    "der", "die", "das", "und", "bei", "beim", "von", "vom", "mit", "fuer", "auf", "aus", "ist", "war", "hat",
+    "herr", "herrn", "frau", "familie", "firma", "kunde", "kundin", "heute", "gestern", "morgen", "noch",
+    "eine", "einen", "einem", "ein", "den", "dem", "des", "wir", "haben", "habe", "wurde", "neue", "neuen",
+    "str", "strasse", "weg", "platz", "stunde", "stunden", "minuten", "euro", "stueck", "meter",
+}
+
+
+def _strasse_hausnr(text):
+    """'Am Delft 3a' -> {('delft', '3')}: letztes Straßenwort + Hausnummer"""
+    return set(re.findall(r"([a-z]{3,}) (\d+)", normalisiere(text)))
+
+
+def zeile_zu_kunde(zeile):
+    """Sheet-Zeile -> dict mit den Feldern aus SPALTEN (fehlende Zellen leer)."""
+    return {feld: (str(zeile[i]).strip() if len(zeile) > i else "") for i, feld in enumerate(SPALTEN)}
+
+
+class KundenIndex:
+    def __init__(self, zeilen, min_aehnlichkeit=0.8):
+        """`zeilen` wie get_all_values() ohne Kopfzeile."""
+        self.min_aehnlichkeit = min_aehnlichkeit
+        self.kunden = [zeile_zu_kunde(z) for z in zeilen if z and str(z[0]).strip()]
+        self._woerter = WortIndex(min_aehnlichkeit)  # Wort -> [(Kunde, Feld)]
+        self._plz = defaultdict(list)
+        self._kdnr = defaultdict(list)
+        self._hausnr = defaultdict(list)
+        for i, k in enumerate(self.kunden):
+            for feld in ("name", "strasse", "ort"):
+                for w in set(woerter(k[feld], STOPPWOERTER)): self._woerter.hinzufuegen(w, (i, feld))
+            if k["plz"]: self._plz[normalisiere(k["plz"])].append(i)
+            if k["kdnr"]: self._kdnr[normalisiere(k["kdnr"])].append(i)
+            for paar in _strasse_hausnr(k["strasse"]): self._hausnr[paar].append(i)
+
+    def __len__(self):
+        return len(self.kunden)
+
+    def suche(self, text, k=5):
+        """Die k besten Kunden zu einem Transkript als [(Punkte, Kunde)], beste zuerst."""
+        punkte = defaultdict(float)
+        bester_feldtreffer = {}
+        for wort in dict.fromkeys(woerter(text, STOPPWOERTER)):
+            for bekannt, r in self._woerter.aehnliche(wort):
+                for i, feld in self._woerter.eintraege(bekannt):
+                    # Pro Kunde, Feld und bekanntem Wort nur einmal zählen
+                    schluessel = (i, feld, bekannt)
+                    alt = bester_feldtreffer.get(schluessel, 0.0)
+                    if r > alt:
+                        punkte[i] += GEWICHT[feld] * (r - alt)
+                        bester_feldtreffer[schluessel] = r
+        zahlen = set(re.findall(r"\d+", normalisiere(text)))
+        for z in zahlen:
+            for i in self._kdnr.get(z, ()): punkte[i] += GEWICHT["kdnr"]
+            for i in self._plz.get(z, ()):
+                if i in punkte: punkte[i] += GEWICHT["plz"]
+        for paar in _strasse_hausnr(text):
+            for i in self._hausnr.get(paar, ()):
+                if i in punkte: punkte[i] += GEWICHT["hausnr"]
+        beste = heapq.nlargest(k, punkte.items(), key=lambda e: (e[1], -e[0]))
+        return [(round(p, 3), self.kunden[i]) for i, p in beste if p >= GEWICHT["name"] * self.min_aehnlichkeit * 0.5]
+
+    def finde(self, name="", kdnr=""):
+        """Kunde per KdNr (exakt) oder eindeutig gleichem Namen; None, wenn unbekannt oder mehrdeutig."""
+        if kdnr:
+            treffer = self._kdnr.get(normalisiere(kdnr), ())
+            if len(treffer) == 1: return self.kunden[treffer[0]]
+        gesucht = normalisiere(name)
+        if not gesucht: return None
+        gleich = [k for _, k in self.suche(name) if normalisiere(k["name"]) == gesucht]
+        return gleich[0] if len(gleich) == 1 else None
+
+
+def als_prompt(kunden):
+    """Gleiches Zeilenformat wie früher, nur für die Kandidaten."""
+    if not kunden: return "BEKANNTE KUNDEN: keine passenden gefunden (Angaben aus dem Text übernehmen)."
+    txt = "BEKANNTE KUNDEN (passende Kandidaten):\n"
+    for k in kunden:
+        txt += f"- Name: {k['name']} | Anrede: {k['anrede']} | Adresse: {k['strasse']}, {k['plz']} {k['ort']} | KdNr: {k['kdnr']}\n"
+    return txt
+
+
+_cache = IndexCache(KundenIndex)
+
+
+def hole_index(schluessel, zeilen, stand=None):
+    """Prozessweit gecachter Index je Blatt; neu gebaut nur bei geänderten Zeilen (oder neuem `stand`)."""
+    return _cache.hole(schluessel, zeilen, stand)
@@ -0,0 +1,108 @@
+"""
+Leichtgewichtige Zeitmessung (Spans) für die langsamen Schritte der App.
+
+Um Whisper, GPT, Sheets-Requests, PDF und SMTP liegt je ein
+`with spanne("stufe") as w:`. Jede Spanne schreibt Dauer, Fehler und was der
+Aufrufer in `w` einträgt (Bytes, Tokens, Cache-Treffer) als eine JSON-Zeile
+in ein rotierendes Log. Solange kein Ziel gesetzt ist, kostet eine Spanne
+fast nichts - so bleiben Hilfsmodule und Benchmarks ohne Log.
+
+Die Auswertung liefert p50/p95 je Stufe über die letzten N Einträge.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_ziel = None
+
+
+def setze_ziel(log):
+    """Prozessweites Ziel für alle Spannen (None = nicht messen)."""
+    global _ziel
+    _ziel = log
+
+
+@contextmanager
+def spanne(stufe, **werte):
+    """Misst den Block; `werte` (dict) kann im Block ergänzt werden."""
+    log = _ziel
+    if log is None:
+        yield werte
+        return
+    t0 = time.perf_counter()
+    fehler = None
+    try:
+        yield werte
+    except BaseException as e:
+        fehler = type(e).__name__
+        raise
+    finally:
+        eintrag = {"zeit": round(time.time(), 3), "stufe": stufe, "ms": round((time.perf_counter() - t0) * 1000, 1), **werte}
+        if fehler: eintrag["fehler"] = fehler
+        try: log.schreibe(eintrag)
+        except OSError: pass  # Messung darf die App nie stören
+
+
+def perzentil(werte, p):
+    """Nächstgelegener Rang; werte müssen sortiert sein."""
+    if not werte: return None
+    return werte[min(int(round(p / 100 * (len(werte) - 1))), len(werte) - 1)]
+
+
+class MessLog:
+    def __init__(self, pfad, max_bytes=2 * 1024 * 1024, backups=3):
+        self.pfad = pfad
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        ordner = os.path.dirname(pfad)
+        if ordner: os.makedirs(ordner, exist_ok=True)
+
+    def schreibe(self, eintrag):
+        zeile = json.dumps(eintrag, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if os.path.getsize(self.pfad) + len(zeile) > self.max_bytes: self._rotiere()
+            except FileNotFoundError:
+                pass
+            with open(self.pfad, "a", encoding="utf-8") as f: f.write(zeile)
+
+    def _rotiere(self):
+        """messung.jsonl -> .1 -> .2 ...; die älteste Datei fällt weg."""
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.pfad}.{i}"): os.replace(f"{self.pfad}.{i}", f"{self.pfad}.{i + 1}")
+        if self.backups: os.replace(self.pfad, f"{self.pfad}.1")
+        else: os.remove(self.pfad)
+
+    def eintraege(self):
+        """Alle Einträge, älteste zuerst (aktuelle Datei plus Rotationen)."""
+        dateien = [f"{self.pfad}.{i}" for i in range(self.backups, 0, -1)] + [self.pfad]
+        for datei in dateien:
+            try:
+                with open(datei, encoding="utf-8") as f:
+                    for zeile in f:
+                        try: yield json.loads(zeile)
+                        except ValueError: continue  # halb geschriebene Zeile
+            except FileNotFoundError:
+                continue
+
+    def auswertung(self, n=50):
+        """{stufe: {anzahl, p50_ms, p95_ms, fehler, eskaliert, bytes, tokens}} über die letzten n Einträge je Stufe."""
+        je_stufe = {}
+        for e in self.eintraege():
+            liste = je_stufe.setdefault(e.get("stufe", "?"), [])
+            liste.append(e)
+            if len(liste) > n: del liste[0]
+        ergebnis = {}
+        for stufe, liste in sorted(je_stufe.items()):
+            ms = sorted(e["ms"] for e in liste)
+            ergebnis[stufe] = {
+                "anzahl": len(liste), "p50_ms": perzentil(ms, 50), "p95_ms": perzentil(ms, 95),
+                "fehler": sum(1 for e in liste if e.get("fehler")),
+                "eskaliert": sum(1 for e in liste if e.get("eskaliert")),
+                "bytes": sum(e.get("bytes", 0) for e in liste) // max(len(liste), 1),
+                "tokens": sum(e.get("tokens_ein", 0) + e.get("tokens_aus", 0) for e in liste) // max(len(liste), 1),
+            }
+        return ergebnis
@@ -0,0 +1,207 @@
+"""
+Vergabe der Berichtsnummern (B-JJJJ-MM-NN).
+
+Früher wurde die letzte Nummer aus der ersten Spalte des Jahresblatts gelesen
+und +1 gerechnet - teuer bei großen Blättern, und zwei Techniker bekamen
+gleichzeitig dieselbe Nummer, weil erst beim Speichern etwas im Sheet stand.
+Hier wird jede Nummer sofort in einer lokalen SQLite-Datenbank reserviert
+(ein Zähler je Monats-Präfix, eine Schreibtransaktion pro Vergabe).
+
+Lebenslauf einer Nummer: reserviert -> verwendet (Bericht gespeichert) oder
+-> frei (abgebrochen). Freie Nummern werden vor neuen wieder vergeben.
+Reservierungen, die nach `verfall_stunden` weder verwendet noch freigegeben
+wurden, gelten als frei. Jede Reservierung merkt sich ihren `besitzer` (z.B.
+die Sitzung); wurde eine verfallene Nummer inzwischen an jemand anderen
+vergeben, schlägt `bestaetige` für den alten Besitzer fehl.
+
+Für den Offline-Betrieb wird online ein kleiner Vorrat an Nummern angelegt
+(Status 'vorrat', verfällt nicht). Ohne Netz nimmt die App daraus die nächste
+Nummer, ohne den Startwert aus dem Sheet zu brauchen; sie bleibt 'offline'
+(ohne Verfall), bis der Bericht synchronisiert ist. Online wird der Vorrat
+zuerst verbraucht (kleinste Laufnummer zuerst), damit zwischen den
+verwendeten Nummern eines Monats keine Lücke entsteht.
+"""
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS zaehler (
+    praefix TEXT PRIMARY KEY,
+    letzte INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reservierungen (
+    nr TEXT PRIMARY KEY,
+    praefix TEXT NOT NULL,
+    laufnummer INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    geaendert REAL NOT NULL,
+    besitzer TEXT
+);
+CREATE INDEX IF NOT EXISTS reservierungen_status ON reservierungen (praefix, status, laufnummer);
+"""
+
+RESERVIERT, VERWENDET, FREI, VORRAT, OFFLINE = "reserviert", "verwendet", "frei", "vorrat", "offline"
+
+
+def monats_praefix(jetzt=None):
+    jetzt = jetzt or datetime.now()
+    return f"B-{jetzt:%Y}-{jetzt:%m}"
+
+
+def formatiere(praefix, laufnummer):
+    return f"{praefix}-{laufnummer:02d}"
+
+
+def hoechste_laufnummer(nummern, praefix):
+    """Größte Laufnummer zu `praefix` in vorhandenen Nummern (0, wenn keine)."""
+    muster = re.compile(rf"^{re.escape(praefix)}-(\d+)$")
+    treffer = (muster.match(str(n).strip()) for n in nummern)
+    return max((int(m.group(1)) for m in treffer if m), default=0)
+
+
+class NummernVergabe:
+    def __init__(self, pfad, verfall_stunden=24):
+        self.pfad = pfad
+        self.verfall = verfall_stunden * 3600
+        ordner = os.path.dirname(pfad)
+        if ordner: os.makedirs(ordner, exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            # Datenbanken von vor der Besitzer-Spalte
+            if "besitzer" not in {r[1] for r in db.execute("PRAGMA table_info(reservierungen)")}:
+                db.execute("ALTER TABLE reservierungen ADD COLUMN besitzer TEXT")
+
+    @contextmanager
+    def _db(self):
+        # isolation_level=None: Transaktionen steuern wir selbst (BEGIN IMMEDIATE)
+        db = sqlite3.connect(self.pfad, timeout=30, isolation_level=None)
+        try: yield db
+        finally: db.close()
+
+    @contextmanager
+    def _transaktion(self):
+        """Schreibsperre sofort holen, damit zwei Vergaben nie dieselbe Zahl lesen."""
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def reserviere(self, praefix=None, startwert=None, besitzer=None):
+        """
+        Reserviert die nächste Nummer für `praefix` (Standard: aktueller Monat).
+        `startwert()` wird nur beim ersten Mal je Präfix aufgerufen und liefert die
+        höchste schon vergebene Laufnummer (z.B. aus dem Sheet). Freie Nummern und
+        der Offline-Vorrat gehen vor neuen, die kleinste zuerst.
+        """
+        praefix = praefix or monats_praefix()
+        jetzt = time.time()
+        # Startwert außerhalb der Sperre ermitteln (kann ein Netzwerkzugriff sein)
+        with self._db() as db: bekannt = db.execute("SELECT 1 FROM zaehler WHERE praefix=?", (praefix,)).fetchone()
+        start = int(startwert() or 0) if startwert and not bekannt else 0
+        with self._transaktion() as db:
+            db.execute("UPDATE reservierungen SET status=?, geaendert=? WHERE praefix=? AND status=? AND geaendert < ?",
+                       (FREI, jetzt, praefix, RESERVIERT, jetzt - self.verfall))
+            frei = db.execute("SELECT laufnummer FROM reservierungen WHERE praefix=? AND status IN (?, ?) ORDER BY laufnummer LIMIT 1",
+                              (praefix, FREI, VORRAT)).fetchone()
+            if frei:
+                laufnummer = frei[0]
+            else:
+                db.execute("INSERT OR IGNORE INTO zaehler (praefix, letzte) VALUES (?, ?)", (praefix, start))
+                db.execute("UPDATE zaehler SET letzte = letzte + 1 WHERE praefix=?", (praefix,))
+                laufnummer = db.execute("SELECT letzte FROM zaehler WHERE praefix=?", (praefix,)).fetchone()[0]
+            nr = formatiere(praefix, laufnummer)
+            db.execute("INSERT OR REPLACE INTO reservierungen (nr, praefix, laufnummer, status, geaendert, besitzer) VALUES (?, ?, ?, ?, ?, ?)",
+                       (nr, praefix, laufnummer, RESERVIERT, jetzt, besitzer))
+        return nr
+
+    def fuelle_vorrat(self, anzahl=5, praefix=None, startwert=None):
+        """
+        Hält `anzahl` Nummern des Präfixes für Offline-Berichte bereit. Reste aus
+        Vormonaten werden dabei wieder frei. Rückgabe: Größe des Vorrats.
+        """
+        praefix = praefix or monats_praefix()
+        with self._db() as db: bekannt = db.execute("SELECT 1 FROM zaehler WHERE praefix=?", (praefix,)).fetchone()
+        start = int(startwert() or 0) if startwert and not bekannt else 0
+        jetzt = time.time()
+        with self._transaktion() as db:
+            db.execute("UPDATE reservierungen SET status=?, geaendert=? WHERE praefix<>? AND status=?", (FREI, jetzt, praefix, VORRAT))
+            vorhanden = db.execute("SELECT COUNT(*) FROM reservierungen WHERE praefix=? AND status=?", (praefix, VORRAT)).fetchone()[0]
+            if vorhanden >= anzahl: return vorhanden
+            db.execute("INSERT OR IGNORE INTO zaehler (praefix, letzte) VALUES (?, ?)", (praefix, start))
+            letzte = db.execute("SELECT letzte FROM zaehler WHERE praefix=?", (praefix,)).fetchone()[0]
+            neu = range(letzte + 1, letzte + 1 + anzahl - vorhanden)
+            db.execute("UPDATE zaehler SET letzte=? WHERE praefix=?", (neu[-1], praefix))
+            db.executemany("INSERT OR REPLACE INTO reservierungen (nr, praefix, laufnummer, status, geaendert) VALUES (?, ?, ?, ?, ?)",
+                           [(formatiere(praefix, n), praefix, n, VORRAT, jetzt) for n in neu])
+        return anzahl
+
+    def aus_vorrat(self, praefix=None):
+        """Nächste Nummer aus dem Vorrat nehmen - ohne Netz. None, wenn leer."""
+        praefix = praefix or monats_praefix()
+        with self._transaktion() as db:
+            row = db.execute("SELECT nr FROM reservierungen WHERE praefix=? AND status=? ORDER BY laufnummer LIMIT 1", (praefix, VORRAT)).fetchone()
+            if not row: return None
+            db.execute("UPDATE reservierungen SET status=?, geaendert=? WHERE nr=?", (OFFLINE, time.time(), row[0]))
+        return row[0]
+
+    def _setze_status(self, nr, status, nur_wenn=None):
+        with self._transaktion() as db:
+            sql, args = "UPDATE reservierungen SET status=?, geaendert=? WHERE nr=?", [status, time.time(), nr]
+            if nur_wenn: sql += f" AND status IN ({','.join('?' * len(nur_wenn))})"; args.extend(nur_wenn)
+            return db.execute(sql, args).rowcount > 0
+
+    def bestaetige(self, nr, besitzer=None):
+        """
+        Nummer wird für einen gespeicherten Bericht benutzt. Mit `besitzer`: False,
+        wenn sie inzwischen jemand anderem gehört (verfallen und neu vergeben,
+        schon verwendet, im Vorrat) - dann darf sie nicht gespeichert werden.
+        Freie und hier unbekannte (von Hand eingetragene) Nummern sind erlaubt.
+        """
+        if besitzer is None: return self._setze_status(nr, VERWENDET)
+        with self._transaktion() as db:
+            row = db.execute("SELECT status, besitzer FROM reservierungen WHERE nr=?", (nr,)).fetchone()
+            if row is None: return True
+            status, inhaber = row
+            if status != FREI and inhaber != besitzer: return False
+            db.execute("UPDATE reservierungen SET status=?, geaendert=?, besitzer=? WHERE nr=?", (VERWENDET, time.time(), besitzer, nr))
+        return True
+
+    def sichere(self, nr, besitzer):
+        """
+        Vor dem Speichern: False wie bei bestaetige(), sonst bleibt die Nummer
+        reserviert, aber frisch für `besitzer` - sie verfällt nicht, während
+        PDF und Sheet-Zeile entstehen. Verwendet wird sie erst mit bestaetige();
+        scheitert das Speichern, bleibt sie dieser Sitzung.
+        """
+        with self._transaktion() as db:
+            row = db.execute("SELECT status, besitzer FROM reservierungen WHERE nr=?", (nr,)).fetchone()
+            if row is None: return True
+            status, inhaber = row
+            if status != FREI and inhaber != besitzer: return False
+            if status in (FREI, RESERVIERT):
+                db.execute("UPDATE reservierungen SET status=?, geaendert=?, besitzer=? WHERE nr=?", (RESERVIERT, time.time(), besitzer, nr))
+        return True
+
+    def freigeben(self, nr, besitzer=None):
+        """
+        Reservierung zurückgeben (Bericht verworfen); verwendete Nummern bleiben verwendet.
+        Mit `besitzer` nur die eigene - eine inzwischen neu vergebene bleibt beim neuen Besitzer.
+        """
+        if besitzer is None: return self._setze_status(nr, FREI, nur_wenn=(RESERVIERT, OFFLINE))
+        with self._transaktion() as db:
+            return db.execute("UPDATE reservierungen SET status=?, geaendert=? WHERE nr=? AND status IN (?, ?) AND besitzer=?",
+                              (FREI, time.time(), nr, RESERVIERT, OFFLINE, besitzer)).rowcount > 0
+
+    def status(self, nr):
+        with self._db() as db:
+            row = db.execute("SELECT status FROM reservierungen WHERE nr=?", (nr,)).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,193 @@
+"""
+Offline-Erfassung von Berichten (Keller, Funkloch).
+
+Ohne Netz kann die App weder transkribieren noch das Sheet lesen. Statt den
+Bericht zu verlieren, legt sie alles Nötige lokal ab: Audio, Unterschrift,
+die Angaben aus der Erfassung (z.B. den Kunden aus dem lokalen Spiegel) und
+eine vorläufige Nummer aus dem Vorrat (nummern.py). Ist wieder Netz da, wird
+jede Erfassung in Stufen nachgeholt - Transkription, Extraktion, Nummer
+prüfen, Abliefern (Sheet-Zeile + Mail über den Postausgang). Jede Stufe wird
+sofort gespeichert; bricht die Verbindung mittendrin ab, geht es beim
+nächsten Mal an derselben Stelle weiter.
+
+Die Dienste werden als Funktionen übergeben, damit sich das Ganze mit
+lokalen Ersatzdiensten und simuliertem Netzausfall prüfen lässt.
+"""
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS erfassungen (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nr TEXT NOT NULL,
+    nr_alt TEXT,
+    status TEXT NOT NULL,
+    endung TEXT NOT NULL,
+    angaben TEXT NOT NULL,
+    transkript TEXT,
+    daten TEXT,
+    versuche INTEGER NOT NULL DEFAULT 0,
+    letzter_fehler TEXT,
+    erstellt REAL NOT NULL,
+    geaendert REAL NOT NULL
+);
+"""
+
+# Status = letzte abgeschlossene Stufe
+ERFASST, TRANSKRIBIERT, EXTRAHIERT, ERLEDIGT = "erfasst", "transkribiert", "extrahiert", "erledigt"
+_SPALTEN = ("id", "nr", "nr_alt", "status", "endung", "angaben", "transkript", "daten", "versuche", "letzter_fehler", "erstellt", "geaendert")
+
+# Erreichbarkeit prüfen: OpenAI und Google (Host, Port)
+ZIELE = (("api.openai.com", 443), ("sheets.googleapis.com", 443))
+
+
+def vorlaeufige_nummer(praefix):
+    """Notnummer, wenn der Vorrat leer ist - wird beim Synchronisieren immer ersetzt."""
+    return f"{praefix}-V{time.strftime('%d%H%M%S')}"
+
+
+def ist_vorlaeufig(nr):
+    return "-V" in str(nr)
+
+
+def ist_online(ziele=ZIELE, timeout=2.0):
+    """True, wenn alle Ziele per TCP erreichbar sind."""
+    for ziel in ziele:
+        try:
+            with socket.create_connection(ziel, timeout=timeout): pass
+        except OSError:
+            return False
+    return True
+
+
+class OfflineSpeicher:
+    def __init__(self, ordner):
+        self.ordner = ordner
+        os.makedirs(ordner, exist_ok=True)
+        self.pfad = os.path.join(ordner, "erfassungen.sqlite")
+        with self._db() as db: db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.pfad, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db: yield db
+        finally:
+            db.close()
+
+    def datei(self, erfassung_id, name):
+        return os.path.join(self.ordner, f"{erfassung_id:05d}_{name}")
+
+    # --- Erfassen (ohne Netz) ---
+    def erfasse(self, audio, endung, nr, angaben=None, unterschrift=None):
+        """
+        Legt eine Erfassung ab: Audio-Bytes, vorläufige Nummer, Angaben (dict,
+        z.B. kunde, notiz, zeitpunkt) und optional die Unterschrift als PNG-Bytes.
+        """
+        jetzt = time.time()
+        angaben = dict(angaben or {}, zeitpunkt=(angaben or {}).get("zeitpunkt", jetzt))
+        with self._db() as db:
+            erfassung_id = db.execute("INSERT INTO erfassungen (nr, status, endung, angaben, erstellt, geaendert) VALUES (?, ?, ?, ?, ?, ?)",
+                                      (nr, ERFASST, endung, json.dumps(angaben, ensure_ascii=False), jetzt, jetzt)).lastrowid
+        # Dateien nach dem Eintrag schreiben; fehlt das Audio, schlägt die Transkription später sichtbar fehl
+        with open(self.datei(erfassung_id, f"audio.{endung}"), "wb") as f: f.write(audio)
+        if unterschrift:
+            with open(self.datei(erfassung_id, "unterschrift.png"), "wb") as f: f.write(unterschrift)
+        return erfassung_id
+
+    # --- Abfragen ---
+    def hole(self, erfassung_id):
+        with self._db() as db:
+            row = db.execute(f"SELECT {', '.join(_SPALTEN)} FROM erfassungen WHERE id=?", (erfassung_id,)).fetchone()
+        return _als_dict(row) if row else None
+
+    def offene(self):
+        """Noch nicht abgelieferte Erfassungen, älteste zuerst."""
+        with self._db() as db:
+            rows = db.execute(f"SELECT {', '.join(_SPALTEN)} FROM erfassungen WHERE status<>? ORDER BY id", (ERLEDIGT,)).fetchall()
+        return [_als_dict(r) for r in rows]
+
+    def letzte(self, limit=20):
+        with self._db() as db:
+            rows = db.execute(f"SELECT {', '.join(_SPALTEN)} FROM erfassungen ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [_als_dict(r) for r in rows]
+
+    def zaehle(self):
+        with self._db() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM erfassungen GROUP BY status").fetchall())
+
+    def audio(self, e):
+        with open(self.datei(e["id"], f"audio.{e['endung']}"), "rb") as f: return f.read()
+
+    def unterschrift_pfad(self, e):
+        pfad = self.datei(e["id"], "unterschrift.png")
+        return pfad if os.path.exists(pfad) else None
+
+    # --- Fortschritt ---
+    def _setze(self, erfassung_id, **felder):
+        felder["geaendert"] = time.time()
+        for k in ("angaben", "daten"):
+            if k in felder: felder[k] = json.dumps(felder[k], ensure_ascii=False)
+        with self._db() as db:
+            db.execute(f"UPDATE erfassungen SET {', '.join(f'{k}=?' for k in felder)} WHERE id=?", (*felder.values(), erfassung_id))
+
+    def verarbeite(self, erfassung_id, transkribiere, extrahiere, nummer_pruefen, abliefern):
+        """
+        Holt die fehlenden Stufen einer Erfassung nach:
+          transkribiere(audio_bytes, endung) -> text
+          extrahiere(text, angaben) -> daten (dict wie text_zu_daten)
+          nummer_pruefen(nr) -> endgültige Nummer (bei Konflikt eine neue)
+          abliefern(daten, erfassung) -> Sheet-Zeile + Mail einreihen
+        Fehler (z.B. kein Netz) werden vermerkt und weitergereicht.
+        """
+        e = self.hole(erfassung_id)
+        if e is None or e["status"] == ERLEDIGT: return e
+        try:
+            if e["status"] == ERFASST:
+                e["transkript"] = transkribiere(self.audio(e), e["endung"])
+                e["status"] = TRANSKRIBIERT
+                self._setze(erfassung_id, transkript=e["transkript"], status=TRANSKRIBIERT)
+            if e["status"] == TRANSKRIBIERT:
+                e["daten"] = extrahiere(e["transkript"], e["angaben"])
+                e["status"] = EXTRAHIERT
+                self._setze(erfassung_id, daten=e["daten"], status=EXTRAHIERT)
+            # Nummer erst direkt vor dem Abliefern prüfen - so nah wie möglich am Schreiben ins Sheet
+            nr = nummer_pruefen(e["nr"])
+            if nr != e["nr"]:
+                self._setze(erfassung_id, nr=nr, nr_alt=e["nr"])
+                e["nr_alt"], e["nr"] = e["nr"], nr
+            e["daten"]["rechnungs_nr"] = nr
+            abliefern(e["daten"], e)
+            self._setze(erfassung_id, daten=e["daten"], status=ERLEDIGT, letzter_fehler=None)
+            e["status"] = ERLEDIGT
+            # Audio wird nicht mehr gebraucht; die Unterschrift bleibt für einen späteren PDF-Download
+            try: os.remove(self.datei(erfassung_id, f"audio.{e['endung']}"))
+            except OSError: pass
+            return e
+        except Exception as fehler:
+            self._setze(erfassung_id, versuche=e["versuche"] + 1, letzter_fehler=f"{type(fehler).__name__}: {fehler}")
+            raise
+
+    def synchronisiere(self, stapel=5, **dienste):
+        """
+        Arbeitet bis zu `stapel` offene Erfassungen ab (älteste zuerst) und hört
+        beim ersten Fehler auf - meist ist dann das Netz wieder weg.
+        Rückgabe: (erledigte Erfassungen, Fehler oder None).
+        """
+        erledigt = []
+        for e in self.offene()[:stapel]:
+            try: erledigt.append(self.verarbeite(e["id"], **dienste))
+            except Exception as fehler: return erledigt, fehler
+        return erledigt, None
+
+
+def _als_dict(row):
+    e = dict(zip(_SPALTEN, row))
+    e["angaben"] = json.loads(e["angaben"])
+    e["daten"] = json.loads(e["daten"]) if e["daten"] else None
+    return e
@@ -0,0 +1,62 @@
+"""
+Kleine Stufen-Pipeline für nebenläufige Arbeitsschritte.
+
+Jede Stufe ist eine Funktion mit Abhängigkeiten zu anderen Stufen. Stufen ohne
+offene Abhängigkeiten laufen sofort in einem Thread-Pool los, alle anderen,
+sobald ihre Eingaben fertig sind. So laufen z.B. Sheets-Abfragen, während
+Whisper noch transkribiert, und nur die GPT-Extraktion wartet auf den Text.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class StufenFehler(Exception):
+    """Eine Stufe ist fehlgeschlagen; `stufe` nennt sie, `__cause__` ist der Originalfehler."""
+
+    def __init__(self, stufe, fehler):
+        super().__init__(f"{stufe}: {fehler}")
+        self.stufe = stufe
+
+
+def _gemessen(funktion, args):
+    t0 = time.perf_counter()
+    ergebnis = funktion(*args)
+    return ergebnis, time.perf_counter() - t0
+
+
+def fuehre_aus(stufen, melde=None, max_worker=4, initializer=None):
+    """
+    stufen: {name: (funktion, [abhängigkeiten])}. Die Funktion bekommt die
+    Ergebnisse ihrer Abhängigkeiten als Argumente (in der angegebenen Reihenfolge).
+    melde(name, sekunden) läuft im aufrufenden Thread, sobald eine Stufe fertig
+    ist (z.B. für Fortschritt in der Oberfläche).
+    Rückgabe: {name: ergebnis}. Schlägt eine Stufe fehl, werden laufende Stufen
+    noch abgewartet, abhängige nicht mehr gestartet und StufenFehler geworfen.
+    """
+    for name, (_, abh) in stufen.items():
+        unbekannt = [a for a in abh if a not in stufen]
+        if unbekannt: raise ValueError(f"Stufe {name}: unbekannte Abhängigkeit {unbekannt}")
+
+    ergebnisse, laufend, fehler = {}, {}, None
+    offen = dict(stufen)
+    with ThreadPoolExecutor(max_workers=max_worker, initializer=initializer) as pool:
+        while offen or laufend:
+            if fehler is None:
+                for name, (funktion, abh) in list(offen.items()):
+                    if all(a in ergebnisse for a in abh):
+                        del offen[name]
+                        laufend[pool.submit(_gemessen, funktion, [ergebnisse[a] for a in abh])] = name
+            if not laufend:
+                if fehler is None: raise ValueError(f"Zyklische Abhängigkeiten: {sorted(offen)}")
+                break
+            fertig, _ = wait(laufend, return_when=FIRST_COMPLETED)
+            for f in fertig:
+                name = laufend.pop(f)
+                try: ergebnisse[name], sekunden = f.result()
+                except Exception as e:
+                    if fehler is None: fehler = (name, e)
+                    continue
+                if melde: melde(name, sekunden)
+    if fehler:
+        raise StufenFehler(*fehler) from fehler[1]
+    return ergebnisse
@@ -0,0 +1,178 @@
+"""
+Dauerhafter Postausgang für Sheet-Schreibvorgänge und E-Mails.
+
+Statt im Button-Handler auf Google und den SMTP-Server zu warten, legt die App
+einen Auftrag in einer lokalen SQLite-Datenbank ab und kehrt sofort zurück.
+Ein Hintergrund-Thread arbeitet die Aufträge ab und versucht es bei Fehlern
+mit wachsender Wartezeit erneut. Jeder Auftrag hat einen fachlichen Schlüssel
+(z.B. 'rechnung:B-2025-03-07'); derselbe Schlüssel wird nur einmal angenommen,
+so landet eine Rechnung auch bei doppeltem Klick nur einmal im Sheet. Eine
+geänderte Nutzlast unter bekanntem Schlüssel meldet einreihen() als Konflikt,
+statt sie stillschweigend zu verwerfen.
+
+Die Handler werden je Art registriert: handler(nutzlast, versuch). Sie
+sollen bei Fehlern eine Exception werfen und bei versuch > 0 selbst prüfen,
+ob ein früherer Versuch nicht doch schon angekommen ist.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS auftraege (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    art TEXT NOT NULL,
+    schluessel TEXT NOT NULL UNIQUE,
+    nutzlast TEXT NOT NULL,
+    status TEXT NOT NULL,
+    versuche INTEGER NOT NULL DEFAULT 0,
+    faellig REAL NOT NULL,
+    gesperrt_bis REAL NOT NULL DEFAULT 0,
+    letzter_fehler TEXT,
+    erstellt REAL NOT NULL,
+    erledigt REAL
+);
+CREATE INDEX IF NOT EXISTS auftraege_faellig ON auftraege (status, faellig);
+"""
+
+OFFEN, ERLEDIGT, FEHLER = "offen", "erledigt", "fehler"
+
+
+def wartezeit(versuche, basis=5.0, maximum=1800.0):
+    """5 s, 10 s, 20 s, ... höchstens 30 min."""
+    return min(basis * 2 ** max(versuche - 1, 0), maximum)
+
+
+class Postausgang:
+    def __init__(self, pfad, max_versuche=10, sperre_sekunden=300):
+        self.pfad = pfad
+        self.max_versuche = max_versuche
+        self.sperre_sekunden = sperre_sekunden
+        self._handler = {}
+        self._neu = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stop = threading.Event()
+        ordner = os.path.dirname(pfad)
+        if ordner: os.makedirs(ordner, exist_ok=True)
+        with self._db() as db: db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.pfad, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db: yield db
+        finally:
+            db.close()
+
+    def registriere(self, art, handler):
+        """Setzt (oder ersetzt) den Handler für eine Art."""
+        self._handler[art] = handler
+
+    # --- Einliefern ---
+    def einreihen(self, art, schluessel, nutzlast, ersetzen=False):
+        """
+        Legt einen Auftrag ab. Ist der Schlüssel schon bekannt, gilt dieselbe
+        Nutzlast als angenommen (doppelter Klick); eine andere ersetzt mit
+        `ersetzen` die eines noch offenen, gerade nicht laufenden Auftrags
+        (korrigierte Rechnung vor dem Schreiben). Rückgabe: True, wenn genau
+        diese Nutzlast ausgeführt wird; False = Konflikt, Nutzlast verworfen.
+        """
+        jetzt = time.time()
+        daten = json.dumps(nutzlast, ensure_ascii=False)
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            neu = db.execute("INSERT OR IGNORE INTO auftraege (art, schluessel, nutzlast, status, faellig, erstellt) VALUES (?, ?, ?, ?, ?, ?)",
+                             (art, schluessel, daten, OFFEN, jetzt, jetzt)).rowcount > 0
+            if not neu: neu = db.execute("SELECT nutzlast FROM auftraege WHERE schluessel=?", (schluessel,)).fetchone()[0] == daten
+            if not neu and ersetzen:
+                neu = db.execute("UPDATE auftraege SET nutzlast=?, faellig=? WHERE schluessel=? AND status=? AND gesperrt_bis<?",
+                                 (daten, jetzt, schluessel, OFFEN, jetzt)).rowcount > 0
+        self._neu.set()
+        return neu
+
+    def erneut_versuchen(self, schluessel):
+        """Einen endgültig gescheiterten Auftrag wieder in die Warteschlange stellen."""
+        with self._db() as db:
+            db.execute("UPDATE auftraege SET status=?, versuche=0, faellig=? WHERE schluessel=? AND status=?", (OFFEN, time.time(), schluessel, FEHLER))
+        self._neu.set()
+
+    # --- Abfragen ---
+    def status(self, schluessel):
+        with self._db() as db:
+            row = db.execute("SELECT status, versuche, letzter_fehler FROM auftraege WHERE schluessel=?", (schluessel,)).fetchone()
+        return None if not row else {"status": row[0], "versuche": row[1], "fehler": row[2]}
+
+    def uebersicht(self, limit=20):
+        """Letzte Aufträge (ohne Nutzlast), neueste zuerst."""
+        with self._db() as db:
+            rows = db.execute("SELECT art, schluessel, status, versuche, faellig, letzter_fehler, erstellt FROM auftraege ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(("art", "schluessel", "status", "versuche", "faellig", "fehler", "erstellt"), r)) for r in rows]
+
+    def zaehle(self):
+        with self._db() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM auftraege GROUP BY status").fetchall())
+
+    # --- Abarbeiten ---
+    def _naechster(self):
+        """Holt einen fälligen Auftrag und sperrt ihn (auch gegen andere Prozesse)."""
+        jetzt = time.time()
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT id, art, nutzlast, versuche FROM auftraege WHERE status=? AND faellig<=? AND gesperrt_bis<? ORDER BY faellig LIMIT 1",
+                             (OFFEN, jetzt, jetzt)).fetchone()
+            if row: db.execute("UPDATE auftraege SET gesperrt_bis=? WHERE id=?", (jetzt + self.sperre_sekunden, row[0]))
+        return row
+
+    def arbeite_einen(self):
+        """Einen fälligen Auftrag ausführen. Rückgabe: True, wenn es einen gab."""
+        row = self._naechster()
+        if not row: return False
+        auftrag_id, art, nutzlast, versuche = row
+        handler = self._handler.get(art)
+        try:
+            if handler is None: raise RuntimeError(f"Kein Handler für '{art}'")
+            handler(json.loads(nutzlast), versuche)
+        except Exception as e:
+            versuche += 1
+            status = FEHLER if versuche >= self.max_versuche else OFFEN
+            with self._db() as db:
+                db.execute("UPDATE auftraege SET status=?, versuche=?, faellig=?, gesperrt_bis=0, letzter_fehler=? WHERE id=?",
+                           (status, versuche, time.time() + wartezeit(versuche), f"{type(e).__name__}: {e}", auftrag_id))
+            return True
+        with self._db() as db:
+            db.execute("UPDATE auftraege SET status=?, versuche=?, gesperrt_bis=0, letzter_fehler=NULL, erledigt=? WHERE id=?",
+                       (ERLEDIGT, versuche + 1, time.time(), auftrag_id))
+        return True
+
+    def _naechste_faelligkeit(self):
+        with self._db() as db:
+            row = db.execute("SELECT MIN(MAX(faellig, gesperrt_bis)) FROM auftraege WHERE status=?", (OFFEN,)).fetchone()
+        return row[0]
+
+    def _schleife(self):
+        while not self._stop.is_set():
+            try:
+                if self.arbeite_einen(): continue
+                naechste = self._naechste_faelligkeit()
+            except sqlite3.Error:
+                naechste = None
+            warte = 60.0 if naechste is None else min(max(naechste - time.time(), 0.05), 60.0)
+            self._neu.wait(warte)
+            self._neu.clear()
+
+    def starte(self):
+        """Startet den Hintergrund-Thread (mehrfacher Aufruf ist harmlos)."""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive(): return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._schleife, name="postausgang", daemon=True)
+            self._thread.start()
+
+    def stoppe(self, timeout=5):
+        self._stop.set(); self._neu.set()
+        if self._thread is not None: self._thread.join(timeout)
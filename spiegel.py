@@ -0,0 +1,233 @@
+"""
+Lokaler SQLite-Spiegel für Tabellenblätter (z.B. 'Aufträge_2025').
+
+Statt bei jedem Streamlit-Rerun `get_all_values()` zu laden, liest das
+Dashboard aus dem Spiegel. `sync()` holt nur die Zeilen, die seit dem letzten
+Abgleich angehängt wurden; in größeren Abständen wird einmal komplett
+abgeglichen, damit Änderungen aus dem Browser (z.B. Status) ankommen.
+Schreibvorgänge der App landen per `anhaengen()` / `setze_zelle()` sofort
+im Spiegel. `blaetter.zeilen` zählt nur abgeglichene Zeilen; angehängte
+Zeilen liegen dahinter, bis `sync()` sie (und was andere Sitzungen inzwischen
+angehängt haben) ab der letzten abgeglichenen Zeile neu holt.
+Jede Änderung zählt `revision` hoch; `stand()` taugt damit als billiger
+Cache-Schlüssel für Indizes über ein Blatt.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from gspread.utils import rowcol_to_a1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blaetter (
+    schluessel TEXT PRIMARY KEY,
+    kopf TEXT NOT NULL,
+    zeilen INTEGER NOT NULL,
+    letzter_sync REAL NOT NULL,
+    letzter_voll REAL NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS zeilen (
+    schluessel TEXT NOT NULL,
+    nr INTEGER NOT NULL,
+    werte TEXT NOT NULL,
+    PRIMARY KEY (schluessel, nr)
+);
+CREATE TABLE IF NOT EXISTS titel (
+    titel TEXT PRIMARY KEY,
+    schluessel TEXT NOT NULL
+);
+"""
+
+
+def blatt_schluessel(ws):
+    """Eindeutig je Spreadsheet und Blatt (über die Sheet-ID, nicht den Titel)."""
+    return f"{getattr(ws, 'spreadsheet_id', '')}/{ws.id}"
+
+
+def zeile_aus_antwort(antwort):
+    """Zeilennummer aus der Antwort von append_row ('...!A12:K12' -> 12)."""
+    try:
+        bereich = antwort["updates"]["updatedRange"]
+        return int(re.search(r"!\$?[A-Z]+\$?(\d+)", bereich).group(1))
+    except Exception:
+        return None
+
+
+class TabellenSpiegel:
+    def __init__(self, pfad, voll_abgleich_sekunden=600):
+        self.pfad = pfad
+        self.voll_abgleich_sekunden = voll_abgleich_sekunden
+        self._sync_locks = {}
+        self._locks_lock = threading.Lock()
+        ordner = os.path.dirname(pfad)
+        if ordner: os.makedirs(ordner, exist_ok=True)
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+            if "revision" not in {r[1] for r in db.execute("PRAGMA table_info(blaetter)")}:
+                db.execute("ALTER TABLE blaetter ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.pfad, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db: yield db
+        finally:
+            db.close()
+
+    def _meta(self, db, schluessel):
+        row = db.execute("SELECT kopf, zeilen, letzter_sync, letzter_voll, revision FROM blaetter WHERE schluessel=?", (schluessel,)).fetchone()
+        if not row: return None
+        return {"kopf": json.loads(row[0]), "zeilen": row[1], "letzter_sync": row[2], "letzter_voll": row[3], "revision": row[4]}
+
+    def _geaendert(self, db, schluessel):
+        db.execute("UPDATE blaetter SET revision=revision+1 WHERE schluessel=?", (schluessel,))
+
+    def _sync_lock(self, schluessel):
+        """Ein Lock je Blatt, damit z.B. Kunden und Preisliste parallel abgleichen können."""
+        with self._locks_lock:
+            return self._sync_locks.setdefault(schluessel, threading.Lock())
+
+    # --- Abgleich mit Google ---
+    def sync(self, ws, voll=False):
+        """
+        Gleicht den Spiegel ab. Ohne `voll` werden nur neue Zeilen geholt
+        (ein kleiner Bereichs-Request ab der letzten abgeglichenen Zeile;
+        per Write-Through übernommene Zeilen werden dabei überschrieben).
+        Rückgabe: Anzahl neu übernommener Zeilen.
+        """
+        schluessel = blatt_schluessel(ws)
+        with self._sync_lock(schluessel):
+            with self._db() as db: meta = self._meta(db, schluessel)
+            jetzt = time.time()
+            if voll or not meta or not meta["kopf"] or jetzt - meta["letzter_voll"] > self.voll_abgleich_sekunden:
+                return self._voll(ws, schluessel, jetzt)
+
+            breite = len(meta["kopf"])
+            start = meta["zeilen"] + 1
+            bereich = f"A{start}:{rowcol_to_a1(1, breite)[:-1]}"
+            neu = ws.get(bereich)
+            neu = [list(z) + [""] * (breite - len(z)) for z in neu]
+            with self._db() as db:
+                db.executemany("INSERT OR REPLACE INTO zeilen (schluessel, nr, werte) VALUES (?, ?, ?)",
+                               [(schluessel, start + i, json.dumps(z)) for i, z in enumerate(neu)])
+                db.execute("UPDATE blaetter SET zeilen=?, letzter_sync=? WHERE schluessel=?", (meta["zeilen"] + len(neu), jetzt, schluessel))
+                if neu: self._geaendert(db, schluessel)
+            return len(neu)
+
+    def _voll(self, ws, schluessel, jetzt):
+        alle = ws.get_all_values()
+        kopf = alle[0] if alle else []
+        with self._db() as db:
+            db.execute("DELETE FROM zeilen WHERE schluessel=?", (schluessel,))
+            db.executemany("INSERT INTO zeilen (schluessel, nr, werte) VALUES (?, ?, ?)",
+                           [(schluessel, i + 2, json.dumps(z)) for i, z in enumerate(alle[1:])])
+            db.execute("INSERT OR REPLACE INTO blaetter (schluessel, kopf, zeilen, letzter_sync, letzter_voll, revision) "
+                       "VALUES (?, ?, ?, ?, ?, COALESCE((SELECT revision FROM blaetter WHERE schluessel=?), 0) + 1)",
+                       (schluessel, json.dumps(kopf), len(alle), jetzt, jetzt, schluessel))
+            # Für den Offline-Betrieb: Blatt auch ohne Verbindung (und ohne ws) über den Titel finden
+            db.execute("INSERT OR REPLACE INTO titel (titel, schluessel) VALUES (?, ?)", (ws.title, schluessel))
+        return max(len(alle) - 1, 0)
+
+    # --- Lesen ---
+    def werte(self, ws):
+        """Wie ws.get_all_values(), nur lokal: Kopfzeile + Zeilen, Index i = Sheet-Zeile i+1."""
+        return self._werte(blatt_schluessel(ws))
+
+    def werte_nach_titel(self, titel):
+        """Wie werte(), aber über den Blatt-Titel - funktioniert auch offline nach einem Neustart."""
+        with self._db() as db: row = db.execute("SELECT schluessel FROM titel WHERE titel=?", (titel,)).fetchone()
+        return self._werte(row[0]) if row else []
+
+    def _daten(self, db, schluessel, meta):
+        """
+        (nr, werte) ab Zeile 2: alle abgeglichenen Zeilen, danach angehängte nur
+        lückenlos - eine Lücke ist eine Zeile einer anderen Sitzung, die erst der
+        nächste sync() kennt; dahinter nichts mit Platzhaltern auffüllen.
+        """
+        naechste = 2
+        for nr, werte in db.execute("SELECT nr, werte FROM zeilen WHERE schluessel=? AND nr>=2 ORDER BY nr", (schluessel,)):
+            if nr > meta["zeilen"] and nr != naechste: break
+            yield nr, json.loads(werte)
+            naechste = nr + 1
+
+    def _werte(self, schluessel):
+        with self._db() as db:
+            meta = self._meta(db, schluessel)
+            if not meta or not meta["kopf"]: return []
+            daten = list(self._daten(db, schluessel, meta))
+        breite = len(meta["kopf"])
+        ergebnis = [meta["kopf"]]
+        for nr, werte in daten:
+            # Innerhalb der abgeglichenen Zeilen bleibt der Index = Sheet-Zeile - 1
+            ergebnis += [[""] * breite for _ in range(nr - 1 - len(ergebnis))]
+            ergebnis.append(werte)
+        return ergebnis + [[""] * breite for _ in range(meta["zeilen"] - len(ergebnis))]
+
+    def zeilen(self, ws):
+        """Datenzeilen (ohne Kopfzeile) als Generator, direkt aus der Datenbank - für große Exporte."""
+        schluessel = blatt_schluessel(ws)
+        with self._db() as db:
+            meta = self._meta(db, schluessel)
+            if not meta: return
+            for _, werte in self._daten(db, schluessel, meta): yield werte
+
+    def kopf(self, ws):
+        """Kopfzeile aus dem Spiegel (leer, wenn noch nie abgeglichen)."""
+        with self._db() as db: meta = self._meta(db, blatt_schluessel(ws))
+        return meta["kopf"] if meta else []
+
+    def stand(self, ws):
+        """Ändert sich mit jeder Änderung am gespiegelten Blatt (None = noch nie abgeglichen)."""
+        return self._stand(blatt_schluessel(ws))
+
+    def stand_nach_titel(self, titel):
+        with self._db() as db: row = db.execute("SELECT schluessel FROM titel WHERE titel=?", (titel,)).fetchone()
+        return self._stand(row[0]) if row else None
+
+    def _stand(self, schluessel):
+        with self._db() as db: meta = self._meta(db, schluessel)
+        # letzter_voll dazu: nach einem neu angelegten Spiegel beginnt revision wieder bei 1
+        return None if not meta else f"{meta['letzter_voll']}:{meta['revision']}"
+
+    def alter(self, ws):
+        """Sekunden seit dem letzten Abgleich (None = noch nie abgeglichen)."""
+        with self._db() as db: meta = self._meta(db, blatt_schluessel(ws))
+        return None if not meta else time.time() - meta["letzter_sync"]
+
+    # --- Write-Through ---
+    def anhaengen(self, ws, werte, zeile=None):
+        """
+        Übernimmt eine gerade per append_row geschriebene Zeile. Ist die
+        Zeilennummer unbekannt, holt der nächste sync() sie nach. Der Stand
+        der abgeglichenen Zeilen bleibt, sonst übersähe sync() Zeilen, die
+        eine andere Sitzung davor angehängt hat.
+        """
+        schluessel = blatt_schluessel(ws)
+        with self._db() as db:
+            meta = self._meta(db, schluessel)
+            if not meta or zeile is None or zeile <= 1: return False
+            breite = len(meta["kopf"])
+            werte = ["" if w is None else str(w) for w in werte]
+            werte = (werte + [""] * breite)[:max(breite, len(werte))]
+            db.execute("INSERT OR REPLACE INTO zeilen (schluessel, nr, werte) VALUES (?, ?, ?)", (schluessel, zeile, json.dumps(werte)))
+            self._geaendert(db, schluessel)
+        return True
+
+    def setze_zelle(self, ws, zeile, spalte, wert):
+        """Ändert eine Zelle im Spiegel (zeile/spalte wie gspread, 1-basiert)."""
+        schluessel = blatt_schluessel(ws)
+        with self._db() as db:
+            row = db.execute("SELECT werte FROM zeilen WHERE schluessel=? AND nr=?", (schluessel, zeile)).fetchone()
+            if not row: return False
+            werte = json.loads(row[0])
+            if len(werte) < spalte: werte += [""] * (spalte - len(werte))
+            werte[spalte - 1] = wert
+            db.execute("UPDATE zeilen SET werte=? WHERE schluessel=? AND nr=?", (json.dumps(werte), schluessel, zeile))
+            self._geaendert(db, schluessel)
+        return True
@@ -0,0 +1,211 @@
+"""
+Vektorisierte Dashboard-Statistik.
+
+Liefert dieselben Kennzahlen wie früher die Zeilen-Schleifen in
+lade_statistik_daten, aber ohne Python-Schleife pro Zeile:
+Datumswerte werden nur einmal je eindeutigem Text geparst, Geldbeträge mit
+pandas-String-Operationen bereinigt, und Heute/Woche/Monat/6-Monate kommen
+aus einer einzigen Gruppierung pro Tag.
+"""
+import numpy as np
+import pandas as pd
+
+DATUMS_FORMAT = "%d.%m.%Y"
+
+
+def finde_spalten(kopfzeile):
+    """Spaltenindizes wie bisher über Teilstrings der Überschriften (-1 = fehlt)."""
+    idx = {"status": -1, "kunde": -1, "nr": -1, "brutto": -1, "datum": -1}
+    for i, h in enumerate(str(h).strip().lower() for h in kopfzeile):
+        if "status" in h: idx["status"] = i
+        if "kunde" in h: idx["kunde"] = i
+        if ("nr" in h or "nummer" in h) and "kd" not in h and "tel" not in h: idx["nr"] = i
+        if "brutto" in h: idx["brutto"] = i
+        if "datum" in h: idx["datum"] = i
+    if idx["nr"] == -1: idx["nr"] = 0
+    return idx
+
+
+def pro_eindeutigem_wert(spalte, funktion, leer):
+    """
+    Wendet eine vektorisierte Funktion nur auf die eindeutigen Texte einer
+    Spalte an und verteilt das Ergebnis zurück. Datum, Status und oft auch
+    Beträge wiederholen sich ständig, das spart den Großteil der Arbeit.
+    """
+    codes, eindeutig = pd.factorize(spalte)
+    if not len(eindeutig): return np.full(len(codes), leer)
+    werte = np.asarray(funktion(pd.Series(eindeutig, dtype="str")))
+    ergebnis = np.full(len(codes), leer, dtype=werte.dtype)
+    gueltig = codes >= 0
+    ergebnis[gueltig] = werte[codes[gueltig]]
+    return ergebnis
+
+
+def geld_zu_zahl(texte):
+    """'1.234,56 €' -> 1234.56; Unlesbares wird 0.0 (wie putze_geld)."""
+    s = texte.str.replace("€", "", regex=False).str.replace("EUR", "", regex=False).str.strip()
+    s = s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    return pd.to_numeric(s, errors="coerce").fillna(0.0).astype(float)
+
+
+def text_zu_datum(texte):
+    """'14.03.2025' -> datetime64; Unlesbares wird NaT."""
+    return pd.to_datetime(texte, format=DATUMS_FORMAT, errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+
+def ist_offen(texte):
+    """Alles, was nicht 'bezahlt' enthält, gilt als offen."""
+    return ~texte.str.lower().str.contains("bezahlt", regex=False)
+
+
+def _spalte(df, i, leer):
+    if i < 0 or i >= df.shape[1]: return pd.Series([leer] * len(df), index=df.index, dtype="object")
+    return df[i].where(df[i].notna(), leer)
+
+
+def berechne_statistik(alle_werte, heute=None):
+    """
+    alle_werte wie get_all_values() (Kopfzeile + Zeilen).
+    Rückgabe: umsatz_monat, anzahl_heute, anzahl_woche, chart_data, offene_liste, missing_cols
+    """
+    heute = pd.Timestamp.now() if heute is None else pd.Timestamp(heute)
+    idx = finde_spalten(alle_werte[0])
+    missing_cols = []
+    if idx["status"] == -1: missing_cols.append("Status")
+    if idx["brutto"] == -1: missing_cols.append("Brutto")
+
+    df = pd.DataFrame(alle_werte[1:], dtype="object")
+
+    # --- Statistik: eine Gruppierung pro Tag, alles Weitere auf wenigen Zeilen ---
+    chart_data = None
+    umsatz_monat = 0.0
+    anzahl_heute = 0
+    anzahl_woche = 0
+    if idx["datum"] != -1 and idx["brutto"] != -1:
+        tage = pro_eindeutigem_wert(_spalte(df, idx["datum"], None), text_zu_datum, np.datetime64("NaT", "ns")).astype("datetime64[D]")
+        brutto = pro_eindeutigem_wert(_spalte(df, idx["brutto"], None), geld_zu_zahl, 0.0)
+        gueltig = ~np.isnat(tage)
+        pro_tag = pd.DataFrame({"tag": tage[gueltig], "brutto": brutto[gueltig]}).groupby("tag")["brutto"].agg(["sum", "count"])
+
+        tag_index = pd.DatetimeIndex(pro_tag.index)
+        iso = tag_index.isocalendar()
+        im_jahr = tag_index.year == heute.year
+        umsatz_monat = pro_tag["sum"][(tag_index.month == heute.month) & im_jahr].sum()
+        anzahl_heute = int(pro_tag["count"][tag_index.normalize() == heute.normalize()].sum())
+        anzahl_woche = int(pro_tag["count"][(iso["week"].to_numpy() == heute.isocalendar()[1]) & im_jahr].sum())
+
+        chart_data = pro_tag["sum"].groupby(tag_index.strftime("%Y-%m")).sum().tail(6)
+        chart_data.index.name = "Monat_Jahr"
+        chart_data.name = "Brutto_Zahl"
+
+    # --- Offene Posten: boolesche Maske statt Schleife ---
+    offene_liste = []
+    if idx["status"] != -1 and idx["kunde"] != -1 and len(df):
+        status = _spalte(df, idx["status"], "")
+        offen = pro_eindeutigem_wert(status, ist_offen, True)
+        zeilen = np.flatnonzero(offen)
+        nr = _spalte(df, idx["nr"], "?").to_numpy()[zeilen]
+        kunde = _spalte(df, idx["kunde"], "Unbekannt").to_numpy()[zeilen]
+        betrag = _spalte(df, idx["brutto"], "0").to_numpy()[zeilen]
+        status_offen = status.to_numpy()[zeilen]
+        # Für Filter/Sortierung im Dashboard: Betrag als Zahl und Alter in Tagen (None = Datum unlesbar)
+        betrag_zahl = pro_eindeutigem_wert(_spalte(df, idx["brutto"], None), geld_zu_zahl, 0.0)[zeilen]
+        datum = _spalte(df, idx["datum"], "").to_numpy()[zeilen]
+        tage = pro_eindeutigem_wert(pd.Series(datum, dtype="object"), text_zu_datum, np.datetime64("NaT", "ns")).astype("datetime64[D]")
+        alter = (np.datetime64(heute.date(), "D") - tage).astype("timedelta64[D]")
+        offene_liste = [
+            {"gspread_row": int(z) + 2, "nr": n, "kunde": k, "betrag": b, "status": s,
+             "datum": d, "betrag_zahl": float(bz), "alter_tage": None if np.isnat(a) else int(a.astype(int))}
+            for z, n, k, b, s, d, bz, a in zip(zeilen, nr, kunde, betrag, status_offen, datum, betrag_zahl, alter)
+        ]
+
+    return umsatz_monat, anzahl_heute, anzahl_woche, chart_data, offene_liste, missing_cols
+
+
+# --- Offene Posten im Dashboard: filtern, sortieren, nur eine Seite anzeigen ---
+SORTIERUNGEN = {
+    "Älteste zuerst": ("alter_tage", True),
+    "Neueste zuerst": ("alter_tage", False),
+    "Höchster Betrag": ("betrag_zahl", True),
+    "Kunde A-Z": ("kunde", False),
+}
+
+
+def filtere_offene(posten, suche="", betrag_von=None, betrag_bis=None, min_alter=None, sortierung="Älteste zuerst"):
+    """
+    Offene Posten nach Kunde/Nr (Teilstring), Betragsbereich und Mindestalter
+    filtern und sortieren. Posten ohne lesbares Datum fallen nur beim
+    Altersfilter raus und stehen beim Sortieren nach Alter am Ende.
+    """
+    suche = str(suche or "").strip().lower()
+    treffer = [p for p in posten
+               if (not suche or suche in str(p["kunde"]).lower() or suche in str(p["nr"]).lower())
+               and (betrag_von is None or p["betrag_zahl"] >= betrag_von)
+               and (betrag_bis is None or p["betrag_zahl"] <= betrag_bis)
+               and (not min_alter or (p["alter_tage"] is not None and p["alter_tage"] >= min_alter))]
+    feld, absteigend = SORTIERUNGEN.get(sortierung, SORTIERUNGEN["Älteste zuerst"])
+    if feld == "kunde":
+        return sorted(treffer, key=lambda p: str(p["kunde"]).lower())
+    mit = sorted((p for p in treffer if p[feld] is not None), key=lambda p: p[feld], reverse=absteigend)
+    return mit + [p for p in treffer if p[feld] is None]
+
+
+def seite(liste, nummer, pro_seite):
+    """(Ausschnitt, Seitenanzahl, gültige Seitennummer) - Seiten zählen ab 1."""
+    seiten = max((len(liste) + pro_seite - 1) // pro_seite, 1)
+    nummer = min(max(int(nummer), 1), seiten)
+    return liste[(nummer - 1) * pro_seite:nummer * pro_seite], seiten, nummer
+
+
+# --- Mehrjahres-Auswertung: eine kompakte Zusammenfassung je Jahresblatt ---
+def jahres_kennzahlen(alle_werte, top=10):
+    """
+    Fasst ein Jahresblatt (wie get_all_values()) zusammen: Umsatz und Anzahl je
+    Monat ('JJJJ-MM'), offene Beträge und die umsatzstärksten Kunden. Das
+    Ergebnis ist JSON-fähig und wird für abgeschlossene Jahre gespeichert.
+    """
+    leer = {"monate": {}, "umsatz": 0.0, "anzahl": 0, "offen_betrag": 0.0, "offen_anzahl": 0, "top_kunden": []}
+    if len(alle_werte) < 2: return leer
+    idx = finde_spalten(alle_werte[0])
+    if idx["brutto"] == -1: return leer
+    df = pd.DataFrame(alle_werte[1:], dtype="object")
+    brutto = pro_eindeutigem_wert(_spalte(df, idx["brutto"], None), geld_zu_zahl, 0.0)
+    belegt = (_spalte(df, idx["nr"], "").astype(str).str.strip() != "").to_numpy()
+    ergebnis = dict(leer, umsatz=float(brutto.sum()), anzahl=int(belegt.sum()))
+
+    if idx["datum"] != -1:
+        tage = pro_eindeutigem_wert(_spalte(df, idx["datum"], None), text_zu_datum, np.datetime64("NaT", "ns"))
+        gueltig = ~np.isnat(tage)
+        monate = pd.DatetimeIndex(tage[gueltig]).strftime("%Y-%m")
+        pro_monat = pd.DataFrame({"monat": monate, "brutto": brutto[gueltig]}).groupby("monat")["brutto"].agg(["sum", "count"])
+        ergebnis["monate"] = {m: {"umsatz": float(r["sum"]), "anzahl": int(r["count"])} for m, r in pro_monat.iterrows()}
+
+    if idx["status"] != -1:
+        offen = pro_eindeutigem_wert(_spalte(df, idx["status"], ""), ist_offen, True) & belegt
+        ergebnis["offen_betrag"] = float(brutto[offen].sum())
+        ergebnis["offen_anzahl"] = int(offen.sum())
+
+    if idx["kunde"] != -1:
+        kunden = pd.Series(brutto).groupby(_spalte(df, idx["kunde"], "Unbekannt").astype(str).str.strip().to_numpy()).sum()
+        ergebnis["top_kunden"] = [[k, float(v)] for k, v in kunden.nlargest(top).items() if k]
+    return ergebnis
+
+
+def monatsverlauf(kennzahlen, monate=6):
+    """Umsatz der letzten `monate` Monate über alle Jahre (auch im Januar gefüllt)."""
+    umsatz = {}
+    for k in kennzahlen.values():
+        for m, werte in k["monate"].items(): umsatz[m] = umsatz.get(m, 0.0) + werte["umsatz"]
+    if not umsatz: return None
+    verlauf = pd.Series(umsatz, name="Brutto_Zahl").sort_index().tail(monate)
+    verlauf.index.name = "Monat_Jahr"
+    return verlauf
+
+
+def jahresvergleich(kennzahlen):
+    """Tabelle Monat (01-12) x Jahr mit dem Umsatz - für den Vorjahresvergleich."""
+    daten = {str(jahr): {m[5:]: w["umsatz"] for m, w in k["monate"].items() if m.startswith(f"{jahr}-")}
+             for jahr, k in sorted(kennzahlen.items())}
+    tabelle = pd.DataFrame(daten, index=[f"{m:02d}" for m in range(1, 13)]).fillna(0.0)
+    tabelle.index.name = "Monat"
+    return tabelle
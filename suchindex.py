@@ -0,0 +1,95 @@
+"""
+Bausteine für die lokalen Suchindizes (Kunden, Artikel).
+
+Normalisierung deutscher Texte, ein Wortindex mit unscharfer Suche über
+Trigramme und ein prozessweiter Cache, der einen Index nur neu baut, wenn sich
+die Zeilen des zugrunde liegenden Blatts geändert haben.
+"""
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+_UMLAUTE = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def normalisiere(text):
+    """'Müller-Lüdenscheidt, Hauptstraße 5' -> 'mueller luedenscheidt hauptstr 5'"""
+    s = str(text or "").lower().translate(_UMLAUTE)
+    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+    s = re.sub(r"stra?sse\b|str\.", "str ", s)
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", s).split())
+
+
+def woerter(text, stoppwoerter=()):
+    """Suchbare Wörter: normalisiert, mind. 3 Zeichen, keine reinen Zahlen."""
+    return [w for w in normalisiere(text).split() if len(w) >= 3 and not w.isdigit() and w not in stoppwoerter]
+
+
+def trigramme(wort):
+    w = f" {wort} "
+    return {w[i:i + 3] for i in range(len(w) - 2)}
+
+
+def fingerabdruck(zeilen):
+    """Ändert sich, sobald sich irgendeine Zelle ändert."""
+    return hashlib.sha1(json.dumps(zeilen, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class WortIndex:
+    """Wort -> Einträge, plus unscharfe Suche über Trigramm-Vorfilter und difflib."""
+
+    def __init__(self, min_aehnlichkeit=0.8):
+        self.min_aehnlichkeit = min_aehnlichkeit
+        self._eintraege = defaultdict(list)
+        self._trigramm_woerter = defaultdict(set)
+
+    def hinzufuegen(self, wort, eintrag):
+        if wort not in self._eintraege:
+            for t in trigramme(wort): self._trigramm_woerter[t].add(wort)
+        self._eintraege[wort].append(eintrag)
+
+    def eintraege(self, wort):
+        return self._eintraege.get(wort, ())
+
+    def aehnliche(self, wort):
+        """Bekannte Wörter, die `wort` ähneln, mit Ähnlichkeit 0..1 (exakt = 1)."""
+        if wort in self._eintraege: return [(wort, 1.0)]
+        tri = trigramme(wort)
+        gemeinsam = defaultdict(int)
+        for t in tri:
+            for w in self._trigramm_woerter.get(t, ()): gemeinsam[w] += 1
+        # Vorfilter über Trigramm-Überlappung (Dice), erst dann difflib
+        kandidaten = [w for w, n in gemeinsam.items() if 2 * n / (len(tri) + len(w)) >= self.min_aehnlichkeit - 0.3]
+        ergebnis = []
+        for w in kandidaten:
+            r = SequenceMatcher(None, wort, w).ratio()
+            if r >= self.min_aehnlichkeit: ergebnis.append((w, r))
+        return ergebnis
+
+
+class IndexCache:
+    """
+    Prozessweit ein Index je Blatt; neu gebaut nur bei geänderten Zeilen.
+    Mit `stand` (z.B. TabellenSpiegel.stand) entscheidet allein der Stand
+    über den Neubau - kein Hash über das ganze Blatt, und `zeilen` darf dann
+    eine Funktion sein, die erst beim Neubau gelesen wird.
+    """
+
+    def __init__(self, fabrik):
+        self.fabrik = fabrik
+        self._indizes = {}
+        self._lock = threading.Lock()
+
+    def hole(self, schluessel, zeilen, stand=None):
+        if stand is None and callable(zeilen): zeilen = zeilen()  # ohne Stand (z.B. nie gespiegelt) zählt der Inhalt
+        fp = fingerabdruck(zeilen) if stand is None else stand
+        with self._lock:
+            eintrag = self._indizes.get(schluessel)
+            if eintrag is not None and eintrag[0] == fp: return eintrag[1]
+        index = self.fabrik(zeilen() if callable(zeilen) else zeilen)
+        with self._lock: self._indizes[schluessel] = (fp, index)
+        return index
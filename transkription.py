@@ -0,0 +1,165 @@
+"""
+Transkription langer Sprachnachrichten in Teilen.
+
+Lange Memos werden an Sprechpausen in Stücke von etwa `ziel_sekunden`
+geschnitten, parallel transkribiert und in der richtigen Reihenfolge wieder
+zusammengesetzt. Ein fehlgeschlagenes Stück wird einzeln wiederholt, nicht
+die ganze Datei. Der eigentliche Dienst wird als Funktion übergeben
+(`dienst(datei) -> text`, datei wie bei OpenAI: (name, bytes)), damit sich das
+Ganze auch gegen einen lokalen Ersatzdienst prüfen lässt.
+
+Vor dem Hochladen wird das Audio sprachgerecht verkleinert: Mono, 16 kHz,
+Stille am Anfang und Ende abgeschnitten, als Opus (Ogg) mit niedriger
+Bitrate. Ein WAV vom Handy schrumpft so oft auf ein Zwanzigstel.
+
+Zum Schneiden und Kodieren werden pydub und das Programm ffmpeg gebraucht
+(auf Streamlit Cloud über packages.txt installiert). Fehlt eines davon oder
+scheitert Dekodieren/Kodieren, geht die Datei wie bisher unverändert in einem
+Stück hoch - auch bei WAV, das pydub noch ohne ffmpeg lesen kann.
+"""
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from pydub import AudioSegment
+    from pydub.exceptions import CouldntEncodeError
+    from pydub.silence import detect_leading_silence, detect_silence
+except ImportError:
+    AudioSegment = CouldntEncodeError = None
+
+log = logging.getLogger(__name__)
+
+# Whisper nimmt höchstens 25 MB pro Datei
+MAX_BYTES = 25 * 1024 * 1024
+# Für Sprache reichen 16 kHz mono; Whisper rechnet intern ohnehin damit
+ABTASTRATE = 16000
+# Annahme für die geschätzte Upload-Ersparnis: mobiler Uplink mit 1 Mbit/s
+UPLINK_BIT_PRO_S = 1_000_000
+# Dateiendung -> ffmpeg-Containerformat, wo beide abweichen
+_FORMATE = {"m4a": "mp4", "opus": "ogg"}
+
+
+def aus_upload(datei):
+    """
+    Upload (z.B. Streamlits UploadedFile, ein BytesIO) -> (bytes, endung), ohne
+    Umweg über eine Datei. getvalue() eines unveränderten BytesIO teilt den
+    Puffer, statt ihn zu kopieren.
+    """
+    return datei.getvalue(), datei.name.rsplit(".", 1)[-1].lower()
+
+
+def schnittpunkte(dauer_ms, pausen_ms, ziel_ms, fenster_ms):
+    """
+    Schnittstellen (ms) nahe jedem Vielfachen von `ziel_ms`, bevorzugt in der
+    Mitte einer Pause innerhalb von ±`fenster_ms`, sonst hart am Ziel.
+    """
+    mitten = [(a + b) // 2 for a, b in pausen_ms]
+    schnitte, letzter = [], 0
+    while dauer_ms - letzter > ziel_ms + fenster_ms:
+        ziel = letzter + ziel_ms
+        nahe = [m for m in mitten if abs(m - ziel) <= fenster_ms and m > letzter]
+        schnitt = min(nahe, key=lambda m: abs(m - ziel)) if nahe else ziel
+        schnitte.append(schnitt)
+        letzter = schnitt
+    return schnitte
+
+
+def vorbereiten(audio, stille_db=-16, rand_ms=200):
+    """Mono, ABTASTRATE, Stille am Anfang/Ende weg (mit kleinem Rand). Rückgabe: (audio, gekürzte ms)."""
+    audio = audio.set_channels(1).set_frame_rate(ABTASTRATE)
+    if len(audio) == 0: return audio, 0
+    schwelle = audio.dBFS + stille_db
+    anfang = max(detect_leading_silence(audio, silence_threshold=schwelle, chunk_size=10) - rand_ms, 0)
+    ende = max(detect_leading_silence(audio.reverse(), silence_threshold=schwelle, chunk_size=10) - rand_ms, 0)
+    if anfang + ende >= len(audio): return audio, 0
+    return audio[anfang:len(audio) - ende], anfang + ende
+
+
+def kodiere(audio, name):
+    """
+    Kompakt kodieren: Opus 24 kbit/s, falls ffmpeg kein libopus kann MP3 32 kbit/s.
+    Fehlt ffmpeg ganz, fliegt FileNotFoundError durch (zerlege fängt ihn).
+    """
+    puffer = io.BytesIO()
+    try:
+        audio.export(puffer, format="ogg", codec="libopus", bitrate="24k")
+        return (f"{name}.ogg", puffer.getvalue())
+    except CouldntEncodeError:
+        puffer = io.BytesIO()
+        audio.export(puffer, format="mp3", bitrate="32k")
+        return (f"{name}.mp3", puffer.getvalue())
+
+
+def zerlege(daten, endung, ziel_sekunden=120, fenster_sekunden=30, bericht=None):
+    """
+    Audio-Bytes -> Liste von (name, bytes): vorbereitet, kompakt kodiert und
+    bei langen Memos an Pausen geteilt. `bericht` (dict) bekommt Bytes vorher/
+    nachher, gekürzte Stille und die geschätzte Upload-Ersparnis.
+    """
+    original = [(f"audio.{endung}", daten)]
+    if AudioSegment is None: return original
+    t0 = time.perf_counter()
+    ziel_ms, fenster_ms = ziel_sekunden * 1000, fenster_sekunden * 1000
+    try:
+        roh = AudioSegment.from_file(io.BytesIO(daten), format=_FORMATE.get(endung, endung))
+        audio, gekuerzt_ms = vorbereiten(roh)
+        if len(audio) <= ziel_ms + fenster_ms:
+            teile = [kodiere(audio, "audio")]
+        else:
+            pausen = detect_silence(audio, min_silence_len=500, silence_thresh=audio.dBFS - 16, seek_step=50)
+            grenzen = [0] + schnittpunkte(len(audio), pausen, ziel_ms, fenster_ms) + [len(audio)]
+            teile = [kodiere(audio[a:b], f"teil_{i:03d}") for i, (a, b) in enumerate(zip(grenzen, grenzen[1:]))]
+    except Exception as e:
+        # Kein ffmpeg (FileNotFoundError, auch erst beim Kodieren eines WAV) oder unbekanntes
+        # Format: lieber unverändert hochladen als gar nicht
+        log.warning("Audio nicht verarbeitbar (%s), wird unverändert hochgeladen", e)
+        return original
+    vorher, nachher = len(daten), sum(len(d) for _, d in teile)
+    # Nichts gewonnen (z.B. schon kleines Opus) und passt in einem Stück -> Original schicken
+    if nachher >= vorher and len(teile) == 1 and vorher <= MAX_BYTES: teile, nachher = original, vorher
+    info = {"bytes_vorher": vorher, "bytes_nachher": nachher, "teile": len(teile), "sekunden_audio": len(audio) / 1000,
+            "stille_gekuerzt_s": gekuerzt_ms / 1000, "vorbereitung_s": time.perf_counter() - t0,
+            "upload_gespart_s": max(vorher - nachher, 0) * 8 / UPLINK_BIT_PRO_S}
+    log.info("Audio vorbereitet: %d -> %d Bytes (%.0f%% gespart, %.1f s Stille gekürzt, ~%.1f s Upload gespart, %.2f s Rechenzeit)",
+             vorher, nachher, 100 * (1 - nachher / max(vorher, 1)), info["stille_gekuerzt_s"], info["upload_gespart_s"], info["vorbereitung_s"])
+    if bericht is not None: bericht.update(info)
+    return teile
+
+
+def transkribiere_teile(teile, dienst, max_worker=4, versuche=3, wartezeit=1.0, bei_teil=None):
+    """
+    Transkribiert die Teile parallel. bei_teil(texte) wird nach jedem fertigen
+    Teil mit der Liste aller Teiltexte aufgerufen (None = noch offen).
+    Ein Teil wird bis zu `versuche`-mal probiert, erst dann scheitert das Ganze.
+    """
+    texte = [None] * len(teile)
+    lock = threading.Lock()
+
+    def ein_teil(i):
+        for versuch in range(versuche):
+            try: return str(dienst(teile[i])).strip()
+            except Exception:
+                if versuch == versuche - 1: raise
+                time.sleep(wartezeit * 2 ** versuch)
+
+    with ThreadPoolExecutor(max_workers=max_worker) as pool:
+        laufend = {pool.submit(ein_teil, i): i for i in range(len(teile))}
+        for f in as_completed(laufend):
+            i = laufend[f]
+            text = f.result()
+            with lock:
+                texte[i] = text
+                if bei_teil: bei_teil(list(texte))
+    return zusammensetzen(texte)
+
+
+def zusammensetzen(texte):
+    return " ".join(t for t in texte if t)
+
+
+def transkribiere(daten, endung, dienst, bei_teil=None, bericht=None, **optionen):
+    """Audio-Bytes -> Text: vorbereiten, zerlegen, parallel transkribieren, zusammensetzen."""
+    return transkribiere_teile(zerlege(daten, endung, bericht=bericht), dienst, bei_teil=bei_teil, **optionen)
@@ -0,0 +1,53 @@
+"""
+Unterschrift vom Canvas als kleines PNG im Speicher.
+
+st_canvas liefert 300x150 RGBA als float-Array; gezeichnet ist nur, wo Alpha
+> 0 ist (der graue Hintergrund gehört nicht zum Bild). Statt das ganze Feld
+als Farb-PNG in eine gemeinsame Datei zu schreiben, wird auf den Bereich der
+Striche zugeschnitten und als Graustufen- (oder 1-Bit-)PNG kodiert - meist
+wenige hundert Bytes statt einiger KB. Ein leeres Feld wird schon am
+Alpha-Kanal erkannt, ohne ein Bild zu bauen.
+
+Das Ergebnis geht als Bytes direkt an bericht_pdf.BerichtRenderer.erstelle;
+jede Sitzung hat damit ihren eigenen Puffer.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+# Alpha-Werte darunter gelten als leer (Kantenglättung, Fehlberührung)
+MIN_ALPHA = 16
+# Rand um die Striche in Pixeln
+RAND = 4
+
+
+def zuschnitt(alpha, min_alpha=MIN_ALPHA, rand=RAND):
+    """(oben, unten, links, rechts) um alle Striche inkl. Rand, None bei leerem Feld."""
+    maske = alpha >= min_alpha
+    zeilen = np.flatnonzero(maske.any(axis=1))
+    if not len(zeilen): return None
+    spalten = np.flatnonzero(maske.any(axis=0))
+    h, w = alpha.shape
+    return (max(int(zeilen[0]) - rand, 0), min(int(zeilen[-1]) + 1 + rand, h),
+            max(int(spalten[0]) - rand, 0), min(int(spalten[-1]) + 1 + rand, w))
+
+
+def aus_canvas(image_data, einfarbig=False, min_alpha=MIN_ALPHA, rand=RAND):
+    """
+    Canvas-Array (H x W x 4) -> PNG-Bytes der zugeschnittenen Unterschrift,
+    None bei leerem Feld. `einfarbig` = 1 Bit statt 8 Bit Graustufen.
+    """
+    if image_data is None: return None
+    alpha = np.asarray(image_data)[..., 3]
+    box = zuschnitt(alpha, min_alpha, rand)
+    if box is None: return None
+    oben, unten, links, rechts = box
+    # Dunkle Striche auf Weiß: Helligkeit = 255 - Deckkraft
+    grau = 255 - np.clip(alpha[oben:unten, links:rechts], 0, 255).astype(np.uint8)
+    bild = Image.fromarray(grau, "L")
+    if einfarbig: bild = bild.point(lambda v: 255 if v >= 128 else 0, "1")
+    puffer = io.BytesIO()
+    bild.save(puffer, format="PNG", optimize=True)
+    return puffer.getvalue()
+
@@ -0,0 +1,172 @@
+"""
+Gemeinsame Google-Sheets-Verbindung für die App.
+
+Streamlit führt app.py bei jedem Klick neu aus. Damit nicht jede Hilfsfunktion
+neu authentifiziert und das Spreadsheet neu öffnet, hält dieses Modul pro
+Prozess einen Client, das Spreadsheet-Handle und die Tabellenblätter im Cache.
+Ändern sich Zugangsdaten oder Sheet-Name, wird automatisch neu aufgebaut.
+Jeder HTTP-Request des Clients läuft durch den Planer (kontingent.py) -
+Drosselung aufs Google-Kontingent, Backoff, gleiche Lese-Requests nur einmal -
+und durch eine Messung (messung.py).
+"""
+import hashlib
+import json
+import re
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+import gspread
+
+import kontingent
+import messung
+
+JAHRES_KOPFZEILE = ["Nr", "Datum", "Uhrzeit", "Kunde", "Arbeit", "Netto", "MwSt", "Brutto", "KdNr", "Status", "GPS_Log"]
+
+_verbindungen = {}
+_planer = {}  # Fingerabdruck der Zugangsdaten -> Planer (das Kontingent gilt je Dienstkonto)
+_lock = threading.Lock()
+
+
+def jahresblatt_name(jahr=None):
+    """Name des Rechnungsblatts für ein Jahr, z.B. 'Aufträge_2025'."""
+    return f"Aufträge_{jahr or datetime.now().year}"
+
+
+def _fingerabdruck(creds):
+    roh = json.dumps(creds, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(roh).hexdigest()
+
+
+def _ist_auth_fehler(e):
+    return isinstance(e, gspread.exceptions.APIError) and e.code in (401, 403)
+
+
+def _operation(methode, url):
+    """'POST .../spreadsheets/<id>/values/Kunden!A1:F:append' -> 'POST values:append' (ohne IDs und Bereiche)."""
+    pfad = re.sub(r"^.*/spreadsheets/[^/:]+", "", urlparse(url).path)
+    pfad = re.sub(r"/values/[^/:]+(?::[A-Z]*\d*)?", "/values", pfad)
+    pfad = pfad.strip("/")
+    return f"{methode} {'spreadsheet' + pfad if not pfad or pfad.startswith(':') else pfad}"
+
+
+def _instrumentiere(client, planer):
+    """
+    Jeder Request der Session läuft durch den Planer und wird gemessen
+    (gspread 5: client.session, gspread 6: client.http_client.session).
+    """
+    session = getattr(getattr(client, "http_client", client), "session", None)
+    if session is None: return client
+    original = session.request
+
+    def request(method, url, *args, **kwargs):
+        with messung.spanne("sheets", op=_operation(method, url)) as w:
+            antwort = planer.fuehre_aus(method, url, lambda: original(method, url, *args, **kwargs), kwargs.get("params"), w)
+            w["bytes"] = len(antwort.content or b"")
+            nutzlast = kwargs.get("json") or kwargs.get("data")
+            if nutzlast: w["bytes_hoch"] = len(nutzlast if isinstance(nutzlast, (bytes, str)) else json.dumps(nutzlast))
+            w["status"] = antwort.status_code
+        return antwort
+
+    session.request = request
+    return client
+
+
+class SheetVerbindung:
+    """Client + Spreadsheet + Blätter, einmal pro (Zugangsdaten, Sheet-Name)."""
+
+    def __init__(self, creds, blatt_name, planer=None):
+        self.creds = creds
+        self.blatt_name = blatt_name
+        self.planer = planer or kontingent.Planer()
+        self._lock = threading.RLock()
+        self._client = None
+        self._sh = None
+        self._blaetter = {}
+
+    # Der Client von gspread nutzt eine AuthorizedSession von google-auth,
+    # die abgelaufene Tokens selbst erneuert. Nur bei echten Auth-Fehlern
+    # (z.B. widerrufener Schlüssel) bauen wir alles neu auf.
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = _instrumentiere(gspread.service_account_from_dict(self.creds), self.planer)
+            return self._client
+
+    @property
+    def spreadsheet(self):
+        with self._lock:
+            if self._sh is None:
+                self._sh = self._mit_neuaufbau(lambda: self.client.open(self.blatt_name))
+            return self._sh
+
+    def zuruecksetzen(self):
+        """Verwirft Client, Spreadsheet und alle Blätter."""
+        with self._lock:
+            self._client = None
+            self._sh = None
+            self._blaetter.clear()
+
+    def _mit_neuaufbau(self, aufruf):
+        try:
+            return aufruf()
+        except gspread.exceptions.APIError as e:
+            if not _ist_auth_fehler(e): raise
+            self.zuruecksetzen()
+            return aufruf()
+
+    def blatt(self, titel, jahr=None, anlegen=None):
+        """
+        Liefert ein Tabellenblatt aus dem Cache (Schlüssel: Titel + Jahr).
+        `anlegen` ist optional ein dict mit rows/cols/kopfzeile, falls das
+        Blatt noch nicht existiert.
+        """
+        schluessel = (titel, jahr)
+        with self._lock:
+            ws = self._blaetter.get(schluessel)
+            if ws is not None: return ws
+            try:
+                ws = self._mit_neuaufbau(lambda: self.spreadsheet.worksheet(titel))
+            except gspread.exceptions.WorksheetNotFound:
+                if anlegen is None: raise
+                ws = self.spreadsheet.add_worksheet(title=titel, rows=anlegen.get("rows", 1000), cols=anlegen.get("cols", 20))
+                if anlegen.get("kopfzeile"): ws.append_row(anlegen["kopfzeile"])
+            self._blaetter[schluessel] = ws
+            return ws
+
+    def jahresblatt(self, jahr=None):
+        """Rechnungsblatt des Jahres; wird bei Bedarf mit Kopfzeile angelegt."""
+        jahr = jahr or datetime.now().year
+        return self.blatt(jahresblatt_name(jahr), jahr=jahr, anlegen={"rows": 1000, "cols": 20, "kopfzeile": JAHRES_KOPFZEILE})
+
+    def blatt_titel(self):
+        """Titel aller Tabellenblätter (ein Metadaten-Request)."""
+        return [ws.title for ws in self._mit_neuaufbau(lambda: self.spreadsheet.worksheets())]
+
+    def vergessen(self, titel, jahr=None):
+        """Entfernt ein Blatt aus dem Cache (z.B. nach Löschen im Browser)."""
+        with self._lock:
+            self._blaetter.pop((titel, jahr), None)
+
+
+def hole_verbindung(creds, blatt_name):
+    """Prozessweit geteilte Verbindung; neu, sobald sich Zugangsdaten oder Name ändern."""
+    fp = _fingerabdruck(creds)
+    schluessel = (fp, blatt_name)
+    with _lock:
+        v = _verbindungen.get(schluessel)
+        if v is None:
+            # Alte Zugangsdaten sind ungültig geworden -> deren Verbindungen weg
+            for alt in [k for k in _verbindungen if k[0] != fp]:
+                _verbindungen.pop(alt).zuruecksetzen()
+            v = SheetVerbindung(creds, blatt_name, _planer.setdefault(fp, kontingent.Planer()))
+            _verbindungen[schluessel] = v
+        return v
+
+
+def alle_verbindungen_zuruecksetzen():
+    """Für 'App Reset': alle gecachten Clients verwerfen."""
+    with _lock:
+        for v in _verbindungen.values(): v.zuruecksetzen()
+        _verbindungen.clear()